@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+"""
+Drives the PhenoboxMachine through a number of plants with simulated GPIO, camera and server and reports how long the
+machine stays in each state, the cycle time per plant and the number of plants per hour, both for taking the pictures
+and including the upload by the image handler. No phenobox hardware is needed.
+
+The options of the box section of the config (photo_count, angles, pipelined_capture, in_memory_capture,
+image_format, ...) are used as on the box. The simulated camera returns the given sample images one after another, so
+the first sample of every plant (every photo_count-th or every len(angles)-th sample) has to show a QR-Code.
+
+Usage: python cycle_benchmark.py [options] <sample.jpg> [<sample.jpg> ...]
+"""
+import argparse
+import functools
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append("..")
+# The phenobox_core package shared with phenobox_standalone
+sys.path.append("../..")
+from simulation import MotorDriverSimulator, SimulatedServer, install
+
+# The simulated GPIO has to be in place before the gpio controllers import RPi.GPIO
+gpio = install()
+
+from config import config
+from gpio_controllers import LedController, MotorController
+from image_processing import CodeScanner
+from machine import PhenoboxMachine
+from network.image_handler import ImageHandler, create_conversion_pool
+from phenobox_core.angle_plan import parse_angles
+from simulation.simulated_camera import SimulatedCameraController
+
+
+class StateTimer(object):
+    """
+    Records how long the machine stays in each state
+    """
+
+    def __init__(self, machine):
+        #: The durations in seconds of all visits by state name
+        self.durations = {}
+        self._current = None
+        for state in machine.states.values():
+            # Inserted first so that the time is taken before the state does its work
+            state.on_enter.insert(0, functools.partial(self._entered, state.name))
+
+    def _entered(self, name, event):
+        now = time.time()
+        if self._current is not None:
+            previous, start = self._current
+            self.durations.setdefault(previous, []).append(now - start)
+        self._current = (name, now)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('samples', nargs='+', help='JPEG images returned by the simulated camera')
+    parser.add_argument('--config', default='../config/test_config.ini', help='The box config to use')
+    parser.add_argument('--plants', type=int, default=10, help='The number of plants to process')
+    parser.add_argument('--move-time', type=float, default=0.3, help='Seconds the motor needs per position')
+    parser.add_argument('--capture-time', type=float, default=0.8, help='Seconds the camera needs to take a picture')
+    parser.add_argument('--download-time', type=float, default=0.6,
+                        help='Seconds the camera needs to transfer a picture')
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds the server needs to answer a request')
+    args = parser.parse_args()
+
+    config.load_config(args.config)
+    # Forked before the simulated motor and camera start their threads
+    conversion_pool = create_conversion_pool()
+    work_dir = tempfile.mkdtemp(prefix='phenobox_benchmark_')
+    try:
+        photo_count = getattr(config, 'cfg').getint('box', 'photo_count')
+        fast_decode = config.get_option('box', 'fast_decode', False, 'getboolean')
+        server = SimulatedServer(latency=args.latency)
+        MotorDriverSimulator(gpio, MotorController, move_time=args.move_time)
+        motor_controller = MotorController(settle_time=config.get_option('motor', 'settle_time', 0.4, 'getfloat'),
+                                           position_settle_time=config.get_option('motor', 'position_settle_time', 0.4,
+                                                                                  'getfloat'),
+                                           timeout=10,
+                                           positions=parse_angles(config.get_option('motor', 'positions',
+                                                                                    '0,60,120,180,240,300')))
+        motor_controller.initialize()
+        led_controller = LedController()
+        led_controller.initialize()
+        camera_controller = SimulatedCameraController(args.samples, '{}/pictures'.format(work_dir),
+                                                      capture_time=args.capture_time,
+                                                      download_time=args.download_time)
+        image_handler = ImageHandler(server, local_dir='{}/pictures'.format(work_dir),
+                                     persist_dir='{}/persisted'.format(work_dir),
+                                     target_dir='{}/share'.format(work_dir), photo_count=photo_count,
+                                     fast_decode=fast_decode, max_queued_plants=0, pool=conversion_pool)
+        image_handler.setDaemon(True)
+        image_handler.start()
+        machine = PhenoboxMachine(camera_controller, CodeScanner(fast_decode=fast_decode), motor_controller,
+                                  led_controller, image_handler, server, photo_count,
+                                  config.get_option('box', 'pipelined_capture', False, 'getboolean'),
+                                  config.get_option('box', 'in_memory_capture', False, 'getboolean'),
+                                  angles=parse_angles(config.get_option('box', 'angles', '')))
+        machine.initialize()
+        timer = StateTimer(machine)
+
+        cycles = []
+        errors = 0
+        start = time.time()
+        for _ in range(args.plants):
+            cycle_start = time.time()
+            if machine.is_ERROR():
+                machine.restart()
+            else:
+                machine.start()
+            if machine.is_ERROR():
+                errors += 1
+            else:
+                cycles.append(time.time() - cycle_start)
+        captured = time.time() - start
+        image_handler.queue.join()
+        uploaded = time.time() - start
+        image_handler.stop()
+        image_handler.join()
+
+        print('{:<22}{:>8}{:>12}{:>12}'.format('state', 'visits', 'mean [ms]', 'max [ms]'))
+        for name in machine.states:
+            durations = timer.durations.get(name)
+            if durations:
+                print('{:<22}{:>8}{:>12.1f}{:>12.1f}'.format(name, len(durations),
+                                                             sum(durations) / len(durations) * 1000,
+                                                             max(durations) * 1000))
+        print('')
+        print('plants:                    {} ({} failed)'.format(args.plants, errors))
+        if cycles:
+            print('mean cycle time [s]:       {:.2f}'.format(sum(cycles) / len(cycles)))
+        print('plants/hour (capture):     {:.1f}'.format(len(cycles) / captured * 3600))
+        print('plants/hour (with upload): {:.1f}'.format(len(cycles) / uploaded * 3600))
+        print('server requests:           {}'.format(
+            ', '.join('{} {}'.format(count, name) for name, count in sorted(server.requests.items()))))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""
+Compares the wall time and peak memory usage (RSS) of the full JPEG decode with the draft mode decode used if
+fast_decode is enabled in the box config.
+
+Usage: python decode_benchmark.py <path/to/camera/image.jpg> [repetitions]
+"""
+import resource
+import sys
+import time
+from multiprocessing import Process, Queue
+
+sys.path.append("..")
+# The phenobox_core package shared with phenobox_standalone
+sys.path.append("../..")
+from image_processing import CodeScanner
+from phenobox_core.conversion import get_img
+
+
+def _run(target, path, repetitions, results):
+    """
+    Runs the given decode function repetitions times and reports the mean wall time and the peak RSS of this process
+
+    :param target: The function to benchmark. Gets called with the image path as its only argument
+    :param path: The path to the image to decode
+    :param repetitions: How often the function should be called
+    :param results: The queue to put the tuple (mean seconds, peak RSS in kB) to
+
+    :return: None
+    """
+    start = time.time()
+    for _ in range(repetitions):
+        target(path)
+    elapsed = (time.time() - start) / repetitions
+    results.put((elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+
+
+def benchmark(target, path, repetitions):
+    """
+    Runs the benchmark in a separate process so that the peak RSS of one variant does not hide the other one
+
+    :return: A tuple (mean seconds, peak RSS in kB)
+    """
+    results = Queue()
+    process = Process(target=_run, args=(target, path, repetitions, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    path = sys.argv[1]
+    repetitions = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    variants = [
+        ('upload conversion (full decode)', lambda p: get_img(p, fast_decode=False)),
+        ('upload conversion (draft decode)', lambda p: get_img(p, fast_decode=True)),
+        ('QR-Code scan (full decode)', CodeScanner(fast_decode=False).scan_image),
+        ('QR-Code scan (draft decode)', CodeScanner(fast_decode=True).scan_image),
+    ]
+    print('{:<34}{:>12}{:>16}'.format('variant', 'time [ms]', 'peak RSS [MB]'))
+    for name, target in variants:
+        elapsed, max_rss = benchmark(target, path, repetitions)
+        print('{:<34}{:>12.1f}{:>16.1f}'.format(name, elapsed * 1000, max_rss / 1024.0))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+"""
+Drives the MotorController against a simulated motor controller and reports how long the moves take, how late the
+end of a move is noticed and how much CPU time is used while waiting for the motor.
+Moves which return before the motor has reached its position indicate a too short settle_time.
+No phenobox hardware is needed.
+
+Usage: python motor_benchmark.py [moves] [settle_time] [position_settle_time] [move_time]
+"""
+import os
+import sys
+import time
+
+sys.path.append("..")
+# The phenobox_core package shared with phenobox_standalone
+sys.path.append("../..")
+from simulation import MotorDriverSimulator, install
+
+# The simulated GPIO has to be in place before the gpio controllers import RPi.GPIO
+gpio = install()
+
+from gpio_controllers import MotorController
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] in ('-h', '--help'):
+        print(__doc__)
+        sys.exit(0)
+    moves = int(sys.argv[1]) if len(sys.argv) > 1 else 12
+    settle_time = float(sys.argv[2]) if len(sys.argv) > 2 else 0.4
+    position_settle_time = float(sys.argv[3]) if len(sys.argv) > 3 else 0.4
+    move_time = float(sys.argv[4]) if len(sys.argv) > 4 else 0.3
+
+    driver = MotorDriverSimulator(gpio, MotorController, move_time=move_time)
+    motor = MotorController(settle_time=settle_time, position_settle_time=position_settle_time, timeout=10)
+    motor.initialize()
+
+    wall_times = []
+    latencies = []
+    early = 0
+    cpu_start = sum(os.times()[:2])
+    wall_start = time.time()
+    for i in range(moves):
+        start = time.time()
+        motor.move_to_position((i + 1) % 6)
+        end = time.time()
+        wall_times.append(end - start)
+        if driver.last_position_reached is None or driver.last_position_reached < start:
+            # The motor controller has not even signaled the position yet
+            early += 1
+        else:
+            latencies.append(end - driver.last_position_reached)
+    cpu = sum(os.times()[:2]) - cpu_start
+    wall = time.time() - wall_start
+
+    print('moves:                     {}'.format(driver.moves))
+    print('mean time per move [ms]:   {:.1f}'.format(sum(wall_times) / len(wall_times) * 1000))
+    print('returned too early:        {}'.format(early))
+    if latencies:
+        print('mean INP latency [ms]:     {:.2f}'.format(sum(latencies) / len(latencies) * 1000))
+    print('CPU usage while moving:    {:.1f}%'.format(cpu / wall * 100))
+
+
+if __name__ == '__main__':
+    main()
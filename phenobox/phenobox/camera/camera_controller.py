@@ -1,10 +1,8 @@
 import ctypes
-import errno
-import logging
-import os
 
-from errors import ConnectionError, CaptureError
-from phenobox.config import config
+from config import config
+from errors import ConnectionError
+from phenobox_core.camera_session import CameraSession
 
 
 class libgphoto2error(Exception):
@@ -21,6 +19,10 @@ class CameraFilePath(ctypes.Structure):
                 ('folder', (ctypes.c_char * 1024))]
 
 
+class CameraText(ctypes.Structure):
+    _fields_ = [('text', (ctypes.c_char * (32 * 1024)))]
+
+
 # gphoto constants
 # Defined in 'gphoto2-port-result.h'
 GP_OK = 0
@@ -48,9 +50,11 @@ GP_FILE_TYPE_NORMAL = 1
 
 PTR = ctypes.pointer
 
-# FIXME this crashes sphinx documentation try to move into class CameraController
-gp = ctypes.CDLL('libgphoto2.so')
-#gp=None
+try:
+    gp = ctypes.CDLL('libgphoto2.so')
+except OSError:
+    # Allows importing the module without libgphoto2, e.g. to use the simulated camera or to build the documentation
+    gp = None
 
 def check(result):
     """
@@ -77,10 +81,13 @@ def check_unref(result, camfile):
         raise libgphoto2error(result, message)
 
 
-class CameraController:
+class CameraController(CameraSession):
+    """
+    Camera session which accesses the camera through libgphoto2 via ctypes
+    """
     context = None
 
-    cam = None  #:a reference to the camera which should be used
+    _backend_errors = (libgphoto2error,)
 
     class cameraFile(object):
         """
@@ -116,6 +123,17 @@ class CameraController:
         def __dealoc__(self, filename):
             check(gp.gp_file_free(self._cf))
 
+        def get_data(self):
+            """
+            Copies the content of the file into memory
+
+            :return: The content of the file as string
+            """
+            data = ctypes.c_void_p()
+            size = ctypes.c_ulong()
+            check(gp.gp_file_get_data_and_size(self._cf, PTR(data), PTR(size)))
+            return ctypes.string_at(data, size.value)
+
         def _get_name(self):
             name = ctypes.c_char_p()
             check(gp.gp_file_get_name(self._cf, PTR(name)))
@@ -128,103 +146,71 @@ class CameraController:
 
     def __init__(self, target_dir=None):
         if target_dir is None:
-            self.target_dir = getattr(config, 'cfg').get('box', 'local_image_folder')
-        else:
-            self.target_dir = target_dir
-        self._logger = logging.getLogger(__name__)
-        self._logger.setLevel(logging.INFO)
-        self._logger.info('Target directory set to {}'.format(self.target_dir))
-
-    def connect(self):
-        """
-        Connects to the attached camera
-
-        :raises ConnectionError: if the connection to the camera failed
-
-        :return: None
-        """
-        if self.cam is None:
-            self.cam = ctypes.c_void_p()
-            gp.gp_camera_new(ctypes.byref(self.cam))
-            retval = gp.gp_camera_init(self.cam, self.context)
-            if retval != GP_OK:
-                self.release()
-                self._logger.warning('Unable to connect to camera. (Error code: {})'.format(retval))
-                raise ConnectionError('Unable to connect to camera')
-
-    def release(self):
-        """
-        Disconnects from the camera
-
-        :return: None
-        """
-        if self.cam is not None:
-            gp.gp_camera_exit(self.cam, self.context)
-            gp.gp_camera_unref(self.cam)
-            self.cam = None
+            target_dir = getattr(config, 'cfg').get('box', 'local_image_folder')
+        super(CameraController, self).__init__(target_dir)
 
     def initialize(self):
         """
         Sets up the context needed by gphoto
 
+        :raises ConnectionError: if libgphoto2 is not available
+
         :return: None
         """
+        if gp is None:
+            raise ConnectionError('libgphoto2 is not available')
         self.context = gp.gp_context_new()
 
-    def capture_and_download(self, name):
+    def start_keep_alive(self, interval=None, reconnect_delay=None, max_reconnect_delay=None):
         """
-        Takes a photo and downloads it from the camera and saves it to the target_dir
-
-        :param name: the file name which should be used when saving the downloaded image
+        Starts the thread which keeps the camera session alive while it is not used.
+        Values which are not given are read from the camera section of the config.
 
-        :return: The return value of :meth:`.download`
+        :return: None
         """
-        self.connect()
-        file_path = CameraFilePath()
-        retval = gp.gp_camera_capture(self.cam, GP_CAPTURE_IMAGE, PTR(file_path), self.context)
+        if interval is None:
+            interval = config.get_option('camera', 'keep_alive_interval', 30, 'getfloat')
+        if reconnect_delay is None:
+            reconnect_delay = config.get_option('camera', 'reconnect_delay', 1, 'getfloat')
+        if max_reconnect_delay is None:
+            max_reconnect_delay = config.get_option('camera', 'max_reconnect_delay', 60, 'getfloat')
+        super(CameraController, self).start_keep_alive(interval, reconnect_delay, max_reconnect_delay)
+
+    def _open_camera(self):
+        cam = ctypes.c_void_p()
+        gp.gp_camera_new(ctypes.byref(cam))
+        retval = gp.gp_camera_init(cam, self.context)
         if retval != GP_OK:
-            self._logger.warning('Error during capture. (Error code: {})'.format(retval))
-            self.release()
-            raise CaptureError("Unable to capture")
-        else:
-            return self.download(os.path.join(self.target_dir), file_path, name)
+            gp.gp_camera_exit(cam, self.context)
+            gp.gp_camera_unref(cam)
+            raise ConnectionError('Unable to connect to camera', 'Error code: {}'.format(retval))
+        return cam
 
-    def download(self, dest_folder, file_path, name):
-        """
-        Downloads the image given by file_path and saves it to the path given by dest_folder with the given name
+    def _close_camera(self):
+        gp.gp_camera_exit(self.cam, self.context)
+        gp.gp_camera_unref(self.cam)
 
-        :param dest_folder: The directory to store the image to
-        :param file_path: The path to the image on the camera
-        :param name: The file name to be used for the downloaded image
+    def _query_summary(self):
+        summary = CameraText()
+        return gp.gp_camera_get_summary(self.cam, PTR(summary), self.context) == GP_OK
 
-        :return: the full path to the downloaded image or None if the download was not successfull
-        """
-        dest = os.path.join(dest_folder, name + '.jpg')
+    def _take_picture(self):
+        file_path = CameraFilePath()
+        retval = gp.gp_camera_capture(self.cam, GP_CAPTURE_IMAGE, PTR(file_path), self.context)
+        if retval != GP_OK:
+            raise libgphoto2error(retval, 'Error during capture')
+        return file_path
 
+    def _read_file(self, file_path):
+        cfile = self.cameraFile(self.cam, self.context, file_path.folder, file_path.name)
         try:
-            os.makedirs(dest[:dest.rindex('/') + 1])
-        except OSError as exception:
-            if exception.errno != errno.EEXIST:
-                self._logger.exception('Unable to create folder ({}). (errno: {})'.format(dest, exception.errno))
-                return None
-                # raise  # TODO handle this
+            return cfile.get_data()
+        finally:
+            gp.gp_file_unref(cfile._cf)
+
+    def _save_file(self, file_path, dest):
+        cfile = self.cameraFile(self.cam, self.context, file_path.folder, file_path.name)
         try:
-            cfile = self.cameraFile(self.cam, self.context, file_path.folder, file_path.name)
             cfile.save(dest)
+        finally:
             gp.gp_file_unref(cfile._cf)
-        except libgphoto2error as err:
-            self._logger.exception('Unable to download and save image from camera')
-            return None
-        return dest
-
-    # TODO refactor into property
-    def get_target_dir(self):
-        return self.target_dir
-
-    def close(self):
-        """
-        Alias for :meth:`.release`
-
-        :return: None
-        """
-        self.release()
@@ -15,3 +15,20 @@ def load_config(path):
     cfg_parser.read(path)
     global cfg
     cfg = cfg_parser
+
+
+def get_option(section, option, default=None, getter='get'):
+    """
+    Reads an optional value from the loaded config
+
+    :param section: The section of the config file
+    :param option: The name of the option
+    :param default: The value to return if the option is not present (optional, default: None)
+    :param getter: The name of the ConfigParser method used to read the value. One of 'get', 'getint', 'getfloat'
+        or 'getboolean' (optional, default: 'get')
+
+    :return: The value of the option or the given default value
+    """
+    if cfg.has_option(section, option):
+        return getattr(cfg, getter)(section, option)
+    return default
@@ -5,11 +5,12 @@ from logging.handlers import RotatingFileHandler
 import time
 import os
 import sys
+sys.path.append(os.path.expanduser('~/github/PhenoBox-System/phenobox/phenobox'))
 sys.path.append(os.path.expanduser('~/github/PhenoBox-System/phenobox'))
-from phenobox.config import config
-from phenobox.camera import CameraController
-from phenobox.camera.errors import ConnectionError, CaptureError
-from phenobox.image_processing.code_scanner import CodeScanner
+from config import config
+from camera import CameraController
+from camera.errors import ConnectionError, CaptureError
+from image_processing.code_scanner import CodeScanner
 
 def main():
 
@@ -6,6 +6,7 @@ import time
 import RPi.GPIO as GPIO
 import sys
 sys.path.append("..")
+sys.path.append("../..")
 from config import config
 from gpio_controllers import InputController, LedController, DoorState, ButtonPress
 
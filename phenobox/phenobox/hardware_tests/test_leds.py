@@ -4,6 +4,7 @@ import time
 import RPi.GPIO as GPIO
 import sys
 sys.path.append("..")
+sys.path.append("../..")
 from gpio_controllers import InputController, LedController, MotorController, DoorState, ButtonPress
 
 
@@ -1 +1 @@
-from code_scanner import CodeScanner
+from code_scanner import CodeScanner, DEFAULT_SCALES
@@ -1,58 +1,150 @@
+import io
 import logging
 import os
+import time
 
 from PIL import Image
 from pyzbar import pyzbar
 from pyzbar.wrapper import ZBarSymbol
 
+#: The default scales at which the image is scanned, from the smallest to the biggest one
+DEFAULT_SCALES = (0.1, 0.2, 0.4, 1.0)
+
 
 class CodeScanner:
 
-    def __init__(self):
+    def __init__(self, fast_decode=False, scales=DEFAULT_SCALES):
+        """
+        :param fast_decode: If True the JPEG decoder is put into draft mode so that the image is decoded directly at
+            a reduced scale which is still at least as big as the size used for scanning
+        :param scales: The scales relative to the original image size at which the image is scanned. The next bigger
+            scale is only tried if no code was found at the current one
+        """
         self._logger = logging.getLogger(__name__)
         self._logger.setLevel(logging.INFO)
+        self._fast_decode = fast_decode
+        self._scales = sorted(scales)
 
+        #: The area around the last found code as (left, top, right, bottom) relative to the image size. Kept across
+        # plants as the codes are usually placed at the same position
         self.approximate_area = None
 
-    def scan_image(self, path):
+        self._scans = 0
+        self._hits = 0
+        self._area_hits = 0
+        #: The number of attempts, hits and the accumulated duration in seconds per (scale, 'area'/'full') attempt
+        self._attempts = {}
+
+    def get_statistics(self):
         """
-        Analyzes the image located by path and tries to extract the code information
+        Returns the counters of all scans done so far
 
-        :param path: Path to the image that should be analyzed
+        :return: A dictionary with the number of 'scans', 'hits', 'area_hits' (codes found in the approximate area),
+            the 'hit_rate' and 'attempts', which maps (scale, kind) to a tuple (count, hits, total seconds) with kind
+            being 'area' or 'full'
+        """
+        return {
+            'scans': self._scans,
+            'hits': self._hits,
+            'area_hits': self._area_hits,
+            'hit_rate': float(self._hits) / self._scans if self._scans > 0 else 0.0,
+            'attempts': {key: tuple(value) for key, value in self._attempts.items()}
+        }
 
-        :return: The code Information returned by the zBar image scanner, or None if no code was found
+    def _open(self, path, data):
+        return Image.open(io.BytesIO(data) if data is not None else path)
+
+    def _scaled_images(self, path, data):
         """
-        if not os.path.isfile(path):
-            return None
-        im = Image.open(path)
+        Yields the image at all scales, from the smallest to the biggest one. The image is only decoded again for the
+        next scale if it is requested.
 
-        width, height = im.size
+        :return: A generator of (scale, pillow.Image) tuples
+        """
+        full = None
+        for scale in self._scales:
+            im = full if full is not None else self._open(path, data)
+            width, height = im.size
+            size = int(width * scale), int(height * scale)
+            if self._fast_decode:
+                im.draft(im.mode, size)
+            elif full is None:
+                # Without draft mode every scale needs the full decode, so it is only done once
+                full = im
+            yield scale, im.resize(size) if scale != 1.0 else im
 
-        w_s = width * 0.4
-        h_s = height * 0.4
+    def _decode(self, im, scale, kind):
+        key = (scale, kind)
+        attempt = self._attempts.setdefault(key, [0, 0, 0.0])
+        start = time.time()
+        res = pyzbar.decode(im, symbols=[ZBarSymbol.QRCODE])
+        attempt[0] += 1
+        attempt[2] += time.time() - start
+        if len(res) > 0:
+            attempt[1] += 1
+        return res
 
-        reduced_size = int(w_s), int(h_s)
-        im = im.resize(reduced_size)
+    def _remember_area(self, rect, offset, size):
+        """
+        Stores the area around the found code relative to the size of the scanned image
 
-        if self.approximate_area:
-            im_c = im.crop(self.approximate_area)
-            res = pyzbar.decode(im_c, symbols=[ZBarSymbol.QRCODE])
-            if len(res) == 0:
-                self.approximate_area = None
-            else:
-                return res[0].data
+        :param rect: The rect of the found code
+        :param offset: The (left, top) offset of the scanned part within the image
+        :param size: The (width, height) of the image
 
-        res = pyzbar.decode(im, symbols=[ZBarSymbol.QRCODE])
+        :return: None
+        """
+        width, height = size
+        left = rect.left + offset[0]
+        top = rect.top + offset[1]
+        self.approximate_area = (
+            max(0.0, float(left - rect.width) / width),
+            max(0.0, float(top - rect.height) / height),
+            min(1.0, float(left + 2 * rect.width) / width),
+            min(1.0, float(top + 2 * rect.height) / height)
+        )
 
-        if len(res) > 0:
-            rect = res[0].rect
-            offset_width = rect.width * 1.5
-            offset_height = rect.height * 1.5
-            self.approximate_area = (
-                rect.left - offset_width,
-                rect.top - offset_height,
-                rect.left + offset_width,
-                rect.top + offset_height
-            )
-            return res[0].data
+    def scan_image(self, path, data=None):
+        """
+        Analyzes the image located by path and tries to extract the code information.
+        The image is scanned at increasing scales until a code is found. At each scale the area in which the last code
+        was found is scanned first.
+
+        :param path: Path to the image that should be analyzed
+        :param data: The content of the image if it is kept in memory. path is not read if this is given (optional)
+
+        :return: The code Information returned by the zBar image scanner, or None if no code was found
+        """
+        if data is None and not os.path.isfile(path):
+            return None
+        self._scans += 1
+        start = time.time()
+        attempts = 0
+        for scale, im in self._scaled_images(path, data):
+            size = im.size
+            if self.approximate_area:
+                left, top, right, bottom = self.approximate_area
+                box = (int(left * size[0]), int(top * size[1]), int(right * size[0]), int(bottom * size[1]))
+                attempts += 1
+                res = self._decode(im.crop(box), scale, 'area')
+                if len(res) > 0:
+                    self._hits += 1
+                    self._area_hits += 1
+                    self._remember_area(res[0].rect, box[:2], size)
+                    self._log_hit(scale, 'area', attempts, start)
+                    return res[0].data
+
+            attempts += 1
+            res = self._decode(im, scale, 'full')
+            if len(res) > 0:
+                self._hits += 1
+                self._remember_area(res[0].rect, (0, 0), size)
+                self._log_hit(scale, 'full', attempts, start)
+                return res[0].data
+        self._logger.info('No QR-Code found after {} attempts in {:.0f} ms'.format(attempts,
+                                                                                  (time.time() - start) * 1000))
         return None
+
+    def _log_hit(self, scale, kind, attempts, start):
+        self._logger.info('Found QR-Code at scale {} ({}) after {} attempts in {:.0f} ms. Hit rate {:.1%}'.format(
+            scale, kind, attempts, (time.time() - start) * 1000, float(self._hits) / self._scans))
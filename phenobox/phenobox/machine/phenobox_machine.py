@@ -1,16 +1,17 @@
 import logging
-import time
 import uuid
 
 from colorama import Fore
-from requests import Session
-from requests.exceptions import ConnectionError as ServerConnectionError
+from requests.exceptions import RequestException
 from transitions import Machine
 from transitions import State
 
 from camera import CaptureError, ConnectionError
 from config import config
-from network import UnableToAuthenticateError
+from gpio_controllers import MotorTimeoutError
+from network import UnableToAuthenticateError, SnapshotRequest, ServerUnableToCreateSnapshotError, \
+    SnapshotExistsError, PlantNotFoundError, apply_snapshot
+from phenobox_core.angle_plan import plan_positions, split_angle_plan
 from plant import Plant
 
 
@@ -37,17 +38,21 @@ class PhenoboxMachine(Machine):
         8: "Unable to get picture from camera",
         9: "Unable to create snapshot on server",
         10: "This plant has already been processed for the current timestamp",
-        11: "Unable to connect to server"
+        11: "Unable to connect to server",
+        12: "Motor did not reach its position",
+        13: "Too many plants are waiting for upload",
+        14: "QR-Code contains an angle the turntable can not drive to"
     }
 
     def __init__(self, camera_controller, code_scanner, motor_controller, led_controller, image_handler, auth,
-                 photo_count=6):
+                 photo_count=6, pipelined_capture=False, in_memory_capture=False, offline_snapshots=False,
+                 angles=None):
 
         self._logger = logging.getLogger(__name__)
         self._logger.setLevel(logging.INFO)
 
         states = ['STARTUP',
-                  State(name='IDLE', on_enter='on_enter_idle'),
+                  State(name='IDLE', on_enter='on_enter_idle', on_exit='on_exit_idle'),
                   State(name='AUTH', on_enter='on_enter_auth'),
                   State(name='TAKE_FIRST_PICTURE', on_enter='on_enter_take_first_picture'),
                   State(name='ANALYZE_PICTURE', on_enter='on_enter_analyze_picture'),
@@ -61,6 +66,7 @@ class PhenoboxMachine(Machine):
 
         Machine.__init__(self, states=states, send_event=True, initial="STARTUP")
         self.add_transition('initialize', 'STARTUP', 'RETURN', after=[self.after_return])
+        self.add_transition('error', 'STARTUP', 'ERROR')
 
         # ----FROM IDLE----#
         self.add_transition('start', 'IDLE', 'SETUP', after=[self.after_start], conditions=[self.valid_authentication])
@@ -73,11 +79,14 @@ class PhenoboxMachine(Machine):
         self.add_transition('error', 'TAKE_FIRST_PICTURE', 'ERROR')
         # ----FROM ANALYZE_PICTURE----#
         self.add_transition('rotate', 'ANALYZE_PICTURE', 'DRIVE', after=[self.after_rotate])
+        self.add_transition('upload', 'ANALYZE_PICTURE', 'UPLOAD', after=[self.after_upload])
         self.add_transition('error', 'ANALYZE_PICTURE', 'ERROR')
         # ----FROM SETUP----#
         self.add_transition('take_first', 'SETUP', 'TAKE_FIRST_PICTURE', after=[self.after_take_first])
+        self.add_transition('error', 'SETUP', 'ERROR')
         # ----FROM DRIVE----#
         self.add_transition('picture', 'DRIVE', 'TAKE_PICTURE', after=[self.after_picture])
+        self.add_transition('error', 'DRIVE', 'ERROR')
         # ----FROM TAKE_PICTURE----#
         self.add_transition('error', "TAKE_PICTURE", 'ERROR')
         self.add_transition('next_picture', 'TAKE_PICTURE', 'DRIVE', after=[self.after_rotate],
@@ -86,8 +95,10 @@ class PhenoboxMachine(Machine):
                             conditions=[self.enough_pictures])
         # ----FROM RETURN----#
         self.add_transition('idle', 'RETURN', 'IDLE')
+        self.add_transition('error', 'RETURN', 'ERROR')
         # ----FROM UPLOAD----#
         self.add_transition('upload_finished', 'UPLOAD', 'RETURN', after=[self.after_return])
+        self.add_transition('error', 'UPLOAD', 'ERROR')
         # ----FROM ERROR----#
         self.add_transition('restart', 'ERROR', 'SETUP', after=[self.after_start],
                             conditions=[self.valid_authentication])
@@ -103,6 +114,25 @@ class PhenoboxMachine(Machine):
         self.led_controller = led_controller
         self.image_handler = image_handler
         self.photo_count = photo_count
+        #: The angles at which pictures are taken unless the QR-Code of a plant contains its own angle plan.
+        # Defaults to the first photo_count positions of the motor controller
+        self.angles = angles if angles else motor_controller.positions[:photo_count]
+        #: The motor controller positions still to visit for the current plant in the order of travel
+        self._remaining_positions = []
+        #: Whether the angle plan of the current plant contains the origin. Otherwise the first picture is only used to
+        # read the QR-Code and is not uploaded
+        self._origin_planned = True
+        #: If True the download of a picture runs in the background while the motor drives to the next position
+        self.pipelined_capture = pipelined_capture
+        #: The running download and the angle of the last picture if pipelined_capture is enabled
+        self._pending_download = None
+        #: If True pictures are only fetched into memory and handed to the code scanner and the image handler from there
+        self.in_memory_capture = in_memory_capture
+        #: The :class:`network.SnapshotRequest` in flight for the current plant
+        self._snapshot_request = None
+        #: If True plants are still taken while the server is not reachable. The image handler creates their
+        # snapshots once it is reachable again
+        self.offline_snapshots = offline_snapshots
 
         self.auth = auth
 
@@ -112,7 +142,11 @@ class PhenoboxMachine(Machine):
     def on_enter_return(self, event):
         print(Fore.BLUE + 'Returning to Origin')
         # time.sleep(1)
-        self.motor_controller.return_to_origin()
+        try:
+            self.motor_controller.return_to_origin()
+        except MotorTimeoutError as e:
+            self._logger.error(str(e))
+            self.error(error_code=12)
 
     def after_return(self, event):
         self.idle()
@@ -123,6 +157,12 @@ class PhenoboxMachine(Machine):
         self.led_controller.switch_green(True)
         self.code_information = None
         self.plant = None
+        self._remaining_positions = []
+        # Keep the camera session alive until it is needed again
+        self.camera_controller.resume_keep_alive()
+
+    def on_exit_idle(self, event):
+        self.camera_controller.pause_keep_alive()
 
     def on_enter_auth(self, event):
         print(Fore.BLUE + 'Authenticating')
@@ -133,7 +173,7 @@ class PhenoboxMachine(Machine):
                 self.start()
             else:
                 self.error(error_code=7)
-        except ServerConnectionError as e:
+        except RequestException as e:
             self._logger.error(e.message)
             self.error(error_code=11)
 
@@ -141,7 +181,17 @@ class PhenoboxMachine(Machine):
         print(Fore.BLUE + 'Setting up')
         self.led_controller.switch_green(False)
         self.led_controller.switch_blue(True)
-        self.motor_controller.return_to_origin()
+        if self.image_handler.is_full():
+            self._logger.warning('{} plants ({} MB) are waiting for upload. Refusing new plants'.format(
+                self.image_handler.get_queued_plant_count(), self.image_handler.get_queued_bytes() // (1024 * 1024)))
+            self.error(error_code=13)
+            return
+        try:
+            self.motor_controller.return_to_origin()
+        except MotorTimeoutError as e:
+            self._logger.error(str(e))
+            self.error(error_code=12)
+            return
         self.plant = Plant()
 
     def after_start(self, event):
@@ -150,11 +200,12 @@ class PhenoboxMachine(Machine):
     def on_enter_take_first_picture(self, event):
         print(Fore.BLUE + 'Taking first picture')
         try:
-            picture_path = self.camera_controller.capture_and_download(name=str(uuid.uuid4()))
-            if picture_path is None:
+            picture = self._capture()
+            if picture is None:
                 self.error(error_code=8)
             else:
-                self.plant.add_picture(picture_path, self.motor_controller.current_angle)
+                picture_path, data = picture
+                self.plant.add_picture(picture_path, self.motor_controller.current_angle, data)
                 self.analyze()
         except ConnectionError as err:
             self._logger.error(err.message)
@@ -170,111 +221,176 @@ class PhenoboxMachine(Machine):
     def on_enter_analyze_picture(self, event):
         print(Fore.BLUE + 'Analyzing')
         path, _ = self.plant.get_first_picture()
-        self.code_information = self.code_scanner.scan_image(path)
+        self.code_information = self.code_scanner.scan_image(path, self.plant.get_picture_data(path))
 
     def after_analyze(self, event):
-        if self.code_information is not None:
-            print(Fore.CYAN + 'Decoded symbol "%s"' % str(
-                self.code_information))
-            self._logger.info(
-                'decoded symbol {}'.format(self.code_information))
-            plant_id = self.code_information
-            try:
-                s = Session()
-                graphql_address = '{}{}'.format(getattr(config, 'cfg').get('server', 'base_address'),
-                                                getattr(config, 'cfg').get('server', 'graphql_endpoint'))
-                prepped_req = self.auth.prep_post(graphql_address, data={
-                    'query': '{plant(id:"' + plant_id + '"){id index name fullName sampleGroup {name experiment {name}}}}'})
-                r = s.send(prepped_req)
-                plant = r.json()['data']['plant']
-                if plant is None:
-                    self.error(error_code=6)
-                    return
-                else:
-                    # Create Snapshot
-                    param_string = 'plantId:"{}", cameraPosition:"{}", measurementTool:"{}", phenoboxId:"{}"' \
-                        .format(plant['id'],
-                                getattr(config, 'cfg').get('box', 'camera_position'),
-                                getattr(config, 'cfg').get('box', 'measurement_tool'),
-                                getattr(config, 'cfg').get('box', 'id'))
-                    prepped_req = self.auth.prep_post(graphql_address, data={
-                        'query': 'mutation {createSnapshot(' + param_string + '){id timestampId}}'})
-                    r = s.send(prepped_req)
-                    if r.status_code != 200:
-                        # TODO get exception
-                        self._logger.info(
-                            'Unable to create Snapshot. HTML status code {}. Param String : {}'.format(
-                                r.status_code,
-                                param_string))
-                        self.error(error_code=9)
-                        return
-                        # do something
-                    resp = r.json()
-                    if resp.get('errors', None):
-                        if resp.get('errors')[0]['code'] == 409:
-                            self._logger.info('Snapshot already exists')
-                            self.error(error_code=10)
-                        else:
-                            self._logger.error(
-                                'Error while trying to create snapshot. Param String : {}. Error: {}'.format(
-                                    param_string, resp.get('errors')[0]['message']))
-                            self.error(error_code=9)
-
-                        return
-                    snapshot_id = resp['data']['createSnapshot']['id']
-                    timestamp_id = resp['data']['createSnapshot']['timestampId']
-
-                name = plant['fullName']
-                index = plant['index']
-                sample_group = plant['sampleGroup']['name']
-                experiment = plant['sampleGroup']['experiment']['name']
-                # TODO add seperate step/state to retrieve data and set plant properties
-                self.plant.experiment_name = experiment
-                self.plant.sample_group_name = sample_group
-                self.plant.name = name
-                self.plant.index = index
-                self.plant.snapshot_id = snapshot_id
-                self.plant.timestamp_id = timestamp_id
-
-            except UnableToAuthenticateError:
-                self.error(error_code=7)
-            except ServerConnectionError as e:
-                self._logger.error(e.message)
-                self.error(error_code=11)
-        else:
+        if self.code_information is None:
             self.error(error_code=1)
             return
-        self.rotate()
+        print(Fore.CYAN + 'Decoded symbol "%s"' % str(
+            self.code_information))
+        self._logger.info(
+            'decoded symbol {}'.format(self.code_information))
+        self.code_information, angles = split_angle_plan(self.code_information)
+        if angles is None:
+            angles = self.angles
+        try:
+            self._remaining_positions = plan_positions(angles, self.motor_controller)
+        except ValueError as e:
+            self._logger.error(str(e))
+            self.error(error_code=14)
+            return
+        self._origin_planned = self.motor_controller.get_angle(0) in angles
+        self.plant.plant_id = self.code_information
+        graphql_address = '{}{}'.format(getattr(config, 'cfg').get('server', 'base_address'),
+                                        getattr(config, 'cfg').get('server', 'graphql_endpoint'))
+        # The plant is looked up and its snapshot created while the remaining pictures are taken. The result is only
+        # needed once the plant is handed to the image handler
+        self._snapshot_request = SnapshotRequest(self.auth, graphql_address, self.code_information,
+                                                 getattr(config, 'cfg').get('box', 'camera_position'),
+                                                 getattr(config, 'cfg').get('box', 'measurement_tool'),
+                                                 getattr(config, 'cfg').get('box', 'id'))
+        self._snapshot_request.start()
+        if self._remaining_positions:
+            self.rotate()
+        else:
+            self.upload()
+
+    def _finish_snapshot_request(self):
+        """
+        Waits for the snapshot request and sets the plant information it returned. Transitions to the ERROR state if
+        the request failed, unless the server was not reachable and offline_snapshots is enabled. The plant is then
+        handed to the image handler without snapshot.
+
+        :return: False if the request failed, True otherwise
+        """
+        if self._snapshot_request is None:
+            return True
+        request = self._snapshot_request
+        self._snapshot_request = None
+        try:
+            snapshot = request.result()
+        except PlantNotFoundError:
+            self.error(error_code=6)
+            return False
+        except SnapshotExistsError:
+            self._logger.info('Snapshot already exists')
+            self.error(error_code=10)
+            return False
+        except ServerUnableToCreateSnapshotError as e:
+            self._logger.error(e.message)
+            self.error(error_code=9)
+            return False
+        except UnableToAuthenticateError:
+            self.error(error_code=7)
+            return False
+        except RequestException as e:
+            # Timeouts are treated like an unreachable server
+            if self.offline_snapshots:
+                self._logger.warning('Server not reachable. The snapshot of plant {} will be created later. '
+                                     '({})'.format(self.plant.plant_id, e.message))
+                print(Fore.YELLOW + 'Server not reachable. Continuing offline')
+                return True
+            self._logger.error(e.message)
+            self.error(error_code=11)
+            return False
+        except Exception as e:
+            self._logger.exception('Unexpected error while creating the snapshot of plant {}. ({})'.format(
+                self.plant.plant_id, e))
+            self.error(error_code=9)
+            return False
+        apply_snapshot(self.plant, snapshot)
+        return True
 
     def on_enter_drive(self, event):
         print(Fore.BLUE + 'Driving')
+        # Stop early instead of taking the remaining pictures if the snapshot could not be created
+        if self._snapshot_request is not None and self._snapshot_request.failed() \
+                and not self._finish_snapshot_request():
+            return
         # time.sleep(1)
-        self.motor_controller.move_to_position(self.plant.get_picture_count())
+        try:
+            self.motor_controller.move_to_position(self._remaining_positions.pop(0))
+        except MotorTimeoutError as e:
+            self._logger.error(str(e))
+            self.error(error_code=12)
 
     def after_rotate(self, event):
-        time.sleep(1)
+        # move_to_position only returns once the motor controller signals that the position has been reached
         self.picture()
 
     def on_enter_take_picture(self, event):
         print(Fore.BLUE + 'Taking picture at angle ' + str(self.motor_controller.current_angle))
         try:
-            picture_path = self.camera_controller.capture_and_download(str(uuid.uuid4()))
-            if picture_path is None:
-                self.error(error_code=6)
-            else:
-                self.plant.add_picture(picture_path, self.motor_controller.current_angle)
+            if self.pipelined_capture:
+                # The camera can only be used again once the previous download has finished
+                if not self._finish_pending_download():
+                    self.error(error_code=6)
+                    return
+                if self.in_memory_capture:
+                    download = self.camera_controller.capture_and_fetch_async(str(uuid.uuid4()))
+                else:
+                    download = self.camera_controller.capture_and_download_async(str(uuid.uuid4()))
+                self._pending_download = (download, self.motor_controller.current_angle)
+                if not self._remaining_positions and not self._finish_pending_download():
+                    self.error(error_code=6)
+                    return
                 self.next_picture()
+            else:
+                picture = self._capture()
+                if picture is None:
+                    self.error(error_code=6)
+                else:
+                    picture_path, data = picture
+                    self.plant.add_picture(picture_path, self.motor_controller.current_angle, data)
+                    self.next_picture()
         except CaptureError:
             self.error(error_code=4)
 
+    def _capture(self):
+        """
+        Takes a picture and downloads it to disk or fetches it into memory, depending on in_memory_capture
+
+        :raises CaptureError: if the camera was not able to take the photo
+
+        :return: A tuple (path, data) where data is the content of the image if it is only kept in memory and None
+            otherwise, or None if the download failed
+        """
+        name = str(uuid.uuid4())
+        if self.in_memory_capture:
+            return self.camera_controller.capture_and_fetch(name)
+        picture_path = self.camera_controller.capture_and_download(name)
+        return (picture_path, None) if picture_path is not None else None
+
+    def _finish_pending_download(self):
+        """
+        Waits for the background download of the previous picture, if there is one, and adds it to the plant
+
+        :return: False if the download failed, True otherwise
+        """
+        if self._pending_download is None:
+            return True
+        download, angle = self._pending_download
+        self._pending_download = None
+        picture_path = download.result()
+        if picture_path is None:
+            return False
+        self.plant.add_picture(picture_path, angle, download.data)
+        return True
+
     def enough_pictures(self, event):
-        return self.plant.get_picture_count() >= self.photo_count
+        return not self._remaining_positions
 
     def after_picture(self, event):
         pass
 
     def on_enter_upload(self, event):
         print(Fore.BLUE + 'Dispatching picture tasks')
+        if not self._finish_snapshot_request():
+            return
+        if not self._origin_planned:
+            # The first picture was only taken to read the QR-Code
+            self.plant.delete_picture(0)
         self.image_handler.add_plant(self.plant)
 
     # TODO rename to after_upload_dispatched
@@ -287,7 +403,12 @@ class PhenoboxMachine(Machine):
         # Reset state variables
         self.pic_count = 0
         self.code_information = None
+        # A request still in flight finishes in the background, its result is not needed anymore
+        self._snapshot_request = None
+        self._remaining_positions = []
         if self.plant is not None:
+            # Let a running download finish so that its picture gets deleted as well
+            self._finish_pending_download()
             self.plant.delete_all_pictures()
         self.plant = None
 
@@ -295,7 +416,7 @@ class PhenoboxMachine(Machine):
         self._logger.info('Machine transitioned to error state with code {}. ({})'.format(error_code, msg))
         print(Fore.RED + msg)
         self.led_controller.clear_all()
-        if error_code == 1:
+        if error_code == 1 or error_code == 14:
             self.led_controller.switch_orange(True)
         elif error_code == 2 or error_code == 6 or error_code == 7 or error_code == 9 or error_code == 11:
             self.led_controller.switch_red(True)
@@ -306,6 +427,11 @@ class PhenoboxMachine(Machine):
             self.led_controller.blink_orange()
         elif error_code == 10:
             self.led_controller.blink_blue()
+        elif error_code == 12:
+            self.led_controller.blink_red()
+        elif error_code == 13:
+            self.led_controller.blink_red()
+            self.led_controller.blink_blue()
 
     def on_exit_error(self, event):
         self.led_controller.clear_all()
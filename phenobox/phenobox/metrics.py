@@ -0,0 +1,157 @@
+import logging
+import os
+import threading
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(key, value) for key, value in sorted(labels)) + '}'
+
+
+class Metrics:
+    """
+    Thread safe registry of counters, timings and gauges which can be rendered in the Prometheus text format
+    """
+
+    def __init__(self, prefix='phenobox'):
+        self._prefix = prefix
+        self._lock = threading.Lock()
+        #: The help text and type of every metric by its name
+        self._descriptions = {}
+        #: The values by (name, labels) where labels is a tuple of (key, value) tuples. Timings store [count, sum]
+        self._values = {}
+        #: Functions which are called on rendering and return a list of (name, labels, value) tuples
+        self._collectors = []
+
+    def _describe(self, name, help_text, metric_type):
+        if name not in self._descriptions:
+            self._descriptions[name] = (help_text, metric_type)
+
+    def inc(self, name, value=1, help_text='', **labels):
+        """
+        Increments a counter
+
+        :param name: The name of the counter without prefix
+        :param value: The value to add (optional, default: 1)
+        :param help_text: The description of the counter
+        :param labels: The labels identifying the time series
+
+        :return: None
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._describe(name, help_text, 'counter')
+            self._values[key] = self._values.get(key, 0) + value
+
+    def observe(self, name, seconds, help_text='', **labels):
+        """
+        Records the duration of an operation
+
+        :param name: The name of the timing without prefix. Should end with _seconds
+        :param seconds: The duration of the operation
+        :param help_text: The description of the timing
+        :param labels: The labels identifying the time series
+
+        :return: None
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._describe(name, help_text, 'summary')
+            value = self._values.setdefault(key, [0, 0.0])
+            value[0] += 1
+            value[1] += seconds
+
+    def add_collector(self, collector, descriptions=None):
+        """
+        Registers a function which provides values that are maintained elsewhere, e.g. the length of a queue
+
+        :param collector: A function returning a list of (name, labels, value) tuples where labels is a dictionary
+        :param descriptions: A dictionary mapping the names to (help text, type) tuples (optional)
+
+        :return: None
+        """
+        with self._lock:
+            self._collectors.append(collector)
+            for name, (help_text, metric_type) in (descriptions or {}).items():
+                self._describe(name, help_text, metric_type)
+
+    def render(self):
+        """
+        Renders all metrics in the Prometheus text format
+
+        :return: The metrics as string
+        """
+        with self._lock:
+            values = dict((key, list(value) if isinstance(value, list) else value)
+                          for key, value in self._values.items())
+            collectors = list(self._collectors)
+            descriptions = dict(self._descriptions)
+        for collector in collectors:
+            for name, labels, value in collector():
+                values[(name, tuple(sorted(labels.items())))] = value
+        lines = []
+        for name in sorted(set(name for name, _ in values)):
+            full_name = '{}_{}'.format(self._prefix, name)
+            help_text, metric_type = descriptions.get(name, ('', 'gauge'))
+            lines.append('# HELP {} {}'.format(full_name, help_text))
+            lines.append('# TYPE {} {}'.format(full_name, metric_type))
+            for (value_name, labels), value in sorted(values.items()):
+                if value_name != name:
+                    continue
+                if metric_type == 'summary':
+                    lines.append('{}_count{} {}'.format(full_name, _format_labels(labels), value[0]))
+                    lines.append('{}_sum{} {}'.format(full_name, _format_labels(labels), value[1]))
+                else:
+                    lines.append('{}{} {}'.format(full_name, _format_labels(labels), value))
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsWriter(threading.Thread):
+    """
+    Background thread which periodically writes the metrics to a text file, e.g. for the textfile collector of the
+    Prometheus node exporter
+    """
+
+    def __init__(self, metrics, path, interval=15):
+        """
+
+        :param metrics: The :class:`Metrics` to write
+        :param path: The path of the text file. Should end with .prom
+        :param interval: The number of seconds between two updates of the file
+        """
+        super(MetricsWriter, self).__init__()
+        self.daemon = True
+        self._metrics = metrics
+        self._path = path
+        self._interval = interval
+        self._stop_event = threading.Event()
+        self._logger = logging.getLogger(__name__)
+        self._logger.setLevel(logging.INFO)
+
+    def stop(self):
+        self._stop_event.set()
+
+    def write(self):
+        """
+        Writes the current metrics. The file is replaced atomically so that readers never see a partial file.
+
+        :return: None
+        """
+        tmp_path = self._path + '.tmp'
+        with open(tmp_path, 'w') as metrics_file:
+            metrics_file.write(self._metrics.render())
+        os.rename(tmp_path, self._path)
+
+    def run(self):
+        while True:
+            try:
+                self.write()
+            except (IOError, OSError) as e:
+                self._logger.error('Unable to write metrics to {}. ({})'.format(self._path, e))
+            if self._stop_event.wait(self._interval):
+                break
+
+
+#: The metrics of this process
+metrics = Metrics()
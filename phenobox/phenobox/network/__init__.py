@@ -1,4 +1,4 @@
 from errors import *
 from image_handler import ImageHandler
+from snapshot_request import SnapshotRequest, create_snapshot, apply_snapshot
 from token_auth import TokenAuth
-
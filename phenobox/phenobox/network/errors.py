@@ -11,3 +11,18 @@ class ServerUnableToSaveImageError(ServerError):
 class UnableToAuthenticateError(Exception):
     def __init__(self, message='Unable to authenticate', *args):
         super(UnableToAuthenticateError, self).__init__(message, *args)
+
+
+class ServerUnableToCreateSnapshotError(ServerError):
+    def __init__(self, message, *args):
+        super(ServerUnableToCreateSnapshotError, self).__init__(message, *args)
+
+
+class SnapshotExistsError(ServerError):
+    def __init__(self, message='There already exists a snapshot for this plant and timestamp', *args):
+        super(SnapshotExistsError, self).__init__(message, *args)
+
+
+class PlantNotFoundError(ServerError):
+    def __init__(self, message='There is no plant with this id', *args):
+        super(PlantNotFoundError, self).__init__(message, *args)
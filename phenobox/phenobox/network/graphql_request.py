@@ -0,0 +1,43 @@
+import hashlib
+import json
+
+#: Errors with which the server asks for the text of a persisted query. Servers which do not support persisted
+#: queries complain about the missing query string instead
+_QUERY_REQUIRED_MESSAGES = ('PersistedQueryNotFound', 'Must provide query string.')
+
+
+def _get_error_message(r):
+    try:
+        errors = (r.json() or {}).get('errors')
+    except ValueError:
+        return None
+    if errors:
+        return errors[0].get('message')
+    return None
+
+
+def post_graphql(auth, graphql_address, query, variables=None):
+    """
+    Sends a GraphQL document as persisted query. The document itself is only sent if the server does not know it by
+    its hash yet, which happens once after the server has been set up. Since the document does not change from
+    request to request, all values have to be passed as variables.
+
+    :param auth: The :class:`network.TokenAuth` instance used to send the request
+    :param graphql_address: The address of the graphql endpoint
+    :param query: The GraphQL document
+    :param variables: The dictionary of variables used by the document
+
+    :raises UnableToAuthenticateError: if no valid authorization token could be obtained
+    :raises requests.ConnectionError: if the server is not reachable
+
+    :return: The response
+    """
+    query_hash = hashlib.sha256(query.encode('utf-8')).hexdigest()
+    data = {'extensions': json.dumps({'persistedQuery': {'version': 1, 'sha256Hash': query_hash}})}
+    if variables is not None:
+        data['variables'] = json.dumps(variables)
+    r = auth.post(graphql_address, data=data)
+    if r.status_code == 400 and _get_error_message(r) in _QUERY_REQUIRED_MESSAGES:
+        data['query'] = query
+        r = auth.post(graphql_address, data=data)
+    return r
@@ -1,18 +1,50 @@
 import errno
 import fnmatch
+import json
 import logging
 import os
+import shutil
 import threading
+import time
 from Queue import Queue, Empty
+from collections import deque
+from multiprocessing import Pool
 
-from PIL import Image
 from colorama import Fore
-from requests import Session, ConnectionError
+from requests import ConnectionError, RequestException
 
 from config import config
+from metrics import metrics
 from network import ServerUnableToSaveImageError
-from network import UnableToAuthenticateError
+from network import UnableToAuthenticateError, ServerUnableToCreateSnapshotError, SnapshotExistsError, \
+    PlantNotFoundError
+from network.graphql_request import post_graphql
+from network.snapshot_request import create_snapshot, apply_snapshot
+from phenobox_core.conversion import IMAGE_FORMAT_EXTENSIONS, get_save_options, init_worker, convert_picture
 from plant import Plant
+from plant_journal import PlantJournal
+
+#: Creates the entry of a single image
+ADD_IMAGE_MUTATION = 'mutation AddImage($snapshotId: ID!, $path: String!, $filename: String!, $angle: Int!) {' \
+                     'addImage(snapshotId: $snapshotId, path: $path, filename: $filename, angle: $angle) {id}}'
+#: Creates the entries of several images of the same snapshot
+ADD_IMAGES_MUTATION = 'mutation AddImages($snapshotId: ID!, $images: [AddImageInput]!) {' \
+                      'addImages(snapshotId: $snapshotId, images: $images) {ids}}'
+
+
+def create_conversion_pool(conversion_workers=None):
+    """
+    Creates the process pool which converts the pictures. The pool forks its worker processes, which must happen
+    before any other thread of the box is started: A thread holding a lock at the moment of the fork leaves the lock
+    held forever in the child.
+
+    :param conversion_workers: The number of worker processes. Defaults to the conversion_workers config option
+
+    :return: The pool
+    """
+    if conversion_workers is None:
+        conversion_workers = config.get_option('box', 'conversion_workers', 1, 'getint')
+    return Pool(processes=max(1, conversion_workers), initializer=init_worker)
 
 
 class ImageHandler(threading.Thread):
@@ -20,17 +52,63 @@ class ImageHandler(threading.Thread):
     Background thread to handle image conversion and upload to the network share
     """
 
-    def __init__(self, auth, local_dir=None, persist_dir=None, target_dir=None, photo_count=6):
+    def __init__(self, auth, local_dir=None, persist_dir=None, target_dir=None, photo_count=6,
+                 conversion_workers=None, fast_decode=None, max_queued_plants=None, max_queued_megabytes=None,
+                 pool=None):
         super(ImageHandler, self).__init__()
         self._stop = threading.Event()
         self._logger = logging.getLogger(__name__)
         self._logger.setLevel(logging.INFO)
         self._photo_count = photo_count
+        if conversion_workers is None:
+            conversion_workers = config.get_option('box', 'conversion_workers', 1, 'getint')
+        #: The number of worker processes used to convert pictures. Up to this many plants are converted at once
+        self._conversion_workers = max(1, conversion_workers)
+        if fast_decode is None:
+            fast_decode = config.get_option('box', 'fast_decode', False, 'getboolean')
+        #: Whether camera images are decoded in JPEG draft mode at a reduced scale
+        self._fast_decode = fast_decode
+        image_format = config.get_option('box', 'image_format', 'png')
+        # Defaults to the level suited to the format
+        compression_level = config.get_option('box', 'compression_level', None, 'getint')
+        optimize = config.get_option('box', 'optimize', False, 'getboolean')
+        #: The pillow save options and the file extension used for the converted images. Checks the format first
+        self._save_options = get_save_options(image_format, compression_level, optimize)
+        self._image_extension = IMAGE_FORMAT_EXTENSIONS[image_format]
+        if pool is None:
+            pool = create_conversion_pool(self._conversion_workers)
+        #: The process pool which converts the pictures (See :func:`.create_conversion_pool`)
+        self._pool = pool
+        #: Plants whose pictures have been handed to the conversion pool, in the order they were dequeued
+        self._in_flight = deque()
         self._auth = auth
+        #: Whether all pictures of a plant are registered on the server with a single addImages request
+        self._batch_registration = config.get_option('server', 'batch_registration', False, 'getboolean')
         self._graphql_address = '{}{}'.format(getattr(config, 'cfg').get('server', 'base_address'),
                                               getattr(config, 'cfg').get('server', 'graphql_endpoint'))
         #: A queue which holds all the plant instances which need to be processed
         self.queue = Queue()
+        #: Plants which were taken while the server was not reachable and still need their snapshot to be created
+        self._pending = deque()
+        #: Seconds between two attempts to create the snapshots of the pending plants
+        self._reconcile_interval = config.get_option('server', 'reconcile_interval', 30, 'getfloat')
+        self._last_reconcile = 0
+        #: Seconds to wait before a plant whose upload failed is tried again
+        self._retry_delay = config.get_option('server', 'retry_delay', 10, 'getfloat')
+        #: The number of failed attempts after which the upload of a plant is given up. 0 for no limit
+        self._max_retries = config.get_option('server', 'max_retries', 10, 'getint')
+        #: The number of failed upload attempts by plant id
+        self._retries = {}
+        #: Plants whose upload failed as (due, plant) tuples. They are enqueued again once the time due has passed
+        self._delayed = deque()
+        if max_queued_plants is None:
+            max_queued_plants = config.get_option('box', 'max_queued_plants', 0, 'getint')
+        #: The number of plants waiting for upload at which no more plants should be added. 0 for no limit
+        self.max_queued_plants = max_queued_plants
+        if max_queued_megabytes is None:
+            max_queued_megabytes = config.get_option('box', 'max_queued_megabytes', 0, 'getint')
+        #: The size of the pictures waiting for upload at which no more plants should be added. 0 for no limit
+        self.max_queued_bytes = max_queued_megabytes * 1024 * 1024
         if local_dir is None:
             self.source_path = getattr(config, 'cfg').get('box', 'local_image_folder')
         else:
@@ -57,6 +135,8 @@ class ImageHandler(threading.Thread):
         except OSError as exception:
             if exception.errno != errno.EEXIST:
                 raise
+        #: The journal of all plants which have not been uploaded completely
+        self.journal = PlantJournal(os.path.join(self.persist_dir, 'plants.journal'))
 
     def stop(self):
         """
@@ -74,44 +154,109 @@ class ImageHandler(threading.Thread):
         """
         return self._stop.isSet()
 
-    def read_from_disk(self, basepath):
+    def _migrate_legacy_files(self, basepath):
         """
-        Loads all persisted entries from the filesystem and enqueues them to continue uploading
+        Moves the plants persisted as single json files by earlier versions to the journal
 
-        :param basepath: The path where all persisted plant files are located
+        :param basepath: The path where the json files are located
 
         :return: None
         """
         for entry in os.listdir(basepath):
-            if os.path.isfile(os.path.join(basepath, entry)) and fnmatch.fnmatch(entry, '*.json'):
-                self._logger.info('Loading {} from disk for processing'.format(entry))
-                plant = Plant.load(os.path.join(basepath, entry))
-                self.add_plant(plant)
-                # os.remove(os.path.join(basepath, entry))
+            path = os.path.join(basepath, entry)
+            if os.path.isfile(path) and fnmatch.fnmatch(entry, '*.json'):
+                self._logger.info('Moving {} to the journal'.format(entry))
+                self.journal.put(Plant.load_legacy(path))
+                os.remove(path)
+
+    def read_from_disk(self, basepath):
+        """
+        Loads all journaled plants and enqueues them to continue uploading
+
+        :param basepath: The path where the journal is located
+
+        :return: None
+        """
+        self._migrate_legacy_files(basepath)
+        plants = self.journal.load()
+        self._logger.info('Loaded {} plants from the journal'.format(len(plants)))
+        for plant in plants:
+            dropped = plant.drop_missing_pictures()
+            if dropped > 0:
+                self._logger.warning('{} pictures of plant {} are missing'.format(dropped, plant.name))
+            if plant.get_picture_count() == 0:
+                self.journal.remove(plant)
+                continue
+            self.queue.put(plant)
+
+    def _persist(self, plant):
+        """
+        Writes the pictures of the plant which are only kept in memory to disk and stores the plant in the journal
+
+        :param plant: The plant to persist
+
+        :return: None
+        """
+        self._logger.info('Persisting plant {}'.format(plant.name))
+        plant.write_pictures()
+        self.journal.put(plant)
 
     def add_plant(self, plant):
         """
-        Enqueue the plant instance to be processed
+        Enqueue the plant instance to be processed.
+        The pictures which are only kept in memory are written to disk and the plant is stored in the journal before it
+        is enqueued, so that it survives a crash.
 
         :param plant: The plant instance to be enqueued
 
         :return: None
         """
+        plant.write_pictures()
+        self.journal.put(plant)
         self.queue.put(plant)
 
-    def _get_img(self, path):
+    def _get_queued_plants(self):
+        with self.queue.mutex:
+            plants = list(self.queue.queue)
+        plants.extend(plant for plant, _, _ in list(self._in_flight))
+        plants.extend(list(self._pending))
+        plants.extend(plant for _, plant in list(self._delayed))
+        return plants
+
+    def get_queued_plant_count(self):
+        """
+        Returns the number of plants which are waiting for or being processed
+
+        :return: The number of plants
+        """
+        return self.queue.qsize() + len(self._in_flight) + len(self._pending) + len(self._delayed)
+
+    def get_pending_plant_count(self):
+        """
+        Returns the number of plants which were taken while the server was not reachable and still wait for their
+        snapshot
+
+        :return: The number of plants
+        """
+        return len(self._pending)
+
+    def get_queued_bytes(self):
         """
-        Utility method to get an appropriately sized Image instance from the given path
+        Returns the size of the pictures of all plants which are waiting for or being processed
 
-        :param path: The full path to the image file
+        :return: The size in bytes
+        """
+        return sum(plant.get_picture_size() for plant in self._get_queued_plants())
 
-        :return: A pillow.Image instance
+    def is_full(self):
         """
-        img = Image.open(path)
+        Indicates whether one of the high water marks max_queued_plants and max_queued_bytes has been reached
 
-        img = img.rotate(90, expand=True)
-        width, height = img.size
-        return img.resize((int(width / 6.5), int(height / 6.5)), Image.ANTIALIAS)
+        :return: True if no more plants should be added, False otherwise
+        """
+        if 0 < self.max_queued_plants <= self.get_queued_plant_count():
+            return True
+        return 0 < self.max_queued_bytes <= self.get_queued_bytes()
 
     def _notify_server(self, path, snapshot_id, filename, angle):
         """
@@ -128,28 +273,339 @@ class ImageHandler(threading.Thread):
         """
         target_path = '{}/{}'.format(getattr(config, 'cfg').get('server', 'shared_folder_url'),
                                      path)
-        param_string = 'snapshotId: "{}", path:"{}", filename:"{}",angle:{}'.format(snapshot_id,
-                                                                                    target_path,
-                                                                                    filename,
-                                                                                    str(angle))
-        # TODO check if possible to create session outside and pass it in to reuse
-        s = Session()
-
-        prepped_req = self._auth.prep_post(self._graphql_address, data={
-            'query': 'mutation{addImage(' + param_string + '){ok}}'})
-        r = s.send(prepped_req)
+        self._send_mutation(ADD_IMAGE_MUTATION, {'snapshotId': snapshot_id, 'path': target_path, 'filename': filename,
+                                                 'angle': int(angle)})
+
+    def _notify_server_batch(self, path, snapshot_id, images):
+        """
+        Utility method to create the entries of several images of the same snapshot on the server with one request.
+
+        :param path: The path to the image folder relative to the NFS mount point
+        :param snapshot_id: The snapshot ID the images belong to
+        :param images: A list of (filename, angle) tuples
+
+        :raises ServerUnableToSaveImageError: if the server returns a negative response because it was not able to
+            create the according entries. In this case none of the images has been created
+        :return: None
+        """
+        target_path = '{}/{}'.format(getattr(config, 'cfg').get('server', 'shared_folder_url'),
+                                     path)
+        image_inputs = [{'path': target_path, 'filename': filename, 'angle': int(angle)} for filename, angle in images]
+        self._send_mutation(ADD_IMAGES_MUTATION, {'snapshotId': snapshot_id, 'images': image_inputs})
+
+    def _send_mutation(self, query, variables):
+        """
+        Sends the given mutation to the server using the session shared by all authenticated requests
+
+        :param query: The GraphQL mutation
+        :param variables: The dictionary of variables used by the mutation
+
+        :raises ServerUnableToSaveImageError: if the server returns a negative response
+        :return: None
+        """
+        start = time.time()
+        r = post_graphql(self._auth, self._graphql_address, query, variables)
+        metrics.observe('stage_seconds', time.time() - start, 'Duration of the processing stages of a picture',
+                        stage='register')
         if r.status_code != 200:
-            raise ServerUnableToSaveImageError('Unable to create image instance on server. Http status {}')
+            raise ServerUnableToSaveImageError(
+                'Unable to create image instance on server. Http status {}'.format(r.status_code))
         resp = r.json()
         if resp.get('errors', None):
             self._logger.error(resp.get('errors')[0]['message'])
             raise ServerUnableToSaveImageError('Unable to create image instance on server. {}'.format(
                 resp.get('errors')[0]['message']))
 
+    def _register_pictures(self, shared_path, plant, pictures):
+        """
+        Creates the server entries for the given converted pictures and removes them from the plant afterwards
+
+        :param shared_path: The path to the image folder relative to the NFS mount point
+        :param plant: The plant the pictures belong to. The pictures have to be the first ones of the plant
+        :param pictures: A list of (filename, angle, dest) tuples of the converted pictures
+
+        :return: None
+        """
+        if self._batch_registration:
+            self._notify_server_batch(shared_path, plant.snapshot_id,
+                                      [(filename, angle) for filename, angle, _ in pictures])
+        else:
+            for filename, angle, _ in pictures:
+                self._notify_server(shared_path, plant.snapshot_id, filename, angle)
+        metrics.inc('uploaded_pictures_total', len(pictures), 'Pictures which have been registered on the server')
+        for _ in pictures:
+            print(Fore.YELLOW + 'Saved')
+            # The current picture is always at index 0 because the previous one is deleted before
+            plant.delete_picture(0)
+
+    def _prepare_plant(self, plant):
+        """
+        Creates the destination folder for the given plant and submits the conversion of all its pictures to the
+        conversion pool
+
+        :param plant: The plant instance whose pictures should be converted
+
+        :return: A tuple (plant, shared_path, conversions) or None if the destination folder could not be created. The
+            conversions are a list of (picture, filename, dest, async_result) tuples in the order of plant.pictures
+        """
+        shared_path = os.path.join(plant.experiment_name,
+                                   plant.date.strftime("%Y_%m_%d"), str(hash(plant.timestamp_id)))
+        dest_dir = os.path.join(self.target_path, shared_path)
+        try:
+            os.makedirs(dest_dir)
+        except OSError as exception:
+            if exception.errno != errno.EEXIST:
+                self._logger.exception(
+                    'Unable to create folder ({}). (errno: {})'.format(dest_dir, exception.errno))
+                print(Fore.RED + 'error during mkdirs')
+                # TODO send notification to admin
+                # TODO bailout?
+                self._retry(plant, 'share')
+                return None
+                # raise
+        conversions = list()
+        for picture in list(plant.pictures):
+            path, angle = picture
+            filename = '{name}_{angle}.{extension}'.format(
+                name=plant.name.replace(" ", "_"),
+                angle=str(angle),
+                extension=self._image_extension)
+            dest = os.path.join(dest_dir, filename)
+            result = self._pool.apply_async(convert_picture, (path, dest, self._fast_decode, self._save_options,
+                                                               plant.get_picture_data(path)))
+            conversions.append((picture, filename, dest, result))
+        return plant, shared_path, conversions
+
+    def _fill_pipeline(self):
+        """
+        Takes plants from the queue and hands them to the conversion pool until there are as many plants in flight
+        as there are conversion workers. Only blocks if there is no plant in flight at all. Plants whose retry is due
+        are enqueued again first.
+
+        :return: None
+        """
+        while len(self._delayed) > 0 and self._delayed[0][0] <= time.time():
+            _, plant = self._delayed.popleft()
+            self.queue.put(plant)
+        while len(self._in_flight) < self._conversion_workers:
+            try:
+                plant = self.queue.get(block=len(self._in_flight) == 0, timeout=2)
+            except Empty:
+                return
+            if not plant.has_snapshot():
+                self._defer(plant)
+                self.queue.task_done()
+                continue
+            entry = self._prepare_plant(plant)
+            if entry is None:
+                self.queue.task_done()
+                continue
+            self._in_flight.append(entry)
+
+    def _defer(self, plant):
+        """
+        Keeps a plant whose snapshot does not exist yet until the server is reachable again. Its pictures are written to
+        disk as this can take a while.
+
+        :param plant: The plant without snapshot
+
+        :return: None
+        """
+        self._logger.info('Deferring plant {} until its snapshot can be created'.format(plant.plant_id))
+        self._persist(plant)
+        self._pending.append(plant)
+
+    def _reconcile(self):
+        """
+        Tries to create the snapshots of all pending plants and enqueues the plants whose snapshot has been created
+        for upload. Does nothing if the last attempt was less than reconcile_interval seconds ago.
+        Plants which cannot get a snapshot because it exists already or because the plant is unknown are reported as
+        conflicts. Other failures are retried with the next attempt.
+
+        :return: None
+        """
+        if len(self._pending) == 0 or time.time() - self._last_reconcile < self._reconcile_interval:
+            return
+        self._last_reconcile = time.time()
+        camera_position = getattr(config, 'cfg').get('box', 'camera_position')
+        measurement_tool = getattr(config, 'cfg').get('box', 'measurement_tool')
+        phenobox_id = getattr(config, 'cfg').get('box', 'id')
+        while len(self._pending) > 0 and not self.stopped():
+            plant = self._pending[0]
+            try:
+                snapshot = create_snapshot(self._auth, self._graphql_address, plant.plant_id, camera_position,
+                                           measurement_tool, phenobox_id)
+            except SnapshotExistsError:
+                self._pending.popleft()
+                self._report_conflict(plant, 'snapshot_exists')
+                continue
+            except PlantNotFoundError:
+                self._pending.popleft()
+                self._report_conflict(plant, 'plant_not_found')
+                continue
+            except (ServerUnableToCreateSnapshotError, UnableToAuthenticateError, RequestException) as e:
+                self._logger.warning('Unable to create the snapshots of {} pending plants. ({})'.format(
+                    len(self._pending), e.message))
+                return
+            self._pending.popleft()
+            apply_snapshot(plant, snapshot)
+            self._logger.info('Created snapshot for pending plant {}'.format(plant.name))
+            metrics.inc('reconciled_plants_total', 1, 'Plants whose snapshot was created after they were taken')
+            self.add_plant(plant)
+
+    def _report_conflict(self, plant, reason):
+        """
+        Moves the pictures of a plant whose snapshot could not be created or whose upload failed too often to the
+        conflicts folder next to the journal and describes the plant in a conflict.json file, so that they can be
+        reviewed and uploaded manually. Pictures which are missing are listed as missing_pictures, pictures which
+        cannot be moved are listed with their original path.
+        If the conflicts folder cannot be created the plant is left in the journal and taken up again after a restart.
+
+        :param plant: The plant which cannot be uploaded
+        :param reason: The reason why the plant cannot be uploaded
+
+        :return: None
+        """
+        conflict_dir = os.path.join(self.persist_dir, 'conflicts', plant.id)
+        try:
+            os.makedirs(conflict_dir)
+        except OSError as exception:
+            if exception.errno != errno.EEXIST:
+                self._logger.exception('Unable to create the conflicts folder of plant {} ({}). (errno: {})'.format(
+                    plant.plant_id, conflict_dir, exception.errno))
+                return
+        pictures = list()
+        missing_pictures = list()
+        for path, angle in plant.get_pictures():
+            if not os.path.isfile(path):
+                missing_pictures.append([path, angle])
+                continue
+            dest = os.path.join(conflict_dir, os.path.basename(path))
+            try:
+                # Unlike os.rename also works if the pictures are on another filesystem than the journal
+                shutil.move(path, dest)
+            except (IOError, OSError) as e:
+                self._logger.error('Unable to move picture {} to {}. ({})'.format(path, conflict_dir, e))
+                dest = path
+            pictures.append([dest, angle])
+        try:
+            with open(os.path.join(conflict_dir, 'conflict.json'), 'w') as conflict_file:
+                json.dump({'plant_id': plant.plant_id, 'reason': reason, 'date': plant.date.isoformat(),
+                           'pictures': pictures, 'missing_pictures': missing_pictures}, conflict_file)
+        except IOError as e:
+            self._logger.error('Unable to describe the conflict of plant {}. ({})'.format(plant.plant_id, e))
+        plant.pictures = []
+        self.journal.remove(plant)
+        metrics.inc('conflicts_total', 1, 'Plants which could not be uploaded and were moved to the conflicts folder',
+                    reason=reason)
+        print(Fore.RED + 'Unable to upload plant {} ({}). Pictures moved to {}'.format(
+            plant.plant_id, reason, conflict_dir))
+        self._logger.error('Unable to upload plant {} ({}). Pictures moved to {}'.format(
+            plant.plant_id, reason, conflict_dir))
+
+    def _retry(self, plant, reason):
+        """
+        Enqueues the plant again after its processing failed. The plant is only taken up again by
+        :meth:`._fill_pipeline` after retry_delay seconds, so that the share or the server are not hammered while they
+        are not available. The other plants are processed meanwhile. The plant is still in the journal, so it is not
+        stored again.
+        After max_retries failed attempts the plant is given up and reported as conflict, so that a plant which can
+        never be uploaded, e.g. because of a corrupt picture, does not block the queue forever.
+
+        :param plant: The plant to retry
+        :param reason: The reason of the failure used as label of the retry counter
+
+        :return: None
+        """
+        retries = self._retries.get(plant.id, 0) + 1
+        if 0 < self._max_retries < retries:
+            self._retries.pop(plant.id, None)
+            self._report_conflict(plant, 'too_many_retries')
+            return
+        self._retries[plant.id] = retries
+        metrics.inc('retries_total', 1, 'Plants which were enqueued again after a failure', reason=reason)
+        self._delayed.append((time.time() + self._retry_delay, plant))
+
+    def _finish_plant(self, entry):
+        """
+        Waits for the converted pictures of the plant in the order they were taken and registers them on the server,
+        either one by one or all at once if batch registration is enabled.
+        If a picture fails the plant is enqueued again and its remaining pictures are left for the next attempt.
+
+        :param entry: The tuple returned by :meth:`._prepare_plant`
+
+        :return: None
+        """
+        plant, shared_path, conversions = entry
+        pending = list()
+        try:
+            for picture, filename, dest, result in conversions:
+                if self.stopped():
+                    break
+                _, angle = picture
+                _, timings, size = result.get()
+                for stage, seconds in timings.items():
+                    metrics.observe('stage_seconds', seconds, 'Duration of the processing stages of a picture',
+                                    stage=stage)
+                metrics.inc('written_bytes_total', size, 'Bytes of converted pictures written to the network share')
+                pending.append((filename, angle, dest))
+                if not self._batch_registration:
+                    self._register_pictures(shared_path, plant, pending)
+                    pending = list()
+            if len(pending) > 0:
+                self._register_pictures(shared_path, plant, pending)
+            if plant.get_picture_count() == 0:
+                metrics.inc('uploaded_plants_total', 1, 'Plants whose pictures have all been uploaded')
+            if self.stopped() and plant.get_picture_count() > 0:
+                print(Fore.YELLOW + 'Persist current plant')
+                self._persist(plant)
+        except KeyError as e:
+            self._logger.exception('Key Error while saving picture. msg: {}'.format(e.message))
+            print(Fore.RED + e.message)
+            self._retry(plant, 'key_error')
+        except IOError as e:
+            self._logger.exception('IO Error while saving picture. msg: {}'.format(e.message))
+            print(Fore.RED + e.message)
+            self._retry(plant, 'io_error')
+        except UnableToAuthenticateError as e:
+            for _, _, dest in pending:
+                try:
+                    os.remove(dest)
+                except OSError:
+                    pass
+            self._logger.error(e.message)
+            self._retry(plant, 'authentication')
+        except ServerUnableToSaveImageError as e:
+            # TODO Inform user or admin
+            print(Fore.RED + e.message)
+            self._logger.error(e.message)
+            self._retry(plant, 'server')
+        except ConnectionError as e:
+            print(Fore.RED + e.message)
+            self._logger.error(e.message)
+            self._retry(plant, 'connection')
+        except Exception as e:
+            # A failed conversion, an unexpected response, ... must not stop the only upload thread
+            self._logger.exception('Unexpected error while uploading plant {}. msg: {}'.format(plant.name, e))
+            print(Fore.RED + 'Unexpected error while uploading plant {}'.format(plant.name))
+            self._retry(plant, 'unexpected')
+
+        if plant.get_picture_count() > 0:
+            print(Fore.YELLOW + str(plant.get_picture_count()) + " images remaining for plant {}".format(plant.name))
+        else:
+            self._retries.pop(plant.id, None)
+            self.journal.remove(plant)
+
+        print(Fore.YELLOW + "Plant {} done".format(plant.name))
+        self.queue.task_done()
+        print(Fore.YELLOW + str(self.queue.qsize()) + " plants remaining")
+
     def run(self):
         """
         Main loop for this worker thread. Loads persisted plant entries from the disk on startup and then takes images
         from the queue for processing.
+        The pictures of up to conversion_workers plants are converted in parallel by a process pool, while the
+        results are registered on the server plant by plant in the order the plants were dequeued.
         If the thread is stopped it will persist all remaining plants to be able to resume work after startup again.
 
         :return: None
@@ -157,87 +613,28 @@ class ImageHandler(threading.Thread):
         self.read_from_disk(self.persist_dir)
         # TODO Check if according snapshots exist (Could be deleted in the meantime)
         while not self.stopped():
-            try:
-                plant = self.queue.get(block=True, timeout=2)
-
-                stored_pictures = list()
-
-                shared_path = os.path.join(plant.experiment_name,
-                                           plant.date.strftime("%Y_%m_%d"), str(hash(plant.timestamp_id)))
-                dest_dir = os.path.join(self.target_path, shared_path)
-                try:
-                    os.makedirs(dest_dir)
-                except OSError as exception:
-                    if exception.errno != errno.EEXIST:
-                        self._logger.exception(
-                            'Unable to create folder ({}). (errno: {})'.format(dest_dir, exception.errno))
-                        print(Fore.RED + 'error during mkdirs')
-                        # TODO send notification to admin
-                        # TODO bailout?
-                        self.add_plant(plant)
-                        continue
-                        # raise
-                pictures = list(plant.pictures)
-
-                for index, picture in enumerate(pictures):
-                    if self.stopped():
-                        print(Fore.YELLOW + 'Persist current plant')
-                        plant.persist(self.persist_dir)
-                        break
-                    path, angle = picture
-                    img = self._get_img(path)
-                    filename = '{name}_{angle}.png'.format(
-                        name=plant.name.replace(" ", "_"),
-                        angle=str(angle))
-                    dest = os.path.join(dest_dir, filename)
-                    try:
-                        img.save(dest, compress_level=9)
-                        self._notify_server(shared_path, plant.snapshot_id, filename, angle)
-                        stored_pictures.append(dest)
-                        print(Fore.YELLOW + 'Saved')
-                        # The current plant is always at index 0 because the previous one is deleted before
-                        plant.delete_picture(0)
-                    except KeyError as e:
-                        self._logger.exception('Key Error while saving picture. msg: {}'.format(e.message))
-                        print(Fore.RED + e.message)
-                        self.add_plant(plant)
-                    except IOError as e:
-                        self._logger.exception('IO Error while saving picture. msg: {}'.format(e.message))
-                        print(Fore.RED + e.message)
-                        self.add_plant(plant)
-                    except UnableToAuthenticateError as e:
-                        os.remove(dest)
-                        stored_pictures = stored_pictures[:-1]
-                        self._logger.error(e.message)
-                        self.add_plant(plant)
-                    except ServerUnableToSaveImageError as e:
-                        # TODO Inform user or admin
-                        print(Fore.RED + e.message)
-                        self._logger.error(e.message)
-                        self.add_plant(plant)
-                    except ConnectionError as e:
-                        print(Fore.RED + e.message)
-                        self._logger.error(e.message)
-                        self.add_plant(plant)
-                    if plant.get_picture_count() > 0:
-                        print(
-                                Fore.YELLOW + str(plant.get_picture_count()) + " images remaining for plant {}".format(
-                            plant.name))
-
-                if plant.get_picture_count() == 0:
-                    plant.forget(self.persist_dir)
-
-                print(Fore.YELLOW + "Plant {} done".format(plant.name))
-                self.queue.task_done()
-                print(Fore.YELLOW + str(self.queue.qsize()) + " plants remaining")
-            except Empty:
-                pass
-        print(Fore.YELLOW + "Persist remaining plants ~" + str(self.queue.qsize()))
+            self._reconcile()
+            self._fill_pipeline()
+            if len(self._in_flight) > 0:
+                self._finish_plant(self._in_flight.popleft())
+        self._pool.terminate()
+        self._pool.join()
+        print(Fore.YELLOW + "Persist remaining plants ~" + str(self.get_queued_plant_count()))
+        # Pending plants have been persisted when they were deferred
+        self._pending.clear()
+        while len(self._delayed) > 0:
+            _, plant = self._delayed.popleft()
+            self._persist(plant)
+        while len(self._in_flight) > 0:
+            plant, _, _ = self._in_flight.popleft()
+            self._persist(plant)
+            self.queue.task_done()
         while not self.queue.empty():
             try:
                 plant = self.queue.get(False)
-                plant.persist(self.persist_dir)
+                self._persist(plant)
                 self.queue.task_done()
             except Empty:
                 break
+        self.journal.close()
         print(Fore.YELLOW + "Image handler stopped")
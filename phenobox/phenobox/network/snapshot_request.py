@@ -0,0 +1,133 @@
+import threading
+
+from network import ServerUnableToCreateSnapshotError, SnapshotExistsError, PlantNotFoundError
+from network.graphql_request import post_graphql
+
+#: Creates the snapshot and returns the information about its plant which is needed for the upload
+CREATE_SNAPSHOT_MUTATION = 'mutation CreateSnapshot($plantId: ID!, $cameraPosition: String!, ' \
+                           '$measurementTool: String!, $phenoboxId: String!) {' \
+                           'createSnapshot(plantId: $plantId, cameraPosition: $cameraPosition, ' \
+                           'measurementTool: $measurementTool, phenoboxId: $phenoboxId) {id timestampId ' \
+                           'plant {id index name fullName sampleGroup {name experiment {name}}}}}'
+#: The paths of the values of the createSnapshot result which are set on the plant, by attribute name
+_SNAPSHOT_FIELDS = {
+    'experiment_name': ('plant', 'sampleGroup', 'experiment', 'name'),
+    'sample_group_name': ('plant', 'sampleGroup', 'name'),
+    'name': ('plant', 'fullName'),
+    'index': ('plant', 'index'),
+    'snapshot_id': ('id',),
+    'timestamp_id': ('timestampId',)
+}
+
+
+def create_snapshot(auth, graphql_address, plant_id, camera_position, measurement_tool, phenobox_id):
+    """
+    Looks up a plant and creates a snapshot for it with a single request
+
+    :param auth: The :class:`network.TokenAuth` instance used to send the request
+    :param graphql_address: The address of the graphql endpoint
+    :param plant_id: The id of the plant as read from its QR-Code
+    :param camera_position: The camera position of the snapshot
+    :param measurement_tool: The measurement tool of the snapshot
+    :param phenobox_id: The id of this box
+
+    :raises PlantNotFoundError: if there is no plant with the given id
+    :raises SnapshotExistsError: if the plant has already been processed for the current timestamp
+    :raises ServerUnableToCreateSnapshotError: if the server was not able to create the snapshot or its answer is
+        not as expected
+    :raises UnableToAuthenticateError: if no valid authorization token could be obtained
+    :raises requests.RequestException: if the server is not reachable or does not answer in time
+
+    :return: The plant information of the created snapshot as dictionary by attribute of :class:`plant.Plant`
+    """
+    variables = {'plantId': plant_id, 'cameraPosition': camera_position, 'measurementTool': measurement_tool,
+                 'phenoboxId': phenobox_id}
+    r = post_graphql(auth, graphql_address, CREATE_SNAPSHOT_MUTATION, variables)
+    try:
+        resp = r.json() or {}
+    except ValueError:
+        resp = {}
+    if not isinstance(resp, dict):
+        resp = {}
+    if resp.get('errors', None):
+        error = resp.get('errors')[0]
+        if not isinstance(error, dict):
+            error = {'message': error}
+        if error.get('code') == 404:
+            raise PlantNotFoundError()
+        if error.get('code') == 409:
+            raise SnapshotExistsError()
+        raise ServerUnableToCreateSnapshotError(
+            'Error while trying to create snapshot. Variables: {}. Error: {}'.format(variables, error.get('message')))
+    if r.status_code != 200:
+        raise ServerUnableToCreateSnapshotError(
+            'Unable to create Snapshot. HTML status code {}. Variables: {}'.format(r.status_code, variables))
+    snapshot = {}
+    try:
+        for attribute, path in _SNAPSHOT_FIELDS.items():
+            value = resp['data']['createSnapshot']
+            for key in path:
+                value = value[key]
+            snapshot[attribute] = value
+    except (KeyError, TypeError):
+        raise ServerUnableToCreateSnapshotError(
+            'Unexpected answer while trying to create snapshot. Variables: {}. Answer: {}'.format(variables, resp))
+    return snapshot
+
+
+def apply_snapshot(plant, snapshot):
+    """
+    Sets the information returned by :func:`create_snapshot` on the plant
+
+    :param plant: The :class:`plant.Plant` the snapshot has been created for
+    :param snapshot: The dictionary returned by :func:`create_snapshot`
+
+    :return: None
+    """
+    for attribute, value in snapshot.items():
+        setattr(plant, attribute, value)
+
+
+class SnapshotRequest(threading.Thread):
+    """
+    Sends the request of :func:`create_snapshot` in the background, so that the box can take the remaining pictures
+    while the request is in flight
+    """
+
+    def __init__(self, auth, graphql_address, plant_id, camera_position, measurement_tool, phenobox_id):
+        """
+        The parameters are passed to :func:`create_snapshot`
+        """
+        super(SnapshotRequest, self).__init__()
+        self.daemon = True
+        self._args = (auth, graphql_address, plant_id, camera_position, measurement_tool, phenobox_id)
+        self._snapshot = None
+        self._error = None
+
+    def run(self):
+        try:
+            self._snapshot = create_snapshot(*self._args)
+        except Exception as e:
+            # Handed to the thread which waits for the result
+            self._error = e
+
+    def failed(self):
+        """
+        Checks without blocking whether the request has already failed
+
+        :return: True if the request has finished with an error, False if it succeeded or is still in flight
+        """
+        return not self.is_alive() and self._error is not None
+
+    def result(self):
+        """
+        Waits for the request to finish
+
+        :raises: The exceptions of :func:`create_snapshot`
+
+        :return: The dictionary returned by :func:`create_snapshot`
+        """
+        self.join()
+        if self._error is not None:
+            raise self._error
+        return self._snapshot
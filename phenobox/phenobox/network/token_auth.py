@@ -1,9 +1,9 @@
+import threading
 import time
 import logging
 
 import jwt
-import requests
-from requests import Request
+from requests import Request, Session
 
 from network import UnableToAuthenticateError
 
@@ -24,10 +24,39 @@ class TokenAuth:
         self._refresh_url = refresh_url
         self._username = username
         self._password = password
+        #: The expiry timestamps of the current tokens. Decoded once when a token is received
+        self._id_token_exp = None
+        self._refresh_token_exp = None
+        #: Prevents concurrent requests for new tokens from the state machine, the image handler and the refresher
+        self._lock = threading.RLock()
+        self._refresher = None
+        #: Session shared by all authenticated requests so that the connection to the server is kept alive
+        self.session = Session()
         self._logger = logging.getLogger(__name__)
         self._logger.setLevel(logging.INFO)
         self._logger.info('TokenAuth instanciated')
 
+    def _set_tokens(self, id_token, refresh_token=None):
+        """
+        Stores the given tokens and caches their expiry timestamps
+
+        :param id_token: The new authentication token
+        :param refresh_token: The new refresh token. The current one is kept if this is None (optional)
+
+        :return: None
+        """
+        self._id_token = id_token
+        self._id_token_exp = self._decode_exp(id_token)
+        if refresh_token is not None:
+            self._refresh_token = refresh_token
+            self._refresh_token_exp = self._decode_exp(refresh_token)
+
+    @staticmethod
+    def _decode_exp(token):
+        if token is None:
+            return None
+        return jwt.decode(token, verify=False).get('exp')
+
     def is_authenticated(self):
         """
         Checks if there is a valid token present
@@ -52,9 +81,21 @@ class TokenAuth:
         """
         if self.is_authenticated():
             return True
-        if self.can_refresh():
-            return self.reauth()
-        return self.auth()
+        with self._lock:
+            # Another thread might have obtained a new token in the meantime
+            if self.is_authenticated():
+                return True
+            if self.can_refresh():
+                return self.reauth()
+            return self.auth()
+
+    def get_remaining_auth_time(self):
+        """
+        Returns the remaining time in seconds until the current authorization token expires
+
+        :return: The remaining time in seconds, or -1 if there is no token
+        """
+        return self.get_remaining_time(self._id_token)
 
     def can_refresh(self):
         """
@@ -76,8 +117,12 @@ class TokenAuth:
         :return: The remaining time in seconds, or -1 if the given token is None
         """
         if token is not None:
-            content = jwt.decode(token, verify=False)
-            exp = content.get('exp')
+            if token is self._id_token and self._id_token_exp is not None:
+                exp = self._id_token_exp
+            elif token is self._refresh_token and self._refresh_token_exp is not None:
+                exp = self._refresh_token_exp
+            else:
+                exp = self._decode_exp(token)
             t = time.time()
             return exp - t
         else:
@@ -92,14 +137,13 @@ class TokenAuth:
         return True
 
         payload = {'username': self._username, 'password': self._password}
-        r = requests.post(self._url,
-                          json=payload)
+        r = self.session.post(self._url,
+                              json=payload)
         if r.status_code != 200:
             return False
-        self._id_token = r.json()['access_token']
-        self._refresh_token = r.json()['refresh_token']
-        if self._id_token is None:
+        if r.json()['access_token'] is None:
             return False
+        self._set_tokens(r.json()['access_token'], r.json()['refresh_token'])
         return True
 
     def reauth(self):
@@ -109,12 +153,24 @@ class TokenAuth:
         :return: True if the reauthentication was successful, False otherwise
         """
         self._logger.debug('reauth(): URL: "%s", Token: "%s"' % (self._refresh_url, self._refresh_token))
-        r = requests.post(self._refresh_url, headers={'Authorization': 'Bearer ' + self._refresh_token})
+        r = self.session.post(self._refresh_url, headers={'Authorization': 'Bearer ' + self._refresh_token})
         if r.status_code != 200:
             return False
-        self._id_token = r.json()['access_token']
+        self._set_tokens(r.json()['access_token'])
         return True
 
+    def refresh(self):
+        """
+        Obtains a new authorization token before the current one expires, using the refresh token if it is still
+        valid
+
+        :return: True if a new token was obtained, False otherwise
+        """
+        with self._lock:
+            if self.can_refresh():
+                return self.reauth()
+            return self.auth()
+
     def prep_post(self, url, data):
         """
         Prepares a POST request which has the the Authorization header set.
@@ -133,3 +189,68 @@ class TokenAuth:
         prepped = req.prepare()
         prepped.headers['Authorization'] = 'Bearer ' + self._id_token
         return prepped
+
+    def post(self, url, data):
+        """
+        Sends an authorized POST request over the shared session
+
+        :param url: The endpoint to send the request to
+        :param data: The payload to be used
+
+        :raises UnableToAuthenticateError: if no valid authorization token is available and no new toke could be obtained
+        :raises requests.ConnectionError: if the server is not reachable
+
+        :return: The response
+        """
+        return self.session.send(self.prep_post(url, data))
+
+    def start_refresher(self, margin=60, retry_delay=30):
+        """
+        Starts a background thread which obtains a new authorization token margin seconds before the current one
+        expires, so that requests on the capture path never have to wait for the authentication
+
+        :param margin: Seconds before the expiry at which the token is renewed
+        :param retry_delay: Seconds to wait after a failed attempt
+
+        :return: None
+        """
+        self._refresher = TokenRefresher(self, margin, retry_delay)
+        self._refresher.start()
+
+    def stop_refresher(self):
+        if self._refresher is not None:
+            self._refresher.stop()
+            self._refresher = None
+
+
+class TokenRefresher(threading.Thread):
+    """
+    Background thread which renews the authorization token of a :class:`TokenAuth` before it expires
+    """
+
+    def __init__(self, auth, margin, retry_delay):
+        super(TokenRefresher, self).__init__()
+        self.daemon = True
+        self._auth = auth
+        self._margin = margin
+        self._retry_delay = retry_delay
+        self._stop_event = threading.Event()
+        self._logger = logging.getLogger(__name__)
+        self._logger.setLevel(logging.INFO)
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            remaining = self._auth.get_remaining_auth_time() - self._margin
+            if remaining > 0:
+                self._stop_event.wait(remaining)
+                continue
+            try:
+                refreshed = self._auth.refresh()
+            except Exception as e:
+                self._logger.warning('Unable to refresh the authorization token. ({})'.format(e))
+                refreshed = False
+            if not refreshed or self._auth.get_remaining_auth_time() <= self._margin:
+                self._stop_event.wait(self._retry_delay)
@@ -1,20 +1,57 @@
 import logging
+import os
 import subprocess
 import sys
 from Queue import Queue, Empty
 from logging.handlers import RotatingFileHandler
 
+# The phenobox_core package shared with phenobox_standalone is located next to this package
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
 from colorama import init, Fore
 
 import gpio_controllers as gpio
 from camera import CameraController
 from config import config
 from event import Event
-from gpio_controllers import InputController, LedController, MotorController, DoorState, ButtonPress
-from image_processing import CodeScanner
+from gpio_controllers import InputController, LedController, MotorController, DoorState, ButtonPress, \
+    MotorTimeoutError
+from image_processing import CodeScanner, DEFAULT_SCALES
 from machine import PhenoboxMachine
+from metrics import metrics, MetricsWriter
 from network import TokenAuth
-from network.image_handler import ImageHandler
+from network.image_handler import ImageHandler, create_conversion_pool
+from phenobox_core.angle_plan import parse_angles
+
+
+def _collect_metrics(camera_controller, scanner, image_handler):
+    """
+    Collects the values of the metrics which are maintained by the components themselves
+
+    :return: A list of (name, labels, value) tuples as expected by :meth:`metrics.Metrics.add_collector`
+    """
+    values = [('upload_queue_plants', {}, image_handler.get_queued_plant_count()),
+              ('pending_snapshots', {}, image_handler.get_pending_plant_count())]
+    camera_statistics = camera_controller.get_statistics()
+    for operation in ('connect', 'capture', 'download', 'probe'):
+        count, total, _ = camera_statistics[operation]
+        values.append(('camera_seconds', {'operation': operation}, [count, total]))
+    values.append(('camera_failures_total', {'operation': 'connect'}, camera_statistics['failed_connects']))
+    values.append(('camera_failures_total', {'operation': 'probe'}, camera_statistics['failed_probes']))
+    scanner_statistics = scanner.get_statistics()
+    values.append(('qr_scans_total', {}, scanner_statistics['scans']))
+    values.append(('qr_hits_total', {}, scanner_statistics['hits']))
+    return values
+
+
+_COLLECTED_METRICS = {
+    'upload_queue_plants': ('Plants waiting for or being uploaded', 'gauge'),
+    'pending_snapshots': ('Plants waiting for their snapshot to be created', 'gauge'),
+    'camera_seconds': ('Duration of the camera operations', 'summary'),
+    'camera_failures_total': ('Failed camera operations', 'counter'),
+    'qr_scans_total': ('Pictures scanned for a QR-Code', 'counter'),
+    'qr_hits_total': ('Pictures in which a QR-Code was found', 'counter')
+}
 
 
 class Phenobox():
@@ -62,6 +99,8 @@ class Phenobox():
                     print(Fore.RED + "Please close the door before starting!")
 
     def initialize(self):
+        # Forked before the LED, camera, token and metrics threads are started
+        conversion_pool = create_conversion_pool()
         formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
         file_handler = RotatingFileHandler(getattr(config, 'cfg').get('box', 'log_file'), maxBytes=5242880,
                                            backupCount=4)
@@ -77,11 +116,26 @@ class Phenobox():
         led_controller.initialize()
         led_controller.blink_green(1)
         led_controller.blink_blue(1)
-        scanner = CodeScanner()
+        fast_decode = config.get_option('box', 'fast_decode', False, 'getboolean')
+        qr_scales = config.get_option('box', 'qr_scales')
+        scanner = CodeScanner(fast_decode=fast_decode,
+                              scales=[float(scale) for scale in qr_scales.split(',')] if qr_scales else DEFAULT_SCALES)
         camera_controller = CameraController()
         camera_controller.initialize()
-        motor_controller = MotorController()
-        motor_controller.initialize()
+        camera_controller.start_keep_alive()
+        motor_controller = MotorController(settle_time=config.get_option('motor', 'settle_time', 0.4, 'getfloat'),
+                                           position_settle_time=config.get_option('motor', 'position_settle_time', 0.4,
+                                                                                  'getfloat'),
+                                           timeout=config.get_option('motor', 'timeout', 30, 'getfloat'),
+                                           positions=parse_angles(config.get_option('motor', 'positions',
+                                                                                    '0,60,120,180,240,300')))
+        motor_ready = True
+        try:
+            motor_controller.initialize()
+        except MotorTimeoutError as e:
+            # Signalled on the LEDs by the ERROR state of the machine
+            logging.getLogger(__name__).error('Unable to initialize the motor. ({})'.format(e))
+            motor_ready = False
 
         base_address = getattr(config, 'cfg').get('server', 'base_address')
         auth_address = '{}{}'.format(base_address, getattr(config, 'cfg').get('server', 'auth_endpoint'))
@@ -91,15 +145,31 @@ class Phenobox():
                          username=getattr(config, 'cfg').get('credentials', 'username'),
                          password=getattr(config, 'cfg').get(
                              'credentials', 'password'))
+        auth.start_refresher(config.get_option('server', 'token_refresh_margin', 60, 'getfloat'))
 
-        image_handler = ImageHandler(photo_count=photo_count, auth=auth)
+        image_handler = ImageHandler(photo_count=photo_count, auth=auth, fast_decode=fast_decode,
+                                     pool=conversion_pool)
         image_handler.setDaemon(True)
         image_handler.start()
 
+        pipelined_capture = config.get_option('box', 'pipelined_capture', False, 'getboolean')
         phenobox_machine = PhenoboxMachine(camera_controller, scanner, motor_controller, led_controller, image_handler,
                                            auth,
-                                           photo_count)
-        phenobox_machine.initialize()
+                                           photo_count, pipelined_capture,
+                                           config.get_option('box', 'in_memory_capture', False, 'getboolean'),
+                                           config.get_option('server', 'offline_snapshots', False, 'getboolean'),
+                                           parse_angles(config.get_option('box', 'angles', '')))
+        if motor_ready:
+            phenobox_machine.initialize()
+        else:
+            phenobox_machine.error(error_code=12)
+
+        metrics.add_collector(lambda: _collect_metrics(camera_controller, scanner, image_handler), _COLLECTED_METRICS)
+        metrics_file = config.get_option('metrics', 'textfile')
+        if metrics_file:
+            metrics_writer = MetricsWriter(metrics, metrics_file, config.get_option('metrics', 'interval', 15,
+                                                                                    'getfloat'))
+            metrics_writer.start()
         return (phenobox_machine, motor_controller, led_controller, camera_controller, image_handler)
 
     def _terminate(self):
@@ -109,6 +179,7 @@ class Phenobox():
         self.led_controller.blink_blue(interval=1)
         self.image_handler.stop()
         self.image_handler.join()
+        self.phenobox_machine.auth.stop_refresher()
         self.led_controller.clear_all()
         gpio.clean()
 
@@ -1,12 +1,26 @@
 import datetime
-import jsonpickle
-import logging
+import errno
+import json
 import os
+import uuid
 from __builtin__ import len
 
+import jsonpickle
+
+#: The version of the format returned by :meth:`Plant.to_record`
+RECORD_VERSION = 2
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
+
+class Plant(object):
+    __slots__ = ('id', 'plant_id', 'name', 'index', 'experiment_name', 'sample_group_name', 'snapshot_id',
+                 'timestamp_id', 'pictures', 'date', '_picture_data')
 
-class Plant:
     def __init__(self):
+        #: Identifies the plant in the journal
+        self.id = uuid.uuid4().hex
+        #: The id of the plant on the server as read from its QR-Code
+        self.plant_id = ""
         # TODO add full_name
         self.name = ""
         self.index = 0
@@ -15,18 +29,79 @@ class Plant:
         self.snapshot_id = ""
         self.timestamp_id = ""
         self.pictures = []
+        #: The content of pictures which have only been fetched into memory yet, by path
+        self._picture_data = {}
         self.date = datetime.datetime.now()
-        self._logger = logging.getLogger(__name__)
-        self._logger.setLevel(logging.INFO)
 
-    def add_picture(self, path, angle):
+    def add_picture(self, path, angle, data=None):
         """
         Append a new picture with the full path and the angle at which it was taken to the list of pictures
         :param path: The absolute path to the image
         :param angle: The angle at which the image was taken
+        :param data: The content of the image if it has not been written to path (optional)
         :return:
         """
         self.pictures.append((path, angle))
+        if data is not None:
+            self._picture_data[path] = data
+
+    def get_picture_data(self, path):
+        """
+        Returns the content of the picture with the given path if it is only kept in memory
+
+        :param path: The absolute path of the image
+
+        :return: The content of the image or None if it has been written to path
+        """
+        return self._picture_data.get(path)
+
+    def write_pictures(self):
+        """
+        Writes all pictures which are only kept in memory to their path
+
+        :return: None
+        """
+        for path, data in self._picture_data.items():
+            try:
+                os.makedirs(os.path.dirname(path))
+            except OSError as exception:
+                if exception.errno != errno.EEXIST:
+                    raise
+            with open(path, 'wb') as picture_file:
+                picture_file.write(data)
+        self._picture_data.clear()
+
+    def drop_missing_pictures(self):
+        """
+        Removes all pictures whose image is neither kept in memory nor present on the filesystem from the list of
+        pictures, e.g. pictures which were only kept in memory when the box lost power
+
+        :return: The number of removed pictures
+        """
+        present = [(path, angle) for path, angle in self.pictures
+                   if path in self._picture_data or os.path.isfile(path)]
+        dropped = len(self.pictures) - len(present)
+        self.pictures = present
+        return dropped
+
+    def get_picture_size(self):
+        """
+        Returns the size of all pictures of this plant, whether they are kept in memory or on disk
+
+        :return: The size in bytes
+        """
+        size = 0
+        for path, _ in list(self.pictures):
+            data = self._picture_data.get(path)
+            if data is not None:
+                size += len(data)
+                continue
+            try:
+                size += os.path.getsize(path)
+            except OSError:
+                # Already uploaded and deleted
+                pass
+        return size
 
     def delete_picture(self, index):
         """
@@ -38,7 +113,10 @@ class Plant:
         """
         if index < len(self.pictures):
             pic_path, _ = self.pictures[index]
-            os.remove(pic_path)
+            if pic_path in self._picture_data:
+                del self._picture_data[pic_path]
+            else:
+                os.remove(pic_path)
             self.pictures.pop(index)
 
     def delete_all_pictures(self):
@@ -50,6 +128,15 @@ class Plant:
         for i in range(len(self.pictures) - 1, -1, -1):
             self.delete_picture(i)
 
+    def has_snapshot(self):
+        """
+        Indicates whether the snapshot of this plant has been created on the server. Plants which were taken while the
+        server was not reachable only know their plant_id.
+
+        :return: True if the snapshot exists, False otherwise
+        """
+        return self.snapshot_id != ""
+
     def get_picture_count(self):
         # TODO change to property
         return len(self.pictures)
@@ -69,46 +156,58 @@ class Plant:
         """
         return self.pictures
 
-    def forget(self, target_dir):
+    def to_record(self):
         """
-        Remove the file which was used to persist the plant information
+        Serializes the persistent information of this plant. Pictures which are only kept in memory are stored by
+        their path only.
 
-        :param target_dir: The directory in which the file is stored
-
-        :return: None
+        :return: A list of plain values which can be encoded as json
         """
-        file_path = os.path.join(target_dir, self.name + '.json')
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        return [RECORD_VERSION, self.id, self.name, self.index, self.experiment_name, self.sample_group_name,
+                self.snapshot_id, self.timestamp_id, self.date.strftime(DATE_FORMAT),
+                [[path, angle] for path, angle in self.pictures], self.plant_id]
 
-    def persist(self, target_dir):
+    @staticmethod
+    def from_record(record):
         """
-        Store the plant information as a json file to the given directory for later retrieval
+        Creates the instance from a record returned by :meth:`.to_record`
 
-        :param target_dir: The directory to which the file should be saved
+        :param record: The record
 
-        :return: None
+        :raises ValueError: if the record has an unknown version
+
+        :return: The corresponding Plant instance
         """
-        self._logger.info('Persisting plant {} to {}'.format(self.name, target_dir))
-        json = jsonpickle.encode(self)
-        dest = os.path.join(target_dir, self.name + '.json')
-        with open(dest, "w") as json_file:
-            json_file.write(json)
-            json_file.close()
-            # TODO error handling
+        if record[0] not in (1, RECORD_VERSION):
+            raise ValueError('Unknown plant record version {}'.format(record[0]))
+        plant = Plant()
+        (_, plant.id, plant.name, plant.index, plant.experiment_name, plant.sample_group_name, plant.snapshot_id,
+         plant.timestamp_id, date, pictures) = record[:10]
+        if record[0] >= 2:
+            plant.plant_id = record[10]
+        plant.date = datetime.datetime.strptime(date, DATE_FORMAT)
+        plant.pictures = [(path, angle) for path, angle in pictures]
+        return plant
 
     @staticmethod
-    def load(path):
+    def load_legacy(path):
         """
-        Loads the instance from the json file given by path
+        Loads the instance from a json file written by jsonpickle by earlier versions
 
         :param path: The absolute path to the json file in which the instance information has been stored
 
         :return: The corresponding Plant instance
         """
         with open(path) as json_file:
-            json_str = json_file.read()
-            obj = jsonpickle.decode(json_str)
-            obj._logger = logging.getLogger(__name__)
-            obj._logger.setLevel(logging.INFO)
-            return obj
+            state = json.load(json_file)
+        # Restore the attributes without restoring the class itself, which does not match the old one anymore
+        state.pop('py/object', None)
+        state.pop('_logger', None)
+        state = jsonpickle.decode(json.dumps(state))
+        plant = Plant()
+        for attribute in ('name', 'index', 'experiment_name', 'sample_group_name', 'snapshot_id', 'timestamp_id',
+                          'date'):
+            if attribute in state:
+                setattr(plant, attribute, state[attribute])
+        plant.pictures = [(picture_path, angle) for picture_path, angle in state.get('pictures', [])]
+        return plant
@@ -0,0 +1,143 @@
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from plant import Plant
+
+#: The first line of every journal file. Identifies the file and the version of its format
+JOURNAL_HEADER = 'phenobox-journal 1'
+
+_PUT = 'P'
+_REMOVE = 'R'
+
+
+class PlantJournal:
+    """
+    Append-only journal of the plants which are waiting for upload.
+
+    Every change is appended as one json line: ["P", record] stores a plant (see :meth:`Plant.to_record`) and replaces
+    an earlier entry with the same id, ["R", id] removes it. The file is compacted to the plants it contains once it
+    holds more than compact_threshold obsolete lines.
+    """
+
+    def __init__(self, path, compact_threshold=1000):
+        """
+
+        :param path: The path of the journal file
+        :param compact_threshold: The number of obsolete lines at which the journal is rewritten
+        """
+        self._logger = logging.getLogger(__name__)
+        self._logger.setLevel(logging.INFO)
+        self.path = path
+        self._compact_threshold = compact_threshold
+        self._lock = threading.Lock()
+        #: The current records by plant id in the order the plants were added
+        self._records = OrderedDict()
+        self._obsolete = 0
+        self._file = None
+
+    def load(self):
+        """
+        Reads the journal with one sequential read and compacts it. Lines which cannot be parsed, e.g. a partially
+        written last line after a power failure, are skipped.
+
+        :return: A list of the plants contained in the journal in the order they were added
+        """
+        with self._lock:
+            self._records.clear()
+            if os.path.exists(self.path):
+                with open(self.path) as journal_file:
+                    header = journal_file.readline().strip()
+                    if header != JOURNAL_HEADER:
+                        raise ValueError('Unsupported journal format "{}" in {}'.format(header, self.path))
+                    for line_number, line in enumerate(journal_file, 2):
+                        try:
+                            operation, value = json.loads(line)
+                            if operation == _PUT:
+                                self._records[value[1]] = value
+                            elif operation == _REMOVE:
+                                self._records.pop(value, None)
+                        except (ValueError, TypeError, IndexError):
+                            self._logger.warning('Skipping corrupt line {} of journal {}'.format(line_number,
+                                                                                               self.path))
+            self._compact()
+            plants = []
+            for record in self._records.values():
+                try:
+                    plants.append(Plant.from_record(record))
+                except ValueError as e:
+                    self._logger.error(e.message)
+            return plants
+
+    def put(self, plant):
+        """
+        Stores the current state of the plant
+
+        :param plant: The plant to store
+
+        :return: None
+        """
+        record = plant.to_record()
+        with self._lock:
+            if plant.id in self._records:
+                self._obsolete += 1
+            self._records[plant.id] = record
+            self._append([_PUT, record])
+
+    def remove(self, plant):
+        """
+        Removes the plant from the journal
+
+        :param plant: The plant to remove
+
+        :return: None
+        """
+        with self._lock:
+            if self._records.pop(plant.id, None) is None:
+                return
+            self._obsolete += 2
+            self._append([_REMOVE, plant.id])
+
+    def __len__(self):
+        return len(self._records)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _append(self, entry):
+        if self._obsolete >= self._compact_threshold:
+            self._compact()
+            return
+        if self._file is None:
+            new = not os.path.exists(self.path)
+            self._file = open(self.path, 'a')
+            if new:
+                self._file.write(JOURNAL_HEADER + '\n')
+        self._file.write(json.dumps(entry, separators=(',', ':')) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _compact(self):
+        """
+        Rewrites the journal so that it only contains the current records. The new file replaces the old one
+        atomically.
+
+        :return: None
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as journal_file:
+            journal_file.write(JOURNAL_HEADER + '\n')
+            for record in self._records.values():
+                journal_file.write(json.dumps([_PUT, record], separators=(',', ':')) + '\n')
+            journal_file.flush()
+            os.fsync(journal_file.fileno())
+        os.rename(tmp_path, self.path)
+        self._obsolete = 0
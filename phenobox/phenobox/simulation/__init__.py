@@ -0,0 +1,2 @@
+from gpio import SimulatedGPIO, MotorDriverSimulator, install
+from server import SimulatedServer
@@ -0,0 +1,262 @@
+"""
+Software replacement for RPi.GPIO which allows running the gpio controllers without the phenobox hardware.
+
+The simulated pins can be driven from code. :class:`MotorDriverSimulator` uses this to answer the outputs of the
+:class:`gpio_controllers.MotorController` like the LECP6 motor controller does.
+
+:func:`install` has to be called before anything imports RPi.GPIO.
+"""
+import heapq
+import itertools
+import sys
+import threading
+import time
+import types
+
+
+class SimulatedGPIO(object):
+    """
+    Implements the parts of the RPi.GPIO interface which are used by the phenobox
+    """
+    BCM = 11
+    BOARD = 10
+
+    OUT = 0
+    IN = 1
+
+    LOW = 0
+    HIGH = 1
+
+    PUD_OFF = 20
+    PUD_DOWN = 21
+    PUD_UP = 22
+
+    RISING = 31
+    FALLING = 32
+    BOTH = 33
+
+    def __init__(self):
+        self._lock = threading.Condition()
+        #: The current level of each pin which has been set up
+        self._levels = {}
+        #: The registered edge detections as dictionary channel -> (edge, [callbacks])
+        self._detections = {}
+        #: The channels on which an edge has been detected since the last call of event_detected
+        self._detected = set()
+        #: Callbacks which get called with (channel, level) whenever an output changes its level
+        self._output_listeners = []
+
+    def setmode(self, mode):
+        pass
+
+    def setwarnings(self, flag):
+        pass
+
+    def setup(self, channel, direction, pull_up_down=None, initial=None):
+        with self._lock:
+            if initial is not None:
+                self._levels[channel] = initial
+            elif pull_up_down == self.PUD_UP:
+                self._levels[channel] = self.HIGH
+            else:
+                self._levels.setdefault(channel, self.LOW)
+
+    def input(self, channel):
+        with self._lock:
+            return self._levels.get(channel, self.LOW)
+
+    def output(self, channel, state):
+        self._set_level(channel, self.HIGH if state else self.LOW)
+        for listener in list(self._output_listeners):
+            listener(channel, self.HIGH if state else self.LOW)
+
+    def add_event_detect(self, channel, edge, callback=None, bouncetime=None):
+        with self._lock:
+            if channel in self._detections:
+                raise RuntimeError('Conflicting edge detection already enabled for this GPIO channel')
+            self._detections[channel] = (edge, [callback] if callback is not None else [])
+
+    def add_event_callback(self, channel, callback):
+        with self._lock:
+            if channel not in self._detections:
+                raise RuntimeError('Add event detection using add_event_detect first before adding a callback')
+            self._detections[channel][1].append(callback)
+
+    def remove_event_detect(self, channel):
+        with self._lock:
+            self._detections.pop(channel, None)
+            self._detected.discard(channel)
+
+    def event_detected(self, channel):
+        with self._lock:
+            if channel in self._detected:
+                self._detected.discard(channel)
+                return True
+            return False
+
+    def wait_for_edge(self, channel, edge, bouncetime=None, timeout=None):
+        """
+        Blocks until the given edge occurred on the channel
+
+        :param timeout: The timeout in milliseconds. None to wait forever
+
+        :return: The channel or None if the timeout was reached
+        """
+        with self._lock:
+            if channel in self._detections:
+                raise RuntimeError('Conflicting edge detection already enabled for this GPIO channel')
+            start_level = self._levels.get(channel, self.LOW)
+            deadline = None if timeout is None else time.time() + timeout / 1000.0
+            while True:
+                level = self._levels.get(channel, self.LOW)
+                if level != start_level and self._matches(edge, level):
+                    return channel
+                start_level = level
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._lock.wait(remaining)
+
+    def cleanup(self, channel=None):
+        with self._lock:
+            if channel is None:
+                self._levels.clear()
+                self._detections.clear()
+                self._detected.clear()
+            else:
+                self._levels.pop(channel, None)
+                self._detections.pop(channel, None)
+                self._detected.discard(channel)
+
+    def add_output_listener(self, listener):
+        """
+        Registers a function which gets called with (channel, level) every time an output is set
+
+        :param listener: The function to call
+
+        :return: None
+        """
+        self._output_listeners.append(listener)
+
+    def drive_input(self, channel, level):
+        """
+        Sets the level of an input pin as if it was changed by the connected hardware.
+        Fires the edge detection callbacks registered for the pin.
+
+        :param channel: The pin to change
+        :param level: The new level (HIGH or LOW)
+
+        :return: None
+        """
+        self._set_level(channel, level)
+
+    def _matches(self, edge, level):
+        return edge == self.BOTH or (edge == self.RISING and level == self.HIGH) or (
+            edge == self.FALLING and level == self.LOW)
+
+    def _set_level(self, channel, level):
+        callbacks = []
+        with self._lock:
+            previous = self._levels.get(channel, self.LOW)
+            self._levels[channel] = level
+            if previous != level:
+                detection = self._detections.get(channel)
+                if detection is not None and self._matches(detection[0], level):
+                    self._detected.add(channel)
+                    callbacks = list(detection[1])
+                self._lock.notify_all()
+        for callback in callbacks:
+            callback(channel)
+
+
+class MotorDriverSimulator(object):
+    """
+    Simulates the LECP6 motor controller connected to the pins used by :class:`gpio_controllers.MotorController`.
+
+    All responses of the controller are delayed by response_time. A movement takes move_time per position it passes.
+    """
+
+    def __init__(self, gpio, motor_controller_class, response_time=0.05, move_time=0.3, homing_time=1.0,
+                 alarm=False):
+        """
+
+        :param gpio: The :class:`SimulatedGPIO` the motor controller uses
+        :param motor_controller_class: The MotorController class to read the pin numbers from
+        :param response_time: The delay in seconds before the controller reacts to a changed input
+        :param move_time: The time in seconds it takes to move by one position
+        :param homing_time: The time in seconds it takes to find the origin position
+        :param alarm: Whether the controller should start up in the ALARM state
+        """
+        self._gpio = gpio
+        self._pins = motor_controller_class
+        self.response_time = response_time
+        self.move_time = move_time
+        self.homing_time = homing_time
+        self._position = 0
+        #: The time at which the controller signaled INP for the last time
+        self.last_position_reached = None
+        #: The number of movements which have been executed
+        self.moves = 0
+        #: Pending responses as heap of (due time, sequence number, channel, level). The sequence number keeps
+        # responses which are due at the same time in the order they have been scheduled
+        self._responses = []
+        self._sequence = itertools.count()
+        self._responses_changed = threading.Condition()
+        responder = threading.Thread(target=self._respond)
+        responder.daemon = True
+        responder.start()
+        gpio.setup(self._pins._ALARM, gpio.IN, initial=gpio.LOW if alarm else gpio.HIGH)
+        gpio.setup(self._pins._INP, gpio.IN, initial=gpio.LOW)
+        gpio.setup(self._pins._SVRE, gpio.IN, initial=gpio.LOW)
+        gpio.add_output_listener(self._output_changed)
+
+    def _later(self, delay, channel, level):
+        with self._responses_changed:
+            heapq.heappush(self._responses, (time.time() + delay, next(self._sequence), channel, level))
+            self._responses_changed.notify()
+
+    def _respond(self):
+        while True:
+            with self._responses_changed:
+                while not self._responses or self._responses[0][0] > time.time():
+                    self._responses_changed.wait(self._responses[0][0] - time.time() if self._responses else None)
+                _, _, channel, level = heapq.heappop(self._responses)
+            if channel == self._pins._INP and level == self._gpio.HIGH:
+                self.last_position_reached = time.time()
+            self._gpio.drive_input(channel, level)
+
+    def _output_changed(self, channel, level):
+        high = level == self._gpio.HIGH
+        if channel == self._pins._RESET and high:
+            self._later(self.response_time, self._pins._ALARM, self._gpio.HIGH)
+        elif channel == self._pins._SVON:
+            self._later(self.response_time, self._pins._SVRE, level)
+        elif channel == self._pins._SETUP and high:
+            self._later(self.response_time, self._pins._INP, self._gpio.LOW)
+            self._later(self.response_time + self.homing_time, self._pins._INP, self._gpio.HIGH)
+            self._position = 0
+        elif channel == self._pins._DRIVE and high:
+            target = (self._gpio.input(self._pins._IN0) | self._gpio.input(self._pins._IN1) << 1 |
+                      self._gpio.input(self._pins._IN2) << 2)
+            duration = self.move_time * max(abs(target - self._position), 1)
+            self._later(self.response_time, self._pins._INP, self._gpio.LOW)
+            self._later(self.response_time + duration, self._pins._INP, self._gpio.HIGH)
+            self._position = target
+            self.moves += 1
+
+
+def install(gpio=None):
+    """
+    Makes the given simulated GPIO importable as RPi.GPIO
+
+    :param gpio: The :class:`SimulatedGPIO` to install. A new one is created if None
+
+    :return: The installed :class:`SimulatedGPIO`
+    """
+    if gpio is None:
+        gpio = SimulatedGPIO()
+    rpi = types.ModuleType('RPi')
+    rpi.GPIO = gpio
+    sys.modules['RPi'] = rpi
+    sys.modules['RPi.GPIO'] = gpio
+    return gpio
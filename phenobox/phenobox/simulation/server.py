@@ -0,0 +1,91 @@
+"""
+Replacement for :class:`network.TokenAuth` which answers the requests of the box like the phenopipe web server
+without sending them anywhere
+"""
+import itertools
+import json
+import threading
+import time
+
+
+class SimulatedResponse(object):
+    def __init__(self, status_code, data):
+        self.status_code = status_code
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+class SimulatedServer(object):
+    """
+    Accepts every login and answers the createSnapshot, addImage and addImages mutations after latency seconds.
+    Other requests are answered with an error. Like the web server it keeps the documents sent as persisted queries
+    and asks for the document if it does not know the hash yet.
+    """
+
+    def __init__(self, latency=0.05, experiment_name='Simulation', sample_group_name='Simulated plants'):
+        """
+
+        :param latency: The time in seconds the server needs to answer a request
+        :param experiment_name: The name of the experiment all plants belong to
+        :param sample_group_name: The name of the sample group all plants belong to
+        """
+        self.latency = latency
+        self._experiment_name = experiment_name
+        self._sample_group_name = sample_group_name
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        #: The number of received requests by the name of the mutation
+        self.requests = {}
+        #: The documents of the persisted queries by their hash
+        self._documents = {}
+
+    def is_authenticated(self):
+        return True
+
+    def can_refresh(self):
+        return True
+
+    def check_and_auth(self):
+        return True
+
+    def start_refresher(self, margin=60, retry_delay=30):
+        pass
+
+    def stop_refresher(self):
+        pass
+
+    def post(self, url, data):
+        time.sleep(self.latency)
+        variables = json.loads(data.get('variables') or '{}')
+        persisted_query = json.loads(data.get('extensions') or '{}').get('persistedQuery')
+        with self._lock:
+            query = data.get('query')
+            if persisted_query is not None:
+                if query is None:
+                    query = self._documents.get(persisted_query['sha256Hash'])
+                    if query is None:
+                        return SimulatedResponse(400, {'errors': [{'message': 'PersistedQueryNotFound'}]})
+                else:
+                    self._documents[persisted_query['sha256Hash']] = query
+            if query is None:
+                return SimulatedResponse(400, {'errors': [{'message': 'Must provide query string.'}]})
+            for mutation in ('createSnapshot', 'addImages', 'addImage'):
+                if query.startswith('mutation') and mutation + '(' in query.replace(' ', ''):
+                    self.requests[mutation] = self.requests.get(mutation, 0) + 1
+                    return SimulatedResponse(200, {'data': {mutation: self._answer(mutation, variables)}})
+        return SimulatedResponse(400, {'errors': [{'message': 'Unsupported request {}'.format(json.dumps(query))}]})
+
+    def _answer(self, mutation, variables):
+        if mutation == 'createSnapshot':
+            plant_id = variables['plantId']
+            snapshot_id = next(self._ids)
+            return {'id': 'Snapshot:{}'.format(snapshot_id), 'timestampId': 'Timestamp:1',
+                    'plant': {'id': plant_id, 'index': snapshot_id, 'name': plant_id,
+                              'fullName': '{}_{}'.format(self._sample_group_name, plant_id),
+                              'sampleGroup': {'name': self._sample_group_name,
+                                              'experiment': {'name': self._experiment_name}}}}
+        if mutation == 'addImages':
+            return {'ids': [next(self._ids) for _ in variables['images']]}
+        return {'id': next(self._ids)}
@@ -0,0 +1,64 @@
+"""
+Replacement for the gphoto based :class:`camera.CameraController` which serves sample images instead of pictures
+taken by a camera. The durations of the camera operations can be configured to match the ones of a real camera.
+"""
+import shutil
+import time
+
+from camera import CameraController
+
+
+class SimulatedCameraController(CameraController):
+    """
+    Camera controller which "takes" the given sample images one after another.
+    The first picture of a plant is scanned for a QR-Code, so every photo_count-th sample should show one.
+    """
+
+    def __init__(self, samples, target_dir, connect_time=1.0, capture_time=0.8, download_time=0.6):
+        """
+
+        :param samples: A list of paths to the JPEG images which are returned as taken pictures
+        :param target_dir: The directory to which the images get downloaded
+        :param connect_time: The time in seconds it takes to connect to the camera
+        :param capture_time: The time in seconds it takes to take a picture
+        :param download_time: The time in seconds it takes to transfer a picture from the camera
+        """
+        CameraController.__init__(self, target_dir)
+        self._samples = samples
+        self._next_sample = 0
+        self.connect_time = connect_time
+        self.capture_time = capture_time
+        self.download_time = download_time
+
+    def initialize(self):
+        pass
+
+    def _open_camera(self):
+        time.sleep(self.connect_time)
+        return True
+
+    def _close_camera(self):
+        pass
+
+    def _query_summary(self):
+        return True
+
+    def _take_picture(self):
+        """
+        Pretends to take a photo
+
+        :return: The path of the next sample image
+        """
+        time.sleep(self.capture_time)
+        file_path = self._samples[self._next_sample % len(self._samples)]
+        self._next_sample += 1
+        return file_path
+
+    def _read_file(self, file_path):
+        time.sleep(self.download_time)
+        with open(file_path, 'rb') as sample:
+            return sample.read()
+
+    def _save_file(self, file_path, dest):
+        time.sleep(self.download_time)
+        shutil.copyfile(file_path, dest)
@@ -0,0 +1,67 @@
+import re
+
+#: Matches the optional angle plan at the end of a QR-Code payload, e.g. 'angles=0,90,180,270'
+_ANGLES_PATTERN = re.compile(r'\s+angles=([0-9,]+)\s*$')
+
+
+def parse_angles(value):
+    """
+    Parses a comma separated list of angles as used in the config and in QR-Code payloads
+
+    :param value: The list of angles, e.g. '0,120,240'
+
+    :raises ValueError: if one of the entries is not an integer
+
+    :return: A list of the angles in degrees
+    """
+    return [int(angle) for angle in value.split(',') if angle.strip()]
+
+
+def split_angle_plan(payload):
+    """
+    Splits the angle plan off a QR-Code payload. The plan is appended to the payload separated by whitespace,
+    e.g. '<plant id> angles=0,90,180,270'
+
+    :param payload: The decoded QR-Code
+
+    :return: A tuple (payload, angles) of the payload without the plan and the list of angles or None if the
+        payload does not contain a plan
+    """
+    match = _ANGLES_PATTERN.search(payload)
+    if match is None:
+        return payload, None
+    return payload[:match.start()], parse_angles(match.group(1))
+
+
+def get_travel_order(positions, get_angle):
+    """
+    Orders the positions so that the turntable travels the shortest distance when it visits all of them and returns
+    to its start position afterwards. The turntable drives directly from one angle to the other without wrapping
+    around, so it has to cover the range from the smallest to the largest angle twice in any case. A single sweep
+    through the positions sorted by angle does not travel more than that, wherever it starts.
+
+    :param positions: The motor controller positions to visit
+    :param get_angle: A function returning the angle of a position, e.g. :meth:`MotorController.get_angle`
+
+    :return: A list of the positions in the order they should be visited
+    """
+    return sorted(positions, key=get_angle)
+
+
+def plan_positions(angles, motor_controller, start=0):
+    """
+    Maps an angle plan onto the positions programmed into the motor controller and orders them by travel distance.
+    The start position is left out because the picture there is taken before the plan is known. If the plan does not
+    contain the start position, that picture is only used to read the QR-Code and is not uploaded.
+
+    :param angles: The angles at which pictures should be taken
+    :param motor_controller: The :class:`phenobox_core.motor_controller.MotorController`
+    :param start: The position at which the first picture is taken
+
+    :raises ValueError: if one of the angles is not programmed into the motor controller
+
+    :return: A list of the positions still to visit
+    """
+    positions = set(motor_controller.get_position(angle) for angle in angles)
+    positions.discard(start)
+    return get_travel_order(positions, motor_controller.get_angle)
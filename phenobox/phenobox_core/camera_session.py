@@ -0,0 +1,448 @@
+import errno
+import logging
+import os
+import threading
+import time
+
+from phenobox_core.errors import ConnectionError, CaptureError
+
+
+class Download(threading.Thread):
+    """
+    Background thread which downloads an image from the camera while the turntable is already moving on
+    """
+
+    def __init__(self, camera_session, file_path, name, in_memory=False):
+        """
+
+        :param camera_session: The :class:`CameraSession` used to download the image
+        :param file_path: The path to the image on the camera
+        :param name: The file name to be used for the downloaded image
+        :param in_memory: If True the image is only fetched into memory (See :meth:`CameraSession.fetch`)
+        """
+        super(Download, self).__init__()
+        self._camera_session = camera_session
+        self._file_path = file_path
+        self._name = name
+        self._in_memory = in_memory
+        self._path = None
+        #: The content of the image if it has been fetched into memory
+        self.data = None
+
+    def run(self):
+        if self._in_memory:
+            fetched = self._camera_session.fetch(self._file_path, self._name)
+            if fetched is not None:
+                self._path, self.data = fetched
+        else:
+            self._path = self._camera_session.download(self._camera_session.get_target_dir(), self._file_path,
+                                                       self._name)
+
+    def result(self):
+        """
+        Blocks until the download has finished
+
+        :return: The full path to the downloaded image or None if the download was not successful. If the image was
+            fetched into memory it has not been written to this path yet and its content is available as :attr:`data`
+        """
+        self.join()
+        return self._path
+
+
+class KeepAlive(threading.Thread):
+    """
+    Background thread which keeps the camera session alive while the box is idle.
+    It probes the camera periodically and reconnects with an exponential backoff if the camera got lost.
+    """
+
+    def __init__(self, camera_session, interval, reconnect_delay, max_reconnect_delay):
+        """
+
+        :param camera_session: The :class:`CameraSession` which should be kept alive
+        :param interval: Seconds between two probes of a working camera
+        :param reconnect_delay: Seconds to wait before the first reconnect attempt. Doubled after every failed attempt
+        :param max_reconnect_delay: The maximum number of seconds between two reconnect attempts
+        """
+        super(KeepAlive, self).__init__()
+        self.daemon = True
+        self._camera_session = camera_session
+        self._interval = interval
+        self._reconnect_delay = reconnect_delay
+        self._max_reconnect_delay = max_reconnect_delay
+        self._active = threading.Event()
+        self._stop_event = threading.Event()
+
+    def pause(self):
+        self._active.clear()
+
+    def resume(self):
+        self._active.set()
+
+    def stop(self):
+        self._stop_event.set()
+        self._active.set()
+
+    def run(self):
+        delay = self._reconnect_delay
+        while not self._stop_event.is_set():
+            self._active.wait()
+            if self._stop_event.is_set():
+                break
+            if self._camera_session.probe():
+                delay = self._reconnect_delay
+                wait = self._interval
+            else:
+                wait = delay
+                delay = min(delay * 2, self._max_reconnect_delay)
+            self._stop_event.wait(wait)
+
+
+class CameraSession(object):
+    """
+    Keeps a single connection to the camera open across plants and implements capturing, downloading and fetching
+    images on top of it.
+
+    The access to the camera library is left to subclasses which implement the backend methods _open_camera,
+    _close_camera, _query_summary, _take_picture, _read_file and _save_file. Failures of the library have to be
+    raised as one of the exception types listed in _backend_errors.
+    """
+
+    #: The exceptions raised by the backend methods if the camera library reports an error
+    _backend_errors = ()
+
+    def __init__(self, target_dir):
+        """
+
+        :param target_dir: The directory to which the images get downloaded
+        """
+        self.target_dir = target_dir
+        #: The handle of the connected camera or None if there is no session
+        self.cam = None
+        self._logger = logging.getLogger(__name__)
+        self._logger.setLevel(logging.INFO)
+        self._logger.info('Target directory set to {}'.format(self.target_dir))
+        #: Serializes the access to the camera between the state machine, downloads and the keep alive thread
+        self._lock = threading.RLock()
+        self._keep_alive = None
+        #: The number and the accumulated duration in seconds of the camera operations
+        self._counters = {'connect': [0, 0.0], 'capture': [0, 0.0], 'download': [0, 0.0], 'probe': [0, 0.0]}
+        self._failed_connects = 0
+        self._failed_probes = 0
+
+    def _open_camera(self):
+        """
+        Opens a connection to the attached camera
+
+        :raises ConnectionError: if the connection to the camera failed
+
+        :return: The handle of the camera
+        """
+        raise NotImplementedError()
+
+    def _close_camera(self):
+        """
+        Closes the connection to the camera given by :attr:`cam`
+
+        :return: None
+        """
+        raise NotImplementedError()
+
+    def _query_summary(self):
+        """
+        Sends a lightweight request to the camera
+
+        :return: True if the camera responded, False otherwise
+        """
+        raise NotImplementedError()
+
+    def _take_picture(self):
+        """
+        Takes a photo which is kept on the camera
+
+        :return: The path to the image on the camera
+        """
+        raise NotImplementedError()
+
+    def _read_file(self, file_path):
+        """
+        Reads the image given by file_path from the camera
+
+        :param file_path: The path to the image on the camera
+
+        :return: The content of the image
+        """
+        raise NotImplementedError()
+
+    def _save_file(self, file_path, dest):
+        """
+        Reads the image given by file_path from the camera and saves it to dest
+
+        :param file_path: The path to the image on the camera
+        :param dest: The full path to save the image to
+
+        :return: None
+        """
+        raise NotImplementedError()
+
+    def _count(self, operation, start):
+        counter = self._counters[operation]
+        counter[0] += 1
+        counter[1] += time.time() - start
+
+    def get_statistics(self):
+        """
+        Returns the latency counters of the camera operations
+
+        :return: A dictionary which contains an entry (count, total seconds, mean seconds) for each of the operations
+            'connect', 'capture', 'download' and 'probe' as well as the number of 'failed_connects' and 'failed_probes'
+        """
+        with self._lock:
+            statistics = dict((operation, (count, total, total / count if count > 0 else 0.0))
+                              for operation, (count, total) in self._counters.items())
+            statistics['failed_connects'] = self._failed_connects
+            statistics['failed_probes'] = self._failed_probes
+            return statistics
+
+    def initialize(self):
+        """
+        Sets up the camera library
+
+        :return: None
+        """
+        pass
+
+    def connect(self):
+        """
+        Connects to the attached camera if there is no session yet
+
+        :raises ConnectionError: if the connection to the camera failed
+
+        :return: None
+        """
+        with self._lock:
+            if self.cam is None:
+                start = time.time()
+                try:
+                    self.cam = self._open_camera()
+                except ConnectionError as e:
+                    self._failed_connects += 1
+                    self._logger.warning(str(e))
+                    raise
+                except self._backend_errors as e:
+                    # Backends should raise ConnectionError, but the keep alive thread must not die of anything else
+                    self._failed_connects += 1
+                    self._logger.warning('Unable to connect to camera: {}'.format(e))
+                    raise ConnectionError('Unable to connect to camera', str(e))
+                self._count('connect', start)
+                self._logger.info('Connected to camera in {:.0f} ms'.format((time.time() - start) * 1000))
+
+    def release(self):
+        """
+        Disconnects from the camera
+
+        :return: None
+        """
+        with self._lock:
+            if self.cam is not None:
+                self._close_camera()
+                self.cam = None
+
+    def probe(self):
+        """
+        Checks with a lightweight request whether the camera is still responding. Connects to the camera if there is
+        no session yet and releases the session if the camera does not respond.
+
+        :return: True if the camera is connected and responding, False otherwise
+        """
+        with self._lock:
+            if self.cam is None:
+                try:
+                    self.connect()
+                except ConnectionError:
+                    return False
+                return True
+            start = time.time()
+            if not self._query_summary():
+                self._failed_probes += 1
+                self._logger.warning('Camera did not respond')
+                self.release()
+                return False
+            self._count('probe', start)
+            return True
+
+    def start_keep_alive(self, interval=30, reconnect_delay=1, max_reconnect_delay=60):
+        """
+        Starts the thread which keeps the camera session alive while it is not used (See :meth:`.resume_keep_alive`)
+
+        :param interval: Seconds between two probes of a working camera
+        :param reconnect_delay: Seconds to wait before the first reconnect attempt
+        :param max_reconnect_delay: The maximum number of seconds between two reconnect attempts
+
+        :return: None
+        """
+        self._keep_alive = KeepAlive(self, interval, reconnect_delay, max_reconnect_delay)
+        self._keep_alive.start()
+
+    def resume_keep_alive(self):
+        """
+        Lets the keep alive thread probe the camera and reconnect to it if necessary. Should be called whenever the
+        camera is not going to be used for a while.
+
+        :return: None
+        """
+        if self._keep_alive is not None:
+            self._keep_alive.resume()
+
+    def pause_keep_alive(self):
+        """
+        Stops probing the camera until :meth:`.resume_keep_alive` is called
+
+        :return: None
+        """
+        if self._keep_alive is not None:
+            self._keep_alive.pause()
+
+    def capture(self):
+        """
+        Takes a photo which is kept on the camera
+
+        :raises ConnectionError: if the connection to the camera failed
+        :raises CaptureError: if the camera was not able to take the photo
+
+        :return: The path to the image on the camera
+        """
+        with self._lock:
+            self.connect()
+            start = time.time()
+            try:
+                file_path = self._take_picture()
+            except self._backend_errors as e:
+                self._logger.warning('Error during capture. ({})'.format(e))
+                # Keep the session if the camera is still responding, e.g. if it was just unable to focus
+                self.probe()
+                raise CaptureError('Unable to capture')
+            self._count('capture', start)
+            self._logger.info('Captured picture in {:.0f} ms'.format((time.time() - start) * 1000))
+            return file_path
+
+    def capture_and_download(self, name):
+        """
+        Takes a photo and downloads it from the camera and saves it to the target_dir
+
+        :param name: the file name which should be used when saving the downloaded image
+
+        :raises CaptureError: if the camera was not able to take the photo
+
+        :return: The return value of :meth:`.download`
+        """
+        file_path = self.capture()
+        return self.download(self.target_dir, file_path, name)
+
+    def capture_and_download_async(self, name):
+        """
+        Takes a photo and starts downloading it to the target_dir in the background.
+        The camera must not be used again before the download has finished.
+
+        :param name: the file name which should be used when saving the downloaded image
+
+        :raises CaptureError: if the camera was not able to take the photo
+
+        :return: The running :class:`Download`
+        """
+        file_path = self.capture()
+        download = Download(self, file_path, name)
+        download.start()
+        return download
+
+    def capture_and_fetch(self, name):
+        """
+        Takes a photo and fetches it from the camera into memory without writing it to the target_dir
+
+        :param name: the file name which should be used if the image is saved later on
+
+        :raises CaptureError: if the camera was not able to take the photo
+
+        :return: The return value of :meth:`.fetch`
+        """
+        file_path = self.capture()
+        return self.fetch(file_path, name)
+
+    def capture_and_fetch_async(self, name):
+        """
+        Takes a photo and starts fetching it into memory in the background.
+        The camera must not be used again before the download has finished.
+
+        :param name: the file name which should be used if the image is saved later on
+
+        :raises CaptureError: if the camera was not able to take the photo
+
+        :return: The running :class:`Download`
+        """
+        file_path = self.capture()
+        download = Download(self, file_path, name, in_memory=True)
+        download.start()
+        return download
+
+    def fetch(self, file_path, name):
+        """
+        Fetches the image given by file_path from the camera into memory
+
+        :param file_path: The path to the image on the camera
+        :param name: The file name to be used if the image is saved later on
+
+        :return: A tuple (path, data) of the full path in the target_dir the image should be saved to and the content
+            of the image or None if the download was not successful
+        """
+        dest = os.path.join(self.target_dir, name + '.jpg')
+        try:
+            with self._lock:
+                start = time.time()
+                data = self._read_file(file_path)
+                self._count('download', start)
+        except self._backend_errors:
+            self._logger.exception('Unable to fetch image from camera')
+            return None
+        return dest, data
+
+    def download(self, dest_folder, file_path, name):
+        """
+        Downloads the image given by file_path and saves it to the path given by dest_folder with the given name
+
+        :param dest_folder: The directory to store the image to
+        :param file_path: The path to the image on the camera
+        :param name: The file name to be used for the downloaded image
+
+        :return: the full path to the downloaded image or None if the download was not successful
+        """
+        dest = os.path.join(dest_folder, name + '.jpg')
+        try:
+            os.makedirs(dest_folder)
+        except OSError as exception:
+            if exception.errno != errno.EEXIST:
+                self._logger.exception('Unable to create folder ({}). (errno: {})'.format(dest, exception.errno))
+                return None
+        try:
+            with self._lock:
+                start = time.time()
+                self._save_file(file_path, dest)
+                self._count('download', start)
+        except self._backend_errors:
+            self._logger.exception('Unable to download and save image from camera')
+            return None
+        return dest
+
+    # TODO refactor into property
+    def get_target_dir(self):
+        return self.target_dir
+
+    def close(self):
+        """
+        Stops the keep alive thread and releases the camera
+
+        :return: None
+        """
+        if self._keep_alive is not None:
+            self._keep_alive.stop()
+            self._keep_alive.join()
+            self._keep_alive = None
+        self.release()
@@ -0,0 +1,118 @@
+import io
+import signal
+import time
+
+from PIL import Image
+
+#: Maps the supported values of the image_format config option to the file extension used for the converted images
+IMAGE_FORMAT_EXTENSIONS = {
+    'png': 'png',
+    'webp': 'webp',
+    'jpeg': 'jpg'
+}
+
+#: The (default, minimum, maximum) of the compression level of each image format. The level is the zlib compression
+#: level for png, the compression effort for lossless webp and the quality for jpeg
+COMPRESSION_LEVELS = {
+    'png': (9, 0, 9),
+    'webp': (80, 0, 100),
+    'jpeg': (90, 1, 95)
+}
+
+
+def get_save_options(image_format, compression_level=None, optimize=False):
+    """
+    Builds the keyword arguments passed to pillow when saving a converted image in the given format
+
+    :param image_format: One of the keys of :data:`IMAGE_FORMAT_EXTENSIONS`
+    :param compression_level: The zlib compression level (0-9) for png, the compression effort (0-100) for lossless
+        webp or the quality (1-95) for jpeg. None for the default of the format (See :data:`COMPRESSION_LEVELS`)
+    :param optimize: Whether the encoder should do an extra pass to find optimal encoder settings. For png this
+        always uses the highest compression level
+
+    :raises ValueError: if the image format is not supported or the compression level is out of its range
+
+    :return: A dict of keyword arguments for pillow.Image.save
+    """
+    if image_format not in COMPRESSION_LEVELS:
+        raise ValueError('Unsupported image format "{}". Allowed are: {}'.format(
+            image_format, ', '.join(sorted(COMPRESSION_LEVELS))))
+    default, minimum, maximum = COMPRESSION_LEVELS[image_format]
+    if compression_level is None:
+        compression_level = default
+    if not minimum <= compression_level <= maximum:
+        raise ValueError('The compression level of {} has to be between {} and {}, not {}'.format(
+            image_format, minimum, maximum, compression_level))
+    if image_format == 'png':
+        return {'format': 'PNG', 'compress_level': compression_level, 'optimize': optimize}
+    elif image_format == 'webp':
+        return {'format': 'WEBP', 'lossless': True, 'quality': compression_level}
+    return {'format': 'JPEG', 'quality': compression_level, 'optimize': optimize}
+
+
+def init_worker():
+    """
+    Initializer for the conversion worker processes. Interrupts are handled by the main process which persists the
+    remaining plants, so the workers ignore SIGINT.
+
+    :return: None
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def get_img(path, fast_decode=False, data=None, timings=None):
+    """
+    Utility method to get an appropriately sized Image instance from the given path
+
+    :param path: The full path to the image file
+    :param fast_decode: If True the JPEG decoder is put into draft mode so that it decodes directly at the largest
+        reduced scale (1/2, 1/4 or 1/8) which is still at least as big as the target size
+    :param data: The content of the image if it is kept in memory. path is not read if this is given (optional)
+    :param timings: A dictionary to store the durations of the 'decode' and 'resize' steps to (optional)
+
+    :return: A pillow.Image instance
+    """
+    start = time.time()
+    img = Image.open(io.BytesIO(data) if data is not None else path)
+    width, height = img.size
+    # The image is rotated by 90 degrees, so the target width is based on the original height and vice versa
+    target_size = (int(height / 6.5), int(width / 6.5))
+    if fast_decode:
+        img.draft(img.mode, (target_size[1], target_size[0]))
+    img.load()
+    decoded = time.time()
+
+    img = img.rotate(90, expand=True)
+    img = img.resize(target_size, Image.ANTIALIAS)
+    if timings is not None:
+        timings['decode'] = decoded - start
+        timings['resize'] = time.time() - decoded
+    return img
+
+
+def convert_picture(path, dest, fast_decode, save_options, data=None):
+    """
+    Converts the camera image given by path and saves the result to dest. Runs inside a worker process of the
+    conversion pool.
+
+    :param path: The full path to the image file
+    :param dest: The full path the converted image should be saved to
+    :param fast_decode: Whether to decode the image in draft mode (See :func:`.get_img`)
+    :param save_options: The keyword arguments for pillow.Image.save as returned by :func:`.get_save_options`
+    :param data: The content of the image if it is kept in memory (optional)
+
+    :return: A tuple (dest, timings, size) of the path of the converted image, a dictionary with the durations of the
+        'decode', 'resize', 'encode' and 'write' steps and the number of bytes written
+    """
+    timings = {}
+    img = get_img(path, fast_decode, data, timings)
+    # Encode to memory first so that the time spent on the CPU and on the network share can be told apart
+    start = time.time()
+    encoded = io.BytesIO()
+    img.save(encoded, **save_options)
+    encoded_time = time.time()
+    with open(dest, 'wb') as dest_file:
+        dest_file.write(encoded.getvalue())
+    timings['encode'] = encoded_time - start
+    timings['write'] = time.time() - encoded_time
+    return dest, timings, encoded.tell()
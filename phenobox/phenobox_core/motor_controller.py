@@ -0,0 +1,264 @@
+import threading
+import time
+
+import RPi.GPIO as GPIO
+
+from phenobox_core.errors import MotorTimeoutError
+
+#: The angles programmed into the positions of the motor controller if no others are configured
+DEFAULT_POSITIONS = [0, 60, 120, 180, 240, 300]
+
+#: The number of positions which can be selected with the three IN lines
+MAX_POSITIONS = 8
+
+
+class MotorController:
+    """
+    Class to control the connected motor LER10K via its motor controller LECP6 PNP
+    All lines, except the ALARM line are active high.
+    """
+    # Pin declarations
+    #: The GPIO Pin to which the SVON line of the motor controller is connected.
+    # Used to turn the servo on. Active High.
+    _SVON = 17
+
+    #: The GPIO Pin to which the IN0 line of the motor controller is connected.
+    # Used to send position to the controller
+    _IN0 = 22
+
+    #: The GPIO Pin to which the IN1 line of the motor controller is connected.
+    # Used to send position to the controller
+    _IN1 = 23
+
+    #: The GPIO Pin to which the IN2 line of the motor controller is connected.
+    # Used to send position to the controller
+    _IN2 = 24
+
+    #: The GPIO Pin to which the ENABLE line of the motor controller is connected.
+    # Used to enable to controller.
+    _ENABLE = 26
+
+    #: The GPIO Pin to which the SETUP line of the motor controller is connected.
+    # Used to initialize the motor controller on startup
+    _SETUP = 27
+    #: The GPIO Pin to which the DRIVE line of the motor controller is connected.
+    # Used to start a movement. Active High
+    _DRIVE = 18
+    #: The GPIO Pin to which the RESET line of the motor controller is connected.
+    # Used to reset the Alarm state.
+    _RESET = 25
+
+    #: The GPIO Pin to which the ALARM line of the motor controller is connected.
+    # If this gets low the motor emits an ALARM condition
+    _ALARM = 21
+    #: The GPIO Pin to which the INP line of the motor controller is connected.
+    # Used by the controller to signal that it has reached the target position
+    _INP = 20
+    #: The GPIO Pin to which the SVRE line of the motor controller is connected.
+    # Used by the controller to indicate that the servo is ready
+    _SVRE = 16
+
+    # TODO listen for ALARM signal of motor controller and take actions accordingly
+    # (transition to error)
+    # Pass in a callback to the initialize function which should get called when
+    # the ALARM is triggered (Gets low)
+
+    def __init__(self, settle_time=0.4, position_settle_time=0.4, timeout=30, positions=None):
+        """
+
+        :param settle_time: Seconds to wait before watching an input line of the motor controller, which may still show
+            its previous state right after a command has been sent
+        :param position_settle_time: Seconds to wait after the position has been set on IN0-IN2 before DRIVE is
+            raised
+        :param timeout: Seconds to wait for the motor controller to signal a state change before giving up. None to
+            wait forever
+        :param positions: The angles programmed into the positions of the motor controller, starting with the origin
+            position 0 (optional, default: :data:`DEFAULT_POSITIONS`)
+
+        :raises ValueError: if more positions are given than the motor controller can select
+        """
+        positions = list(DEFAULT_POSITIONS if positions is None else positions)
+        if not 0 < len(positions) <= MAX_POSITIONS:
+            raise ValueError('Between 1 and {} positions are supported'.format(MAX_POSITIONS))
+        #: The angle of each position by its index
+        self._positions = positions
+        self._current_angle = -1
+        self._settle_time = settle_time
+        self._position_settle_time = position_settle_time
+        self._timeout = timeout
+
+    def _wait_until(self, pin, state):
+        """
+        Waits for the pin to reach the given state.
+        Blocks on an edge event instead of polling the pin so that no CPU time is used while the motor is moving. An
+        edge only wakes the wait up, the pin has to read the state afterwards. If it has bounced back the remaining
+        time is waited for the next edge.
+
+        :param pin: The GPIO pin to watch
+        :param state: The state in which the given pin should change to
+
+        :raises MotorTimeoutError: if the pin did not reach the state within the configured timeout
+
+        :return:None
+        """
+        time.sleep(self._settle_time)
+        reached = threading.Event()
+        # Register the event detection before checking the pin so that no edge can get lost in between
+        GPIO.add_event_detect(pin, GPIO.RISING if state == GPIO.HIGH else GPIO.FALLING,
+                              callback=lambda channel: reached.set())
+        deadline = None if self._timeout is None else time.time() + self._timeout
+        try:
+            while GPIO.input(pin) != state:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    raise MotorTimeoutError('Motor controller did not respond',
+                                            'GPIO {} did not change to {} within {}s'.format(pin, state,
+                                                                                            self._timeout))
+                reached.wait(remaining)
+                # Cleared before the pin is read again, so that an edge in between is not lost
+                reached.clear()
+        finally:
+            GPIO.remove_event_detect(pin)
+
+    def initialize(self):
+        """
+        Sets up all necessary GPIO pins.
+        Resets the inital alarm state of the motor controller.
+        Returns the motor to its origin position
+
+        :raises MotorTimeoutError: if the motor controller did not get ready or did not find the origin in time
+
+        :return: None
+        """
+        GPIO.setup(self._ENABLE, GPIO.OUT, initial=GPIO.LOW)
+        GPIO.setup(self._SVON, GPIO.OUT, initial=GPIO.LOW)
+        GPIO.setup(self._IN0, GPIO.OUT, initial=GPIO.LOW)
+        GPIO.setup(self._IN1, GPIO.OUT, initial=GPIO.LOW)
+        GPIO.setup(self._IN2, GPIO.OUT, initial=GPIO.LOW)
+
+        GPIO.setup(self._SETUP, GPIO.OUT, initial=GPIO.LOW)
+        GPIO.setup(self._DRIVE, GPIO.OUT, initial=GPIO.LOW)
+        GPIO.setup(self._RESET, GPIO.OUT, initial=GPIO.LOW)
+
+        #GPIO.setup(self._ALARM, GPIO.IN, pull_up_down=GPIO.PUD_DOWN)
+        #GPIO.setup(self._INP, GPIO.IN, pull_up_down=GPIO.PUD_DOWN)
+        #GPIO.setup(self._SVRE, GPIO.IN, pull_up_down=GPIO.PUD_DOWN)
+        # No pullups needed here as the input potentials are set via external resistors.
+        # The new Driver Board has higher resistance devider so the additional pulldown
+        # might reduce input voltage.
+        GPIO.setup(self._ALARM, GPIO.IN)
+        GPIO.setup(self._INP, GPIO.IN)
+        GPIO.setup(self._SVRE, GPIO.IN)
+        time.sleep(2)
+        if not GPIO.input(self._ALARM):  # ALARM is negative logic
+            print("Resetting ALARM")
+            GPIO.output(self._RESET, GPIO.HIGH)
+            self._wait_until(self._ALARM, GPIO.HIGH)
+            GPIO.output(self._RESET, GPIO.LOW)
+            print("ALARM cleared")
+        #else:
+        #    print('ALARM is clear')
+
+        #print('Enable drive')
+        GPIO.output(self._ENABLE, GPIO.HIGH)
+        #print('Switching Servo on (SVON)')
+        GPIO.output(self._SVON, GPIO.HIGH)
+        #print('waiting for SVRE')
+        self._wait_until(self._SVRE, GPIO.HIGH)
+        #print('Searching origin')
+        GPIO.output(self._SETUP, GPIO.HIGH)
+        time.sleep(0.1)
+        GPIO.output(self._SETUP, GPIO.LOW)
+        #print('waiting for INP')
+        self._wait_until(self._INP, GPIO.HIGH)
+        #print('Position reached (INP)')
+        GPIO.output(self._SETUP, GPIO.LOW)
+        GPIO.output(self._SVON, GPIO.LOW)
+        self._current_angle = 0
+
+    def return_to_origin(self):
+        """
+        Used to move the motor to its 0 position which should be programmed to be the origin position
+        This method blocks until the motor has reached the position
+
+        :raises MotorTimeoutError: if the motor did not reach the position in time
+
+        :return: None
+        """
+        self.move_to_position(0)
+
+    @property
+    def current_angle(self):
+        """
+        Property to get the current angle of the motor relative to its origin position
+
+        :return: The current angle
+        """
+        return self._current_angle
+
+    def get_angle(self, position):
+        """
+        Returns the angle relative to the origin position at which the motor stands at the given position
+
+        :param position: The index of the position
+
+        :return: The angle in degrees
+        """
+        return self._positions[position]
+
+    def get_position(self, angle):
+        """
+        Returns the position which is programmed to the given angle
+
+        :param angle: The angle in degrees relative to the origin position
+
+        :raises ValueError: if no position is programmed to the angle
+
+        :return: The index of the position
+        """
+        if angle not in self._positions:
+            raise ValueError('No position is programmed to {} degrees'.format(angle))
+        return self._positions.index(angle)
+
+    @property
+    def positions(self):
+        """
+        Property to get the angles programmed into the positions of the motor controller
+
+        :return: A list of the angles by position index
+        """
+        return list(self._positions)
+
+    def move_to_position(self, position):
+        """
+        Takes in a number indicating the position index and moves the motor to the
+        corresponding position which is programmed into the motor controller.
+        This method blocks until the motor has reached the given position.
+
+        :param position: The index of the position to move the motor to
+
+        :raises MotorTimeoutError: if the motor did not reach the position in time
+
+        :return: None
+        """
+        if 0 <= position < len(self._positions):
+            self._current_angle = -1
+            GPIO.output(self._SVON, GPIO.HIGH)
+            binary_position = '{0:03b}'.format(position)  # Convert to 3 bit binary number with leading 0s
+            length = len(binary_position)
+            in0_val = GPIO.LOW if int(binary_position[length - 1]) == 0 else GPIO.HIGH
+            in1_val = GPIO.LOW if int(binary_position[length - 2]) == 0 else GPIO.HIGH
+            in2_val = GPIO.LOW if int(binary_position[length - 3]) == 0 else GPIO.HIGH
+
+            self._wait_until(self._SVRE, GPIO.HIGH)
+
+            GPIO.output(self._IN0, in0_val)
+            GPIO.output(self._IN1, in1_val)
+            GPIO.output(self._IN2, in2_val)
+            time.sleep(self._position_settle_time)
+
+            GPIO.output(self._DRIVE, GPIO.HIGH)
+            self._wait_until(self._INP, GPIO.HIGH)
+            GPIO.output(self._DRIVE, GPIO.LOW)
+            GPIO.output(self._SVON, GPIO.LOW)
+            self._current_angle = self.get_angle(position)
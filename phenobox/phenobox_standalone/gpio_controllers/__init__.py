@@ -1,5 +1,6 @@
 import RPi.GPIO as GPIO
 
+from .errors import MotorError, MotorTimeoutError
 from .input_controller import InputController, DoorState, ButtonPress
 from .led_controller import LedController
 from .motor_controller import MotorController
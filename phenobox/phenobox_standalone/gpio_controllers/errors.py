@@ -0,0 +1 @@
+from phenobox_core.errors import MotorError, MotorTimeoutError
@@ -6,18 +6,168 @@
 # GNU GENERAL PUBLIC LICENSE Version 2, June 1991
 # See the LICENSE file in the root of this repository.
 
+import logging
+import threading
+import time
+
 import pigpio
 
+#: The brightness in percent by lower case state name which is used if no profiles are configured
+DEFAULT_PROFILES = {
+  'idle': 1,
+  'error': 1,
+  'take_first_picture': 100,
+  'take_picture': 100
+}
+
+#: Seconds between two duty cycle changes while ramping
+_RAMP_STEP = 0.02
+
+
 class Illumination():
+  """
+  Controls the brightness of the illumination by PWM.
+
+  The brightness for each state of the box is taken from a profile. Pictures can use a different brightness per
+  angle by adding an entry '<state>_<angle>', e.g. 'take_picture_180'. A new brightness is ramped to in the
+  background so that it can be set up while the motor is still moving. :meth:`.wait_until_settled` then only waits
+  for the part of the settle time which has not already passed.
+
+  The settle time is calibrated for a change over the full range, e.g. from 1% to 100%, and scaled by the size of the
+  actual change, so that pictures at the same brightness do not wait at all.
+  """
 
-  def __init__(self, gpio_pin):
+  def __init__(self, gpio_pin, profiles=None, ramp_time=0.3, settle_time=1, settle_timeout=5):
+    """
+
+    :param gpio_pin: The GPIO pin the PWM input of the illumination is connected to
+    :param profiles: A dict mapping lower case state names and '<state>_<angle>' to the brightness in percent
+        (optional, default: :data:`DEFAULT_PROFILES`)
+    :param ramp_time: Seconds used to ramp from one brightness to another
+    :param settle_time: Seconds the light needs to become stable after a change over the full range, as measured
+        for the illumination
+    :param settle_timeout: Maximum seconds :meth:`.wait_until_settled` waits for a ramp to finish
+    """
     self._illu_pin = gpio_pin
+    self._profiles = DEFAULT_PROFILES if profiles is None else profiles
+    self._ramp_time = ramp_time
+    self._settle_time = settle_time
+    self._settle_timeout = settle_timeout
+    self._logger = logging.getLogger(__name__)
+    self._logger.setLevel(logging.INFO)
     self._illumination_pwm = pigpio.pi()
     self._illumination_percent = 1
+    #: The brightness the illumination is ramping to or has reached
+    self._target_percent = self._illumination_percent
+    #: Incremented for every new brightness so that a running ramp notices it has been superseded
+    self._generation = 0
+    #: The time at which the target brightness has been reached
+    self._reached_at = time.time()
+    #: Seconds the light needs to become stable after the last change
+    self._settle_for = 0
+    self._reached = threading.Event()
+    self._reached.set()
+    self._lock = threading.Lock()
     self._illumination_pwm.set_PWM_frequency(self._illu_pin, 200)
-    self._illumination_pwm.set_PWM_dutycycle(self._illu_pin, self._illumination_percent * 255 / 100)
+    self._set_duty_cycle(self._illumination_percent)
+
+  def _set_duty_cycle(self, percent):
+    self._illumination_pwm.set_PWM_dutycycle(self._illu_pin, int(round(percent * 255 / 100.0)))
 
   def set_illumination(self, percent):
-    self._illumination_percent = percent
-    self._illumination_pwm.set_PWM_dutycycle(self._illu_pin, self._illumination_percent * 255 / 100)
+    """
+    Sets the brightness immediately. A running ramp is cancelled.
+
+    :param percent: The brightness in percent
+
+    :return: None
+    """
+    with self._lock:
+      self._generation += 1
+      self._settle_for = self._get_settle_time(self._illumination_percent, percent)
+      self._illumination_percent = percent
+      self._target_percent = percent
+      self._set_duty_cycle(percent)
+      self._reached_at = time.time()
+      self._reached.set()
+
+  def _get_settle_time(self, start_percent, percent):
+    return self._settle_time * min(abs(percent - start_percent), 100) / 100.0
+
+  def ramp_to(self, percent):
+    """
+    Ramps the brightness to the given value in the background. A running ramp is superseded.
+
+    :param percent: The brightness in percent
+
+    :return: None
+    """
+    with self._lock:
+      if percent == self._target_percent:
+        return
+      self._generation += 1
+      self._target_percent = percent
+      self._reached.clear()
+      ramp = threading.Thread(target=self._ramp, args=(self._generation, self._illumination_percent, percent))
+    ramp.daemon = True
+    ramp.start()
+
+  def _ramp(self, generation, start_percent, percent):
+    steps = max(1, int(self._ramp_time / _RAMP_STEP))
+    for step in range(1, steps + 1):
+      with self._lock:
+        if generation != self._generation:
+          return
+        self._illumination_percent = start_percent + (percent - start_percent) * step / float(steps)
+        self._set_duty_cycle(self._illumination_percent)
+        if step == steps:
+          self._settle_for = self._get_settle_time(start_percent, percent)
+          self._reached_at = time.time()
+          self._reached.set()
+          return
+      time.sleep(self._ramp_time / steps)
+
+  def get_profile(self, state, angle=None):
+    """
+    Returns the brightness configured for the given state and angle
+
+    :param state: The name of the state
+    :param angle: The angle at which a picture is taken (optional)
+
+    :return: The brightness in percent. The idle brightness if there is no entry for the state
+    """
+    state = state.lower()
+    if angle is not None and '{}_{}'.format(state, angle) in self._profiles:
+      return self._profiles['{}_{}'.format(state, angle)]
+    return self._profiles.get(state, self._profiles.get('idle', DEFAULT_PROFILES['idle']))
+
+  def apply_profile(self, state, angle=None):
+    """
+    Ramps to the brightness configured for the given state and angle (See :meth:`.get_profile`)
+
+    :param state: The name of the state
+    :param angle: The angle at which a picture is taken (optional)
+
+    :return: None
+    """
+    self.ramp_to(self.get_profile(state, angle))
+
+  def wait_until_settled(self):
+    """
+    Blocks until the brightness has been reached and the light has been stable for the settle time of the change.
+    Gives up after settle_timeout seconds if the ramp does not finish.
 
+    :return: The number of seconds waited
+    """
+    start = time.time()
+    if not self._reached.wait(self._settle_timeout):
+      self._logger.warning('Illumination did not reach {}% within {} s'.format(self._target_percent,
+                                                                               self._settle_timeout))
+      return time.time() - start
+    remaining = self._reached_at + self._settle_for - time.time()
+    if remaining > 0:
+      time.sleep(remaining)
+    waited = time.time() - start
+    self._logger.info('Waited {:.0f} ms for the illumination to settle at {}%'.format(waited * 1000,
+                                                                                     self._target_percent))
+    return waited
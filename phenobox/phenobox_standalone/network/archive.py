@@ -0,0 +1,84 @@
+import errno
+import hashlib
+import os
+import shutil
+import time
+
+from .errors import ArchiveError
+
+#: Size of the blocks read when computing checksums
+_CHUNK_SIZE = 1024 * 1024
+
+
+def file_checksum(path):
+  """
+  Computes the MD5 checksum of a file without reading it into memory at once
+
+  :param path: The path to the file
+
+  :return: The hex digest of the file content
+  """
+  digest = hashlib.md5()
+  with open(path, 'rb') as f:
+    for chunk in iter(lambda: f.read(_CHUNK_SIZE), b''):
+      digest.update(chunk)
+  return digest.hexdigest()
+
+
+def archive_file(source, dest, move=False, verify_checksum=True):
+  """
+  Stores the file at source under dest using the cheapest available transfer. The content is never decoded or
+  streamed through python:
+
+  1. a hard link if source and dest are on the same filesystem
+  2. a rename if move is True and the filesystem does not support hard links (e.g. some SMB mounts)
+  3. a kernel side copy (shutil.copyfile uses sendfile on Linux) otherwise
+
+  Links and renames keep the inode and only get their size checked. Copies are verified by size and, if
+  verify_checksum is set, by comparing the checksums of source and dest.
+
+  :param source: The path of the file to archive
+  :param dest: The full path the file is archived to. An existing file is replaced
+  :param move: Whether source may be removed. Only set it if the caller deletes source afterwards anyway
+  :param verify_checksum: Whether copies are verified by checksum
+
+  :raises ArchiveError: if the file could not be archived or the verification failed
+
+  :return: A tuple (method, size, seconds) with the method used ('link', 'move' or 'copy'), the number of bytes
+      archived and the time it took
+  """
+  start = time.time()
+  try:
+    size = os.stat(source).st_size
+  except OSError as e:
+    raise ArchiveError('Unable to archive {}. ({})'.format(source, e))
+  try:
+    os.remove(dest)
+  except OSError as e:
+    if e.errno != errno.ENOENT:
+      raise ArchiveError('Unable to replace {}. ({})'.format(dest, e))
+
+  method = None
+  try:
+    os.link(source, dest)
+    method = 'link'
+  except OSError:
+    if move:
+      try:
+        os.rename(source, dest)
+        method = 'move'
+      except OSError:
+        pass
+  if method is None:
+    try:
+      shutil.copyfile(source, dest)
+    except (IOError, OSError) as e:
+      raise ArchiveError('Unable to copy {} to {}. ({})'.format(source, dest, e))
+    method = 'copy'
+
+  archived_size = os.stat(dest).st_size
+  if archived_size != size:
+    raise ArchiveError('Archived {} has {} bytes instead of {}'.format(dest, archived_size, size))
+  if method == 'copy' and verify_checksum and file_checksum(source) != file_checksum(dest):
+    raise ArchiveError('Checksum of archived {} does not match {}'.format(dest, source))
+  return method, size, time.time() - start
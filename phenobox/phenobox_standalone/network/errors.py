@@ -11,3 +11,8 @@ class ServerUnableToSaveImageError(ServerError):
 class UnableToAuthenticateError(Exception):
     def __init__(self, message='Unable to authenticate', *args):
         super(UnableToAuthenticateError, self).__init__(message, *args)
+
+
+class ArchiveError(IOError):
+    def __init__(self, message, *args):
+        super(ArchiveError, self).__init__(message, *args)
@@ -3,14 +3,15 @@ import fnmatch
 import logging
 import os
 import threading
+from multiprocessing import Pool
 from queue import Queue, Empty
-from shutil import copyfile
 
-from PIL import Image
 from colorama import Fore
 
 from config import config
+from phenobox_core.conversion import get_save_options, init_worker, convert_picture
 from plant import Plant
+from .archive import archive_file
 
 
 class ImageHandler(threading.Thread):
@@ -24,6 +25,17 @@ class ImageHandler(threading.Thread):
     self._logger = logging.getLogger(__name__)
     self._logger.setLevel(logging.INFO)
     self._photo_count = photo_count
+    cfg = getattr(config, 'cfg')
+    #: The number of processes converting pictures in parallel
+    self._conversion_workers = cfg.getint('box', 'conversion_workers', fallback=2)
+    #: Whether camera images are decoded in JPEG draft mode at a reduced scale
+    self._fast_decode = cfg.getboolean('box', 'fast_decode', fallback=False)
+    self._save_options = get_save_options('png', cfg.getint('box', 'compression_level', fallback=9), False)
+    self._pool = None
+    #: Whether archived originals are verified by checksum if they had to be copied
+    self._verify_archive = cfg.getboolean('box', 'verify_archive_checksum', fallback=True)
+    #: The number of files, bytes and seconds spent archiving originals by transfer method
+    self._archive_statistics = {'link': [0, 0, 0.0], 'move': [0, 0, 0.0], 'copy': [0, 0, 0.0]}
 
     #: A queue which holds all the plant instances which need to be processed
     self.queue = Queue()
@@ -70,6 +82,36 @@ class ImageHandler(threading.Thread):
     """
     return self._stopper.isSet()
 
+  def get_archive_statistics(self):
+    """
+    Returns the statistics of archiving the original camera images
+
+    :return: A dictionary which contains an entry (files, bytes, bytes per second) for each of the transfer methods
+        'link', 'move' and 'copy'
+    """
+    return dict((method, (files, size, size / seconds if seconds > 0 else 0.0))
+                for method, (files, size, seconds) in self._archive_statistics.items())
+
+  def _archive_original(self, source, dest):
+    """
+    Archives the original camera image without re-encoding it (See :func:`network.archive.archive_file`).
+    The image may be moved because it gets deleted afterwards anyway.
+
+    :param source: The path to the camera image
+    :param dest: The full path in the originals directory
+
+    :raises ArchiveError: if the image could not be archived
+
+    :return: A tuple (size, seconds) of the number of bytes archived and the time it took
+    """
+    method, size, seconds = archive_file(source, dest, move=True, verify_checksum=self._verify_archive)
+    statistics = self._archive_statistics[method]
+    statistics[0] += 1
+    statistics[1] += size
+    statistics[2] += seconds
+    self._logger.info('Archived {} ({} bytes) by {} in {:.0f} ms'.format(dest, size, method, seconds * 1000))
+    return size, seconds
+
   def read_from_disk(self, basepath):
     """
     Loads all persisted entries from the filesystem and enqueues them to continue uploading
@@ -95,20 +137,6 @@ class ImageHandler(threading.Thread):
     """
     self.queue.put(plant)
 
-  def _get_img(self, path):
-    """
-    Utility method to get an appropriately sized Image instance from the given path
-
-    :param path: The full path to the image file
-
-    :return: A pillow.Image instance
-    """
-    img = Image.open(path)
-
-    img = img.rotate(90, expand=True)
-    width, height = img.size
-    return img.resize((int(width / 6.5), int(height / 6.5)), Image.ANTIALIAS)
-
   def _notify_server(self, path, snapshot_id, filename, angle):
     """
     Utility method to create image entries on the server.
@@ -137,14 +165,13 @@ class ImageHandler(threading.Thread):
 
     :return: None
     """
+    self._pool = Pool(processes=self._conversion_workers, initializer=init_worker)
     self.read_from_disk(self.persist_dir)
     # TODO Check if according snapshots exist (Could be deleted in the meantime)
     while not self.stopped():
       try:
         plant = self.queue.get(block=True, timeout=2)
 
-        stored_pictures = list()
-
         #shared_path = os.path.join(plant.experiment_name,
         #                           plant.date.strftime("%Y_%m_%d"), str(hash(plant.timestamp_id)))
         shared_path = os.path.join(plant.experiment_name,      # experiment (project)
@@ -177,27 +204,28 @@ class ImageHandler(threading.Thread):
             continue
             # raise
 
-        pictures = list(plant.pictures)
-        for index, picture in enumerate(pictures):
-          if self.stopped():
-            print(Fore.YELLOW + 'Persist current plant')
-            plant.persist(self.persist_dir)
-            break
-          path, shot_angle = picture
-          img = self._get_img(path)
-          #filename = '{name}_{angle}.png'.format(
-          #            name=plant.name.replace(" ", "_"), angle=str(angle))
+        # All pictures of the plant are converted in parallel and then stored in the order they were taken
+        conversions = list()
+        archived_bytes = 0
+        archive_seconds = 0.0
+        for path, shot_angle in list(plant.pictures):
           self._logger.info('Filename components: {}_{}_{}'.format(plant.snapshot_id, plant.sample_group_name, shot_angle))
           filename = '{treatment}_{replicate}_{angle}.png'.format(
                       treatment=plant.snapshot_id,
                       replicate=plant.sample_group_name,
                       angle=shot_angle)
-
           dest = os.path.join(dest_dir, filename)
+          conversions.append((path, shot_angle, filename, self._pool.apply_async(
+            convert_picture, (path, dest, self._fast_decode, self._save_options))))
+
+        for path, shot_angle, filename, result in conversions:
+          if self.stopped():
+            print(Fore.YELLOW + 'Persist current plant')
+            plant.persist(self.persist_dir)
+            break
           try:
-            img.save(dest, compress_level=9)
+            result.get()
             self._notify_server(shared_path, plant.snapshot_id, filename, shot_angle)
-            stored_pictures.append(dest)
             print(Fore.YELLOW + 'Saved')
             #filename_for_orig = '{name}_{angle}.jpg'.format(
             #                     name=plant.name.replace(" ", "_"), angle=str(angle))
@@ -205,22 +233,22 @@ class ImageHandler(threading.Thread):
                                  treatment=plant.snapshot_id,
                                  replicate=plant.sample_group_name,
                                  angle=shot_angle)
-            copyfile(path, os.path.join(originals_dir, filename_for_orig))
+            size, seconds = self._archive_original(path, os.path.join(originals_dir, filename_for_orig))
+            archived_bytes += size
+            archive_seconds += seconds
             print(Fore.YELLOW + 'Saved original image to {}'.format(filename_for_orig))
             # The current plant is always at index 0 because the previous one is deleted before
             plant.delete_picture(0)
           except KeyError as e:
-            self._logger.exception('Key Error while saving picture. msg: {}'.format(e.message))
-            print(Fore.RED + e.message)
+            self._logger.exception('Key Error while saving picture. msg: {}'.format(e))
+            print(Fore.RED + str(e))
             self.add_plant(plant)
+            break
           except IOError as e:
-            self._logger.exception('IO Error while saving picture. msg: {}'.format(e.message))
-            print(Fore.RED + e.message)
-            self.add_plant(plant)
-          except ConnectionError as e:
-            print(Fore.RED + e.message)
-            self._logger.error(e.message)
+            self._logger.exception('IO Error while saving picture. msg: {}'.format(e))
+            print(Fore.RED + str(e))
             self.add_plant(plant)
+            break
 
           if plant.get_picture_count() > 0:
             print(Fore.YELLOW + '{} images remaining for plant "{}"'.format(
@@ -228,6 +256,9 @@ class ImageHandler(threading.Thread):
 
         if plant.get_picture_count() == 0:
           plant.forget(self.persist_dir)
+        if archive_seconds > 0:
+          print(Fore.YELLOW + 'Archived {:.1f} MB of originals at {:.1f} MB/s'.format(
+                archived_bytes / 1e6, archived_bytes / archive_seconds / 1e6))
 
         print(Fore.YELLOW + 'Plant "{}" done'.format(plant.name))
         self.queue.task_done()
@@ -235,6 +266,8 @@ class ImageHandler(threading.Thread):
       except Empty:
         pass
 
+    self._pool.terminate()
+    self._pool.join()
     print(Fore.YELLOW + "Persist remaining plants ~" + str(self.queue.qsize()))
     while not self.queue.empty():
       try:
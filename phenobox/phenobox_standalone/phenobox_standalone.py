@@ -7,12 +7,16 @@ import logging
 from logging.handlers import RotatingFileHandler
 from queue import Queue, Empty
 
+# The phenobox_core package shared with the networked phenobox is located next to this package
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
 from colorama import init, Fore
 
 import gpio_controllers as gpio
 from gpio_controllers.input_controller import InputController, DoorState, ButtonPress
 from gpio_controllers.led_controller import LedController
 from gpio_controllers.motor_controller import MotorController
+from gpio_controllers.errors import MotorTimeoutError
 from gpio_controllers.blinker import Blinker
 from gpio_controllers.illumination import Illumination
 from camera import CameraController
@@ -21,6 +25,7 @@ from event import UserEvent
 from image_processing import CodeScanner
 from statemachine.statemachine import PhenoboxStateMachine
 from network.image_handler import ImageHandler
+from phenobox_core.angle_plan import parse_angles
 
 
 
@@ -84,7 +89,17 @@ class Phenobox():
     init(autoreset=True)
 
     photo_count = getattr(config, 'cfg').getint('box', 'photo_count')
-    self.illumination = Illumination(13)  # use GPIO pin 13 for illumination PWM control
+    pipelined_capture = getattr(config, 'cfg').getboolean('box', 'pipelined_capture', fallback=False)
+    cfg = getattr(config, 'cfg')
+    illumination_profiles = None
+    if cfg.has_section('illumination_profiles'):
+      illumination_profiles = dict((state, cfg.getfloat('illumination_profiles', state))
+                                   for state in cfg.options('illumination_profiles'))
+    # use GPIO pin 13 for illumination PWM control
+    self.illumination = Illumination(13, profiles=illumination_profiles,
+                                     ramp_time=cfg.getfloat('illumination', 'ramp_time', fallback=0.3),
+                                     settle_time=cfg.getfloat('illumination', 'settle_time', fallback=1),
+                                     settle_timeout=cfg.getfloat('illumination', 'settle_timeout', fallback=5))
     self.led_controller = LedController()
     self.led_controller.initialize()
     self.led_controller.blink_green(1)
@@ -92,8 +107,20 @@ class Phenobox():
     self.scanner = CodeScanner()
     self.camera_controller = CameraController()
     self.camera_controller.initialize()
-    self.motor_controller = MotorController()
-    self.motor_controller.initialize()
+    self.camera_controller.start_keep_alive()
+    self.motor_controller = MotorController(
+      settle_time=getattr(config, 'cfg').getfloat('motor', 'settle_time', fallback=0.4),
+      position_settle_time=getattr(config, 'cfg').getfloat('motor', 'position_settle_time', fallback=0.4),
+      timeout=getattr(config, 'cfg').getfloat('motor', 'timeout', fallback=30),
+      positions=parse_angles(getattr(config, 'cfg').get('motor', 'positions', fallback='0,60,120,180,240,300'))
+    )
+    motor_ready = True
+    try:
+      self.motor_controller.initialize()
+    except MotorTimeoutError as e:
+      # Signalled on the LEDs by the ERROR state of the state machine
+      logging.getLogger(__name__).error('Unable to initialize the motor. ({})'.format(e))
+      motor_ready = False
 
     self.image_handler = ImageHandler(photo_count=photo_count)
     self.image_handler.setDaemon(True)
@@ -102,9 +129,12 @@ class Phenobox():
     self.phenobox_statemachine = PhenoboxStateMachine(
       self.camera_controller, self.scanner, self.motor_controller,
       self.led_controller, self.image_handler, self.illumination,
-      photo_count
+      photo_count, pipelined_capture, parse_angles(getattr(config, 'cfg').get('box', 'angles', fallback=''))
     )
-    self.phenobox_statemachine.initialize()
+    if motor_ready:
+      self.phenobox_statemachine.initialize()
+    else:
+      self.phenobox_statemachine.error(error_code=13)
     self.input_controller = InputController()
     self.input_controller.initialize(self.door_state_changed, self.start_pressed)
     signal.signal(signal.SIGUSR1, sigUSR1_handler)
@@ -1,4 +1,5 @@
 import datetime
+import errno
 import jsonpickle
 import logging
 import os
@@ -29,7 +30,8 @@ class Plant:
 
     def delete_picture(self, index):
         """
-        Removes the entry from the list of pictures and deletes the image from the filesystem
+        Removes the entry from the list of pictures and deletes the image from the filesystem if it has not been moved
+        away already
 
         :param index: The index of the image in the list
 
@@ -37,7 +39,11 @@ class Plant:
         """
         if index < len(self.pictures):
             pic_path, _ = self.pictures[index]
-            os.remove(pic_path)
+            try:
+                os.remove(pic_path)
+            except OSError as e:
+                if e.errno != errno.ENOENT:
+                    raise
             self.pictures.pop(index)
 
     def delete_all_pictures(self):
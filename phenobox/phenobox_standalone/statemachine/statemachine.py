@@ -1,5 +1,4 @@
 import logging
-import time
 
 from colorama import Fore
 from transitions import Machine
@@ -8,6 +7,8 @@ import uuid
 import re
 
 from camera import CaptureError, ConnectionError
+from gpio_controllers import MotorTimeoutError
+from phenobox_core.angle_plan import plan_positions, split_angle_plan
 from plant import Plant
 
 
@@ -35,11 +36,13 @@ class PhenoboxStateMachine(Machine):
         9: "Unable to create snapshot on server",
         10: "This plant has already been processed for the current timestamp",
         11: "Unable to connect to server",
-        12: "QR-Code has unknown meaning"
+        12: "QR-Code has unknown meaning",
+        13: "Motor did not reach its position",
+        14: "QR-Code contains an angle the turntable can not drive to"
     }
 
     def __init__(self, camera_controller, code_scanner, motor_controller,
-                 led_controller, image_handler, illumination, photo_count=6):
+                 led_controller, image_handler, illumination, photo_count=6, pipelined_capture=False, angles=None):
 
         self.camera_controller = camera_controller
         self.code_scanner = code_scanner
@@ -48,6 +51,18 @@ class PhenoboxStateMachine(Machine):
         self.image_handler = image_handler
         self.illumination = illumination
         self.photo_count = photo_count
+        #: The angles at which pictures are taken unless the QR-Code of a plant contains its own angle plan.
+        # Defaults to the first photo_count positions of the motor controller
+        self.angles = angles if angles else motor_controller.positions[:photo_count]
+        #: The motor controller positions still to visit for the current plant in the order of travel
+        self._remaining_positions = []
+        #: Whether the angle plan of the current plant contains the origin. Otherwise the first picture is only used to
+        # read the QR-Code and is not uploaded
+        self._origin_planned = True
+        #: If True the download of a picture runs in the background while the motor drives to the next position
+        self.pipelined_capture = pipelined_capture
+        #: The running download and the angle of the last picture if pipelined_capture is enabled
+        self._pending_download = None
         # this is used to split QR code data into several fields:
         self.qrcode_pattern = re.compile('^([^ ]+) ([^ ]+) ([^ ]+) ([^ ]+).*$')
 
@@ -55,7 +70,7 @@ class PhenoboxStateMachine(Machine):
         self._logger.setLevel(logging.INFO)
 
         states = ['STARTUP',
-                  State(name='IDLE', on_enter='on_enter_idle'),
+                  State(name='IDLE', on_enter='on_enter_idle', on_exit='on_exit_idle'),
                   State(name='AUTH', on_enter='on_enter_auth'),
                   State(name='TAKE_FIRST_PICTURE', on_enter='on_enter_take_first_picture'),
                   State(name='ANALYZE_PICTURE', on_enter='on_enter_analyze_picture'),
@@ -69,6 +84,7 @@ class PhenoboxStateMachine(Machine):
 
         Machine.__init__(self, states=states, send_event=True, initial="STARTUP")
         self.add_transition('initialize', 'STARTUP', 'RETURN', after=[self.after_return])
+        self.add_transition('error', 'STARTUP', 'ERROR')
 
         # ----FROM IDLE----#
         self.add_transition('start', 'IDLE', 'SETUP', after=[self.after_start], conditions=[self.valid_authentication])
@@ -81,11 +97,14 @@ class PhenoboxStateMachine(Machine):
         self.add_transition('error', 'TAKE_FIRST_PICTURE', 'ERROR')
         # ----FROM ANALYZE_PICTURE----#
         self.add_transition('rotate', 'ANALYZE_PICTURE', 'DRIVE', after=[self.after_rotate])
+        self.add_transition('upload', 'ANALYZE_PICTURE', 'UPLOAD', after=[self.after_upload])
         self.add_transition('error', 'ANALYZE_PICTURE', 'ERROR')
         # ----FROM SETUP----#
         self.add_transition('take_first', 'SETUP', 'TAKE_FIRST_PICTURE', after=[self.after_take_first])
+        self.add_transition('error', 'SETUP', 'ERROR')
         # ----FROM DRIVE----#
         self.add_transition('picture', 'DRIVE', 'TAKE_PICTURE', after=[self.after_picture])
+        self.add_transition('error', 'DRIVE', 'ERROR')
         # ----FROM TAKE_PICTURE----#
         self.add_transition('error', "TAKE_PICTURE", 'ERROR')
         self.add_transition('next_picture', 'TAKE_PICTURE', 'DRIVE', after=[self.after_rotate],
@@ -94,6 +113,7 @@ class PhenoboxStateMachine(Machine):
                             conditions=[self.enough_pictures])
         # ----FROM RETURN----#
         self.add_transition('idle', 'RETURN', 'IDLE')
+        self.add_transition('error', 'RETURN', 'ERROR')
         # ----FROM UPLOAD----#
         self.add_transition('upload_finished', 'UPLOAD', 'RETURN', after=[self.after_return])
         # ----FROM ERROR----#
@@ -112,7 +132,11 @@ class PhenoboxStateMachine(Machine):
     def on_enter_return(self, event):
         print(Fore.BLUE + 'Returning to Origin')
         # time.sleep(1)
-        self.motor_controller.return_to_origin()
+        try:
+            self.motor_controller.return_to_origin()
+        except MotorTimeoutError as e:
+            self._logger.error(str(e))
+            self.error(error_code=13)
 
     def after_return(self, event):
         self.idle()
@@ -123,6 +147,13 @@ class PhenoboxStateMachine(Machine):
         self.led_controller.switch_green(True)
         self.code_information = None
         self.plant = None
+        self._remaining_positions = []
+        self.illumination.apply_profile('IDLE')
+        # Keep the camera session alive until it is needed again
+        self.camera_controller.resume_keep_alive()
+
+    def on_exit_idle(self, event):
+        self.camera_controller.pause_keep_alive()
 
     def on_enter_auth(self, event):
         print(Fore.BLUE + 'Skipping Authentication')
@@ -134,7 +165,14 @@ class PhenoboxStateMachine(Machine):
         print(Fore.BLUE + 'Setting up')
         self.led_controller.switch_green(False)
         self.led_controller.switch_blue(True)
-        self.motor_controller.return_to_origin()
+        # The light ramps up while the turntable returns to its origin
+        self.illumination.apply_profile('TAKE_FIRST_PICTURE', self.motor_controller.get_angle(0))
+        try:
+            self.motor_controller.return_to_origin()
+        except MotorTimeoutError as e:
+            self._logger.error(str(e))
+            self.error(error_code=13)
+            return
         self.plant = Plant()
 
     def after_start(self, event):
@@ -144,8 +182,7 @@ class PhenoboxStateMachine(Machine):
         pict_name = str(uuid.uuid4())
         print(Fore.BLUE + 'Taking first picture: {}'.format(pict_name))
         try:
-            self.illumination.set_illumination(100)
-            time.sleep(1)
+            self.illumination.wait_until_settled()
             picture_path = self.camera_controller.capture_and_download(pict_name)
             print('Picture path: "{}"'.format(picture_path))
             if picture_path is None:
@@ -160,8 +197,6 @@ class PhenoboxStateMachine(Machine):
         except CaptureError as err:
             self._logger.error(err.message)
             self.error(error_code=4)
-        finally:
-            self.illumination.set_illumination(1)
 
     def after_take_first(self, event):
         pass
@@ -178,6 +213,16 @@ class PhenoboxStateMachine(Machine):
         qrcode = self.code_information.decode('utf8')
         print(Fore.CYAN + 'Decoded symbol "{}"'.format(qrcode))
         self._logger.info( 'decoded symbol "{}"'.format(qrcode))
+        qrcode, angles = split_angle_plan(qrcode)
+        if angles is None:
+          angles = self.angles
+        try:
+          self._remaining_positions = plan_positions(angles, self.motor_controller)
+        except ValueError as e:
+          self._logger.error(str(e))
+          self.error(error_code=14)
+          return
+        self._origin_planned = self.motor_controller.get_angle(0) in angles
         m = self.qrcode_pattern.match(qrcode)
         if not m:
           self.error(error_code=12)
@@ -194,32 +239,70 @@ class PhenoboxStateMachine(Machine):
       else:
         self.error(error_code=1)
         return
-      self.rotate()
+      if self._remaining_positions:
+        self.rotate()
+      else:
+        self.upload()
 
     def on_enter_drive(self, event):
         print(Fore.BLUE + 'Driving')
         # time.sleep(1)
-        self.motor_controller.move_to_position(self.plant.get_picture_count())
+        position = self._remaining_positions.pop(0)
+        # The light ramps to the level of the next angle while the turntable is moving
+        self.illumination.apply_profile('TAKE_PICTURE', self.motor_controller.get_angle(position))
+        try:
+            self.motor_controller.move_to_position(position)
+        except MotorTimeoutError as e:
+            self._logger.error(str(e))
+            self.error(error_code=13)
 
     def after_rotate(self, event):
-        time.sleep(1)
         self.picture()
 
     def on_enter_take_picture(self, event):
         print(Fore.BLUE + 'Taking picture at angle ' + str(self.motor_controller.current_angle))
         try:
-            picture_path = self.camera_controller.capture_and_download(str(uuid.uuid4()))
-            if picture_path is None:
-                self.error(error_code=6)
-            else:
-                self.plant.add_picture(picture_path, self.motor_controller.current_angle)
-                #copy(picture_path, '/home/pi/Phenobox/smbmnt')
+            self.illumination.wait_until_settled()
+            if self.pipelined_capture:
+                # The camera can only be used again once the previous download has finished
+                if not self._finish_pending_download():
+                    self.error(error_code=6)
+                    return
+                download = self.camera_controller.capture_and_download_async(str(uuid.uuid4()))
+                self._pending_download = (download, self.motor_controller.current_angle)
+                if not self._remaining_positions and not self._finish_pending_download():
+                    self.error(error_code=6)
+                    return
                 self.next_picture()
+            else:
+                picture_path = self.camera_controller.capture_and_download(str(uuid.uuid4()))
+                if picture_path is None:
+                    self.error(error_code=6)
+                else:
+                    self.plant.add_picture(picture_path, self.motor_controller.current_angle)
+                    #copy(picture_path, '/home/pi/Phenobox/smbmnt')
+                    self.next_picture()
         except CaptureError:
             self.error(error_code=4)
 
+    def _finish_pending_download(self):
+        """
+        Waits for the background download of the previous picture, if there is one, and adds it to the plant
+
+        :return: False if the download failed, True otherwise
+        """
+        if self._pending_download is None:
+            return True
+        download, angle = self._pending_download
+        self._pending_download = None
+        picture_path = download.result()
+        if picture_path is None:
+            return False
+        self.plant.add_picture(picture_path, angle)
+        return True
+
     def enough_pictures(self, event):
-        return self.plant.get_picture_count() >= self.photo_count
+        return not self._remaining_positions
 
     def after_picture(self, event):
         pass
@@ -227,6 +310,9 @@ class PhenoboxStateMachine(Machine):
     def on_enter_upload(self, event):
         print(Fore.BLUE + 'Dispatching picture tasks')
         self.led_controller.blink_orange()
+        if not self._origin_planned:
+            # The first picture was only taken to read the QR-Code
+            self.plant.delete_picture(0)
         self.image_handler.add_plant(self.plant)
 
     # TODO rename to after_upload_dispatched
@@ -240,15 +326,19 @@ class PhenoboxStateMachine(Machine):
         # Reset state variables
         self.pic_count = 0
         self.code_information = None
+        self._remaining_positions = []
         if self.plant is not None:
+            # Let a running download finish so that its picture gets deleted as well
+            self._finish_pending_download()
             self.plant.delete_all_pictures()
         self.plant = None
+        self.illumination.apply_profile('ERROR')
 
         msg = self.error_messages.get(error_code, "Unknown error")
         self._logger.info('Machine transitioned to error state with code {}. ({})'.format(error_code, msg))
         print(Fore.RED + msg)
         self.led_controller.clear_all()
-        if error_code == 1:
+        if error_code == 1 or error_code == 14:
             self.led_controller.switch_orange(True)
         elif error_code == 2 or error_code == 6 or error_code == 7 or error_code == 9 or error_code == 11:
             self.led_controller.switch_red(True)
@@ -259,6 +349,8 @@ class PhenoboxStateMachine(Machine):
             self.led_controller.blink_orange()
         elif error_code == 10:
             self.led_controller.blink_blue()
+        elif error_code == 13:
+            self.led_controller.blink_red()
 
     def on_exit_error(self, event):
         self.led_controller.clear_all()
@@ -6,6 +6,7 @@ import time
 import os
 import sys
 sys.path.append(os.path.expanduser('~/github/PhenoBox-System/phenobox/phenobox_standalone'))
+sys.path.append(os.path.expanduser('~/github/PhenoBox-System/phenobox'))
 from config import config
 from camera import CameraController
 from camera.errors import ConnectionError, CaptureError
@@ -10,6 +10,7 @@ from server.api.blueprints import api
 from server.api.exceptions import ForbiddenActionError
 from server.extensions import db
 from server.models import AnalysisModel, SnapshotModel, ImageModel, TimestampModel
+from server.models.image_model import COMPRESSED_IMAGE_EXTENSIONS
 from server.modules.processing.analysis.analysis import get_iap_pipeline
 from server.modules.processing.exceptions import InvalidPathError, AnalysisDataNotPresentError
 from server.utils.util import get_local_path_from_smb
@@ -82,6 +83,20 @@ def _get_postproccessing_result_paths(analysis, shared_folder_map):
     return paths
 
 
+def _get_compress_type(path):
+    """
+    Images which are already compressed are only stored in the zip file as deflating them again costs a lot of
+    CPU time for next to no gain
+
+    :param path: The path of the file to add to the zip file
+
+    :return: The zipstream compression type to use for the given file
+    """
+    if path.rpartition('.')[2].lower() in COMPRESSED_IMAGE_EXTENSIONS:
+        return zipstream.ZIP_STORED
+    return zipstream.ZIP_DEFLATED
+
+
 def sanitize_string(s):
     valid_chars = "-_.() %s%s" % (string.ascii_letters, string.digits)
     res = ''.join(c for c in s if c in valid_chars)
@@ -112,7 +127,7 @@ def download_images():
         if image_paths is not None:
             for image_path in image_paths:
                 arcpath = os.path.join(name, os.path.basename(image_path))
-                z.write(image_path, arcpath)
+                z.write(image_path, arcpath, compress_type=_get_compress_type(image_path))
 
         for chunk in z:
             yield chunk
@@ -179,10 +194,10 @@ def download_results():
         image_basepath = os.path.join(name, 'images')
         for image_path in raw_image_paths:
             arcpath = os.path.join(image_basepath, 'original', os.path.basename(image_path))
-            z.write(image_path, arcpath)
+            z.write(image_path, arcpath, compress_type=_get_compress_type(image_path))
         for image_path in segmented_image_paths:
             arcpath = os.path.join(image_basepath, 'segmented', os.path.basename(image_path))
-            z.write(image_path, arcpath)
+            z.write(image_path, arcpath, compress_type=_get_compress_type(image_path))
 
         for chunk in z:
             yield chunk
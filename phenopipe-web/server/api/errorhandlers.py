@@ -3,7 +3,7 @@ from graphql_relay import to_global_id
 
 from server.api.blueprints import api
 from server.modules.processing.exceptions import AlreadyRunningError, AlreadyFinishedError, InvalidPathError, \
-    AnalysisDataNotPresentError
+    AnalysisDataNotPresentError, UnsupportedImageFormatError
 from server.modules.processing.remote_exceptions import PipelineAlreadyExistsError, UnavailableError, \
     InvalidPipelineError, InternalError, PostprocessingStackAlreadyExistsError
 
@@ -48,6 +48,11 @@ def handle_invalid_path(err):
     return jsonify({'msg': err.message}), 422
 
 
+@api.errorhandler(UnsupportedImageFormatError)
+def handle_unsupported_image_format(err):
+    return jsonify({'msg': err.message, 'extensions': err.extensions}), 422
+
+
 @api.errorhandler(AnalysisDataNotPresentError)
 def handle_analysis_data_not_present(err):
     return jsonify(
@@ -2,12 +2,14 @@ import graphene
 from flask import logging
 from flask_jwt_extended import get_jwt_identity
 from graphene import Node
-from graphene_sqlalchemy import SQLAlchemyObjectType, SQLAlchemyConnectionField
+from graphene_sqlalchemy import SQLAlchemyObjectType
 from graphql_relay import from_global_id
 from sqlalchemy.exc import DBAPIError
 from sqlalchemy.orm import contains_eager
 
 from server.api.graphql.exceptions import UnknownDataError
+from server.api.graphql.loaders import load_relationship
+from server.api.graphql.pagination import create_connection, KeysetConnectionField
 from server.api.graphql.pipeline_schema import Pipeline
 from server.api.graphql.sample_group_schema import SampleGroup
 from server.extensions import db
@@ -22,9 +24,14 @@ class Analysis(SQLAlchemyObjectType):
         model = AnalysisModel
         interfaces = (Node,)
 
-    sample_groups = SQLAlchemyConnectionField(SampleGroup)
+    @classmethod
+    def get_connection(cls):
+        return create_connection(cls)
+
+    sample_groups = KeysetConnectionField(SampleGroup)
     pipeline = graphene.Field(Pipeline)
     snapshots = graphene.ConnectionField(lambda: Snapshot)
+    postprocessings = KeysetConnectionField(lambda: Postprocess)
 
     def resolve_sample_groups(self, args, context, info):
         return db.session.query(SampleGroupModel) \
@@ -34,7 +41,7 @@ class Analysis(SQLAlchemyObjectType):
             .options(
             contains_eager("plants"),
             contains_eager("plants.snapshots")
-        ).filter(TimestampModel.analyses.any(AnalysisModel.id == self.id))
+        ).filter(TimestampModel.analyses.any(AnalysisModel.id == self.id)).all()
 
     def resolve_pipeline(self, args, context, info):
         try:
@@ -47,7 +54,13 @@ class Analysis(SQLAlchemyObjectType):
             raise
 
     def resolve_snapshots(self, args, context, info):
-        return db.session.query(SnapshotModel).filter(SnapshotModel.timestamp_id == self.timestamp_id).all()
+        return load_relationship(load_relationship(self, 'timestamp'), 'snapshots')
+
+    def resolve_timestamp(self, args, context, info):
+        return load_relationship(self, 'timestamp')
+
+    def resolve_postprocessings(self, args, context, info):
+        return load_relationship(self, 'postprocessings')
 
 
 class DeleteAnalysis(graphene.Mutation):
@@ -73,3 +86,4 @@ class DeleteAnalysis(graphene.Mutation):
 # noinspection PyPep8
 from server.api.graphql.snapshot_schema import Snapshot
 # noinspection PyPep8
+from server.api.graphql.postprocess_schema import Postprocess
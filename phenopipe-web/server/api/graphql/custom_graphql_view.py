@@ -1,14 +1,167 @@
+import json
+import logging
+import time
+
+import six
+from flask import request
 from flask_graphql import GraphQLView
+from flask_graphql.graphqlview import HttpError
+from flask_jwt_extended import get_jwt_identity
+from graphql import Source, parse, validate
+from graphql.execution import ExecutionResult
+from graphql.utils.get_operation_ast import get_operation_ast
+from werkzeug.exceptions import BadRequest, MethodNotAllowed
 
 from server.api.exceptions import ForbiddenActionError
 from server.api.graphql.exceptions import ConstraintViolationError, InvalidMutationRequestError, UnableToDeleteError, \
-    UnknownDataError, ConflictingDataError
+    UnknownDataError, ConflictingDataError, NotFoundError, QueryCostError, PersistedQueryError
+from server.api.graphql.query_cost import QueryCostAnalyzer, DEFAULT_MAX_COST, DEFAULT_MAX_DEPTH
 from server.modules.processing.remote_exceptions import UnavailableError
+from server.utils.redis_query_store import get_query_hash
 
 
 class CustomGraphQLView(GraphQLView):
+    #: The maximum cost of a query for users without a budget in user_budgets (See :class:`.QueryCostAnalyzer`)
+    max_cost = DEFAULT_MAX_COST
+    #: The maximum depth of a query
+    max_depth = DEFAULT_MAX_DEPTH
+    #: The maximum cost of a query by username
+    user_budgets = {}
+    #: The weights of the fields used to calculate the cost of a query. None to use the defaults
+    field_costs = None
+    #: The usual sizes of connections used to calculate the cost of a query. None to use the defaults
+    connection_sizes = None
+    #: The :class:`.DocumentCache` of parsed and validated documents. None to parse every request
+    document_cache = None
+    #: The :class:`.PersistedQueryStore` of the documents which can be sent by hash. None to disable persisted queries
+    persisted_queries = None
+
+    def __init__(self, **kwargs):
+        super(CustomGraphQLView, self).__init__(**kwargs)
+        self._cost_analyzer = QueryCostAnalyzer(self.schema, self.field_costs, self.connection_sizes)
+
+    @staticmethod
+    def _get_persisted_query_hash(data):
+        extensions = request.args.get('extensions') or data.get('extensions')
+        if extensions and isinstance(extensions, six.string_types):
+            try:
+                extensions = json.loads(extensions)
+            except ValueError:
+                raise HttpError(BadRequest('Extensions are invalid JSON.'))
+        persisted_query = (extensions or {}).get('persistedQuery')
+        if persisted_query is None:
+            return None
+        return persisted_query.get('sha256Hash')
+
+    def _get_document(self, data, query):
+        """
+        Returns the parsed and validated document of the request. The document is taken from the cache if possible.
+        Clients can send the hash of a persisted document instead of its text as proposed by Apollo's automatic
+        persisted queries: If the server does not know the hash yet, it answers with PersistedQueryNotFound and the
+        client sends the hash together with the document, which is stored for all further requests.
+
+        :return: A tuple (document_ast, errors)
+        """
+        persisted_hash = self._get_persisted_query_hash(data) if self.persisted_queries is not None else None
+        if query:
+            query_hash = get_query_hash(query)
+            if persisted_hash is not None and persisted_hash != query_hash:
+                return None, [PersistedQueryError('provided sha does not match query')]
+        else:
+            query_hash = persisted_hash
+
+        document_ast = self.document_cache.get(query_hash) if self.document_cache is not None else None
+        if document_ast is not None:
+            if persisted_hash is not None and query:
+                # Registered by a client while this process already knows the document, the other processes do not
+                self.persisted_queries.put(query)
+            return document_ast, None
+
+        if not query:
+            query = self.persisted_queries.get(query_hash)
+            if query is None:
+                return None, [PersistedQueryError('PersistedQueryNotFound')]
+            persisted_hash = None
+        start = time.time()
+        try:
+            document_ast = parse(Source(query, name='GraphQL request'))
+            validation_errors = validate(self.schema, document_ast)
+        except Exception as e:
+            return None, [e]
+        if validation_errors:
+            return None, validation_errors
+        if self.document_cache is not None:
+            self.document_cache.put(query_hash, document_ast, time.time() - start)
+        if persisted_hash is not None:
+            self.persisted_queries.put(query)
+        return document_ast, None
+
+    def execute_graphql_request(self, data, query, variables, operation_name, show_graphiql=False):
+        if self.document_cache is None and self.persisted_queries is None:
+            return super(CustomGraphQLView, self).execute_graphql_request(data, query, variables, operation_name,
+                                                                          show_graphiql)
+        if not query and (self.persisted_queries is None or self._get_persisted_query_hash(data) is None):
+            if show_graphiql:
+                return None
+            raise HttpError(BadRequest('Must provide query string.'))
+
+        document_ast, errors = self._get_document(data, query)
+        if errors:
+            return ExecutionResult(errors=errors, invalid=True)
+
+        if request.method.lower() == 'get':
+            operation_ast = get_operation_ast(document_ast, operation_name)
+            if operation_ast and operation_ast.operation != 'query':
+                if show_graphiql:
+                    return None
+                raise HttpError(MethodNotAllowed(
+                    ['POST'], 'Can only perform a {} operation from a POST request.'.format(operation_ast.operation)
+                ))
+
+        try:
+            return self.execute(
+                document_ast,
+                root_value=self.get_root_value(request),
+                variable_values=variables or {},
+                operation_name=operation_name,
+                context_value=self.get_context(request),
+                middleware=self.get_middleware(request),
+                executor=self.get_executor(request)
+            )
+        except Exception as e:
+            return ExecutionResult(errors=[e], invalid=True)
+
+    def execute(self, document_ast, *args, **kwargs):
+        """
+        Executes the query after checking its cost and depth against the limits of the user
+
+        :raises QueryCostError: if the query exceeds the maximum depth or the budget of the user. The request is
+            answered with status 400 and the calculated cost
+
+        :return: The execution result
+        """
+        identity = get_jwt_identity() or {}
+        username = identity.get('username')
+        max_cost = self.user_budgets.get(username, self.max_cost)
+        operation_name = kwargs.get('operation_name')
+        cost, depth = self._cost_analyzer.analyze(document_ast, kwargs.get('variable_values'), operation_name)
+        if depth > self.max_depth:
+            raise QueryCostError('Query depth {} exceeds the maximum of {}'.format(depth, self.max_depth),
+                                 cost, max_cost, depth, self.max_depth)
+        if cost > max_cost:
+            raise QueryCostError('Query cost {} exceeds the budget of {}'.format(cost, max_cost),
+                                 cost, max_cost, depth, self.max_depth)
+        start = time.time()
+        result = super(CustomGraphQLView, self).execute(document_ast, *args, **kwargs)
+        logging.getLogger(__name__).info('Executed query {} of {} with cost {} and depth {} in {:.0f} ms'
+                                         .format(operation_name, username, cost, depth, (time.time() - start) * 1000))
+        return result
+
     @staticmethod
     def format_error(error):
+        if isinstance(error, QueryCostError):
+            return {"message": str(error), 'code': 400, 'cost': error.cost, 'maxCost': error.max_cost,
+                    'depth': error.depth, 'maxDepth': error.max_depth}
         if hasattr(error, 'original_error') and error.original_error:
             formatted = {"message": str(error.original_error)}
             if isinstance(error.original_error, UnavailableError):
@@ -19,6 +172,8 @@ class CustomGraphQLView(GraphQLView):
                 formatted['code'] = 422
             elif isinstance(error.original_error, ConflictingDataError):
                 formatted['code'] = 409
+            elif isinstance(error.original_error, NotFoundError):
+                formatted['code'] = 404
             elif isinstance(error.original_error, InvalidMutationRequestError):
                 formatted['code'] = 422
             elif isinstance(error.original_error, UnableToDeleteError):
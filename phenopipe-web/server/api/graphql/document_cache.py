@@ -0,0 +1,92 @@
+import logging
+import os
+from collections import OrderedDict
+from threading import Lock
+
+
+class DocumentCache(object):
+    """
+    LRU cache of parsed and validated GraphQL documents by the hash of their text.
+
+    Clients send the same few documents over and over again, e.g. the phenobox sends addImages for every plant, so
+    most requests can skip parsing and validation. The hit rate and the time saved are logged every report_interval
+    lookups.
+    """
+
+    def __init__(self, max_size=256, report_interval=1000):
+        """
+
+        :param max_size: The maximum number of documents kept in the cache
+        :param report_interval: The number of lookups after which the statistics are logged. 0 to disable the reports
+        """
+        self._max_size = max_size
+        self._report_interval = report_interval
+        self._logger = logging.getLogger(__name__)
+        self._lock = Lock()
+        self._documents = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        #: The number of documents which have been parsed and validated
+        self._parsed = 0
+        #: Seconds spent parsing and validating the documents
+        self._parse_seconds = 0.0
+
+    def get(self, query_hash):
+        """
+        Returns the document cached for the given hash and marks it as recently used
+
+        :param query_hash: The hash of the text of the document
+
+        :return: The parsed document or None if it is not cached
+        """
+        with self._lock:
+            document_ast = self._documents.pop(query_hash, None)
+            if document_ast is None:
+                self._misses += 1
+            else:
+                self._documents[query_hash] = document_ast
+                self._hits += 1
+            report = self._report_interval > 0 and (self._hits + self._misses) % self._report_interval == 0
+        if report:
+            self._logger.info('GraphQL document cache of process {}: {hits} hits, {misses} misses, '
+                              'hit rate {hit_rate:.1%}, {parse_seconds:.1f}s parsing, {saved_seconds:.1f}s saved'
+                              .format(os.getpid(), **self.get_statistics()))
+        return document_ast
+
+    def put(self, query_hash, document_ast, parse_seconds):
+        """
+        Adds a document which has been parsed and validated successfully. The least recently used document is
+        removed if the cache is full.
+
+        :param query_hash: The hash of the text of the document
+        :param document_ast: The parsed document
+        :param parse_seconds: The time it took to parse and validate the document
+
+        :return: None
+        """
+        with self._lock:
+            self._parsed += 1
+            self._parse_seconds += parse_seconds
+            self._documents.pop(query_hash, None)
+            self._documents[query_hash] = document_ast
+            while len(self._documents) > self._max_size:
+                self._documents.popitem(last=False)
+
+    def get_statistics(self):
+        """
+        Returns the statistics of the cache. The time saved is estimated from the average time it took to parse and
+        validate a document.
+
+        :return: A dict with the keys 'size', 'hits', 'misses', 'hit_rate', 'parse_seconds' and 'saved_seconds'
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            average = self._parse_seconds / self._parsed if self._parsed else 0
+            return {
+                'size': len(self._documents),
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / float(lookups) if lookups else 0,
+                'parse_seconds': self._parse_seconds,
+                'saved_seconds': self._hits * average
+            }
@@ -18,6 +18,11 @@ class InvalidMutationRequestError(DataError):
         super(InvalidMutationRequestError, self).__init__(message, *args)
 
 
+class NotFoundError(DataError):
+    def __init__(self, message, *args):
+        super(NotFoundError, self).__init__(message, *args)
+
+
 class UnableToDeleteError(DataError):
     def __init__(self, message, *args):
         super(UnableToDeleteError, self).__init__(message, *args)
@@ -26,3 +31,17 @@ class UnableToDeleteError(DataError):
 class UnknownDataError(DataError):
     def __init__(self, message, *args):
         super(UnknownDataError, self).__init__(message, *args)
+
+
+class QueryCostError(Exception):
+    def __init__(self, message, cost, max_cost, depth, max_depth, *args):
+        super(QueryCostError, self).__init__(message, *args)
+        self.cost = cost
+        self.max_cost = max_cost
+        self.depth = depth
+        self.max_depth = max_depth
+
+
+class PersistedQueryError(Exception):
+    def __init__(self, message, *args):
+        super(PersistedQueryError, self).__init__(message, *args)
@@ -12,7 +12,10 @@ from sqlalchemy.orm.exc import NoResultFound
 from server.api.exceptions import ForbiddenActionError
 from server.api.graphql.exceptions import ConstraintViolationError, UnknownDataError, InvalidMutationRequestError, \
     UnableToDeleteError
-from server.api.graphql.sample_group_schema import SampleGroupInput
+from server.api.graphql.loaders import load_relationship
+from server.api.graphql.pagination import create_connection, KeysetConnectionField
+from server.api.graphql.sample_group_schema import SampleGroup, SampleGroupInput
+from server.api.graphql.timestamp_schema import Timestamp
 from server.auth.authentication import is_admin
 from server.extensions import db
 from server.models import PlantModel
@@ -25,6 +28,19 @@ class Experiment(SQLAlchemyObjectType):
         model = ExperimentModel
         interfaces = (Node,)
 
+    @classmethod
+    def get_connection(cls):
+        return create_connection(cls)
+
+    sample_groups = KeysetConnectionField(SampleGroup)
+    timestamps = KeysetConnectionField(Timestamp)
+
+    def resolve_sample_groups(self, args, context, info):
+        return load_relationship(self, 'sample_groups')
+
+    def resolve_timestamps(self, args, context, info):
+        return load_relationship(self, 'timestamps')
+
 
 class ExperimentInput(graphene.InputObjectType):
     name = graphene.NonNull(graphene.String)
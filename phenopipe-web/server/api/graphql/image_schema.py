@@ -5,9 +5,12 @@ from graphene_sqlalchemy import SQLAlchemyObjectType
 from graphql_relay import from_global_id, to_global_id
 from sqlalchemy.exc import IntegrityError, DBAPIError
 
-from server.api.graphql.exceptions import UnknownDataError, ConflictingDataError
+from server.api.graphql.exceptions import UnknownDataError, ConflictingDataError, InvalidMutationRequestError
+from server.api.graphql.loaders import load_relationship
+from server.api.graphql.pagination import create_connection
 from server.extensions import db
 from server.models import ImageModel
+from server.models.image_model import RAW_IMAGE_EXTENSIONS
 
 
 class Image(SQLAlchemyObjectType):
@@ -15,12 +18,44 @@ class Image(SQLAlchemyObjectType):
         model = ImageModel
         interfaces = (Node,)
 
+    @classmethod
+    def get_connection(cls):
+        return create_connection(cls)
+
+    def resolve_snapshot(self, args, context, info):
+        return load_relationship(self, 'snapshot')
+
 
 class ImageInput(graphene.InputObjectType):
     timestamp_id = graphene.NonNull(graphene.Int)
     plant_id = graphene.NonNull(graphene.Int)
 
 
+def _create_image(snapshot_db_id, image_data):
+    """
+    Creates a new, not yet persisted, image instance from the given mutation input
+
+    :param snapshot_db_id: The database ID of the snapshot the image belongs to
+    :param image_data: A dict containing the 'path', 'filename', 'angle' and optionally the 'type' of the image
+
+    :raises InvalidMutationRequestError: if a raw image is not stored in one of the formats a phenobox uploads
+
+    :return: The ImageModel instance
+    """
+    t = image_data.get('type')
+    if t is not None and t.strip() == '':
+        t = None
+    image = ImageModel(snapshot_id=snapshot_db_id, path=image_data.get('path'), filename=image_data.get('filename'),
+                       angle=image_data.get('angle'),
+                       image_type=t)
+    # Images without a type are stored as raw images
+    if (t is None or t == 'raw') and image.extension not in RAW_IMAGE_EXTENSIONS:
+        raise InvalidMutationRequestError(
+            'Unsupported image format "{}". Allowed are: {}'.format(image.extension,
+                                                                   ', '.join(RAW_IMAGE_EXTENSIONS)))
+    return image
+
+
 class AddImage(graphene.Mutation):
     class Input:
         snapshot_id = graphene.NonNull(graphene.ID)
@@ -34,12 +69,7 @@ class AddImage(graphene.Mutation):
     def mutate(self, args, context, info):
         snapshot_id = args.get('snapshot_id')
         _, snapshot_db_id = from_global_id(snapshot_id)
-        t = args.get('type')
-        if t is not None and t.strip() == '':
-            t = None
-        image = ImageModel(snapshot_id=snapshot_db_id, path=args.get('path'), filename=args.get('filename'),
-                           angle=args.get('angle'),
-                           image_type=t)
+        image = _create_image(snapshot_db_id, args)
 
         try:
             db.session.add(image)
@@ -57,6 +87,48 @@ class AddImage(graphene.Mutation):
         return AddImage(id=to_global_id('Image', image.id))
 
 
+class AddImageInput(graphene.InputObjectType):
+    path = graphene.NonNull(graphene.String)
+    filename = graphene.NonNull(graphene.String)
+    angle = graphene.NonNull(graphene.Int)
+    type = graphene.String()
+
+
+class AddImages(graphene.Mutation):
+    """
+    Adds all given images to the snapshot in one transaction. Either all images are created or none
+    """
+
+    class Input:
+        snapshot_id = graphene.NonNull(graphene.ID)
+        images = graphene.NonNull(graphene.List(AddImageInput))
+
+    ids = graphene.List(graphene.ID)
+
+    def mutate(self, args, context, info):
+        snapshot_id = args.get('snapshot_id')
+        _, snapshot_db_id = from_global_id(snapshot_id)
+        images = [_create_image(snapshot_db_id, image_data) for image_data in args.get('images')]
+
+        image = None
+        try:
+            for image in images:
+                db.session.add(image)
+                # Flush each image on its own to be able to tell which one caused an error
+                db.session.flush()
+        except IntegrityError as err:
+            print(err.message)
+            db.session.rollback()
+            raise ConflictingDataError("Image {} already exists".format(image.filename))
+        except DBAPIError:
+            logging.getLogger(__name__).exception("An unexpected DB error occured")
+            db.session.rollback()
+            raise UnknownDataError("An unexpected DB error occured")
+        db.session.commit()
+
+        return AddImages(ids=[to_global_id('Image', image.id) for image in images])
+
+
 class DeleteImage(graphene.Mutation):
     class Input:
         id = graphene.ID()
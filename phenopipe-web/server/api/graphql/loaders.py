@@ -0,0 +1,144 @@
+from flask import g
+from sqlalchemy import inspect
+from sqlalchemy.orm.attributes import set_committed_value
+
+from server.extensions import db
+
+#: The maximum number of keys sent in a single IN query
+_BATCH_SIZE = 1000
+
+
+class RelationshipLoader(object):
+    """
+    Loads a relationship of a model for many instances with one IN query on the foreign key instead of one SELECT per
+    instance.
+
+    The instances the relationship is loaded for are taken from the session: when the relationship is requested for
+    one instance it is loaded for all instances of the model which have been loaded by the current request and do not
+    have it loaded yet. These are usually the siblings of the instance on the same page, e.g. all snapshots of a
+    timestamp. The loaded values are set on the instances as if SQLAlchemy had loaded them, relationships already
+    loaded (e.g. filtered by contains_eager) are left untouched.
+
+    Only relationships over a single foreign key column are supported. Relationships with a secondary table are
+    loaded by joining the secondary table and filtering on its foreign key column of the model.
+    """
+
+    def __init__(self, model, name):
+        """
+
+        :param model: The SQLAlchemy model which defines the relationship
+        :param name: The name of the relationship
+
+        :raises ValueError: if the relationship uses more than one column
+        """
+        mapper = inspect(model)
+        prop = mapper.relationships[name]
+        if len(prop.synchronize_pairs) != 1 or len(prop.secondary_synchronize_pairs or []) > 1:
+            raise ValueError('Relationship {}.{} can not be loaded in batches'.format(model.__name__, name))
+        local_column, remote_column = prop.synchronize_pairs[0]
+        if prop.direction.name == 'MANYTOONE':
+            # The foreign key is a column of the model
+            remote_column, local_column = local_column, remote_column
+        self._model = model
+        self._name = name
+        #: The attribute of the model holding the key which is looked up
+        self._local_key = mapper.get_property_by_column(local_column).key
+        self._target = prop.mapper.class_
+        #: The column holding the key of the model, either of the target or of the secondary table
+        self._remote_column = remote_column
+        self._secondary = prop.secondary
+        if prop.secondary is not None:
+            target_column, secondary_column = prop.secondary_synchronize_pairs[0]
+            self._secondary_join = target_column == secondary_column
+        self._uselist = prop.uselist
+        #: Dynamic relationships are never loaded into the instance, their values are only kept in the cache
+        self._dynamic = prop.lazy == 'dynamic'
+        self._order_by = prop.order_by or []
+        #: The loaded targets by key
+        self._cache = {None: []}
+
+    def _needs_loading(self, state):
+        if self._local_key in state.unloaded:
+            # Expired instances would have to be refreshed one by one just to get their key
+            return False
+        if self._dynamic:
+            return state.dict[self._local_key] not in self._cache
+        return self._name in state.unloaded
+
+    def _result(self, key):
+        targets = self._cache.get(key, [])
+        if self._uselist:
+            return targets
+        return targets[0] if targets else None
+
+    def load(self, instance):
+        """
+        Returns the value of the relationship for the given instance, loading it for all instances of the model in the
+        session if necessary
+
+        :param instance: An instance of the model
+
+        :return: A list of the related instances or the related instance, depending on the relationship
+        """
+        if not self._dynamic and self._name not in inspect(instance).unloaded:
+            return getattr(instance, self._name)
+        key = getattr(instance, self._local_key)
+        if key not in self._cache:
+            self._load_batch(instance, key)
+        return self._result(key)
+
+    def _load_batch(self, instance, key):
+        siblings = [instance]
+        keys = {key}
+        for sibling in list(db.session.identity_map.values()):
+            if sibling is instance or not isinstance(sibling, self._model):
+                continue
+            state = inspect(sibling)
+            if self._needs_loading(state):
+                siblings.append(sibling)
+                keys.add(state.dict[self._local_key])
+        keys.discard(None)
+        targets = dict((k, []) for k in keys)
+        keys = list(keys)
+        for start in range(0, len(keys), _BATCH_SIZE):
+            query = db.session.query(self._target, self._remote_column).select_from(self._target)
+            if self._secondary is not None:
+                query = query.join(self._secondary, self._secondary_join)
+            query = query.filter(self._remote_column.in_(keys[start:start + _BATCH_SIZE]))
+            if self._order_by:
+                query = query.order_by(*self._order_by)
+            for target, target_key in query:
+                targets[target_key].append(target)
+        self._cache.update(targets)
+        if not self._dynamic:
+            for sibling in siblings:
+                set_committed_value(sibling, self._name, self._result(getattr(sibling, self._local_key)))
+
+
+def get_loader(model, name):
+    """
+    Returns the :class:`RelationshipLoader` of the current request for the given relationship
+
+    :param model: The SQLAlchemy model which defines the relationship
+    :param name: The name of the relationship
+
+    :return: The loader
+    """
+    loaders = getattr(g, '_graphql_loaders', None)
+    if loaders is None:
+        loaders = g._graphql_loaders = {}
+    if (model, name) not in loaders:
+        loaders[(model, name)] = RelationshipLoader(model, name)
+    return loaders[(model, name)]
+
+
+def load_relationship(instance, name):
+    """
+    Loads a relationship of the given instance together with all of its siblings (See :class:`RelationshipLoader`)
+
+    :param instance: The model instance
+    :param name: The name of the relationship
+
+    :return: A list of the related instances or the related instance, depending on the relationship
+    """
+    return get_loader(type(instance), name).load(instance)
@@ -0,0 +1,155 @@
+import binascii
+from datetime import datetime
+
+import dateutil.parser
+import graphene
+from graphene.relay.connection import PageInfo
+from graphene_sqlalchemy import SQLAlchemyConnectionField
+from graphql import GraphQLError
+from graphql_relay.utils import base64, unbase64
+from sqlalchemy import tuple_, func
+from sqlalchemy.orm import Query
+
+#: Prefix of the cursors returned by :class:`KeysetConnectionField`
+_CURSOR_PREFIX = 'keyset:'
+
+#: Sort value of rows without created_at, which puts them before all other rows
+_NULL_CREATED_AT = datetime(1970, 1, 1)
+
+
+def _resolve_total_count(self, args, context, info):
+    if isinstance(self.iterable, Query):
+        return self.iterable.order_by(None).count()
+    return len(self.iterable)
+
+
+def create_connection(node):
+    """
+    Creates the connection type of a node type. In addition to the edges and the page info it provides the total number
+    of nodes as totalCount, which is only counted if it has been requested.
+
+    Used as get_connection classmethod of the node types, e.g.::
+
+        @classmethod
+        def get_connection(cls):
+            return create_connection(cls)
+
+    :param node: The node type
+
+    :return: The connection type
+    """
+    return type('{}Connection'.format(node.__name__), (graphene.Connection,), {
+        'Meta': type('Meta', (), {'node': node}),
+        'total_count': graphene.NonNull(graphene.Int),
+        'resolve_total_count': _resolve_total_count
+    })
+
+
+def encode_cursor(instance):
+    """
+    Creates the cursor of a model instance from its sort key (created_at, id)
+
+    :param instance: The model instance
+
+    :return: The opaque cursor
+    """
+    created_at = instance.created_at if instance.created_at is not None else _NULL_CREATED_AT
+    return base64('{}{}|{}'.format(_CURSOR_PREFIX, instance.id, created_at.isoformat()))
+
+
+def decode_cursor(cursor):
+    """
+    Extracts the sort key from a cursor created by :func:`encode_cursor`
+
+    :param cursor: The cursor
+
+    :raises GraphQLError: if the cursor is invalid
+
+    :return: A tuple (created_at, id)
+    """
+    try:
+        value = unbase64(cursor)
+        if not value.startswith(_CURSOR_PREFIX):
+            raise ValueError()
+        db_id, created_at = value[len(_CURSOR_PREFIX):].split('|', 1)
+        return dateutil.parser.parse(created_at), int(db_id)
+    except (ValueError, TypeError, binascii.Error):
+        raise GraphQLError('Invalid cursor "{}"'.format(cursor))
+
+
+class KeysetConnectionField(SQLAlchemyConnectionField):
+    """
+    Connection field which pages through the query returned by its resolver in the database.
+
+    Nodes are ordered by (created_at, id) and the cursors contain this key, so first/after and last/before become a
+    WHERE on the key and a LIMIT. Only the requested page is loaded, however deep into the result it is. The total
+    number of nodes is counted separately if totalCount is requested. Resolvers which return a list instead of a
+    query are paged in memory as before.
+    """
+
+    @classmethod
+    def connection_resolver(cls, resolver, connection, model, root, args, context, info):
+        for name in ('first', 'last'):
+            if args.get(name) is not None and args.get(name) < 0:
+                raise GraphQLError('Argument "{}" must not be negative'.format(name))
+        iterable = resolver(root, args, context, info)
+        if iterable is None:
+            iterable = cls.get_query(model, context, info, args)
+        if not isinstance(iterable, Query):
+            result = super(KeysetConnectionField, cls).connection_resolver(lambda *_: iterable, connection, model,
+                                                                           root, args, context, info)
+            result.iterable = iterable
+            return result
+        return paginate(iterable, model, connection, args)
+
+
+def paginate(query, model, connection, args):
+    """
+    Loads the page of the query selected by the connection arguments first, last, after and before
+
+    :param query: The query of all nodes
+    :param model: The model whose created_at and id columns are used as sort key
+    :param connection: The connection type to return
+    :param args: The arguments of the connection field
+
+    :return: An instance of the connection type
+    """
+    first = args.get('first')
+    last = args.get('last')
+    # created_at is nullable, rows without it are sorted first instead of being dropped by the comparisons
+    created_at = func.coalesce(model.created_at, _NULL_CREATED_AT)
+    key = tuple_(created_at, model.id)
+    page = query.order_by(None)
+    if args.get('after') is not None:
+        page = page.filter(key > tuple_(*decode_cursor(args.get('after'))))
+    if args.get('before') is not None:
+        page = page.filter(key < tuple_(*decode_cursor(args.get('before'))))
+
+    has_previous_page = args.get('after') is not None
+    has_next_page = args.get('before') is not None
+    if first is None and last is not None:
+        # Read backwards from before so that only the last nodes are loaded
+        rows = page.order_by(created_at.desc(), model.id.desc()).limit(last + 1).all()
+        has_previous_page = len(rows) > last
+        rows = list(reversed(rows[:last]))
+    else:
+        page = page.order_by(created_at, model.id)
+        if first is not None:
+            rows = page.limit(first + 1).all()
+            has_next_page = len(rows) > first
+            rows = rows[:first]
+        else:
+            rows = page.all()
+        if last is not None:
+            has_previous_page = has_previous_page or len(rows) > last
+            rows = rows[-last:] if last > 0 else []
+
+    edges = [connection.Edge(node=row, cursor=encode_cursor(row)) for row in rows]
+    result = connection(edges=edges, page_info=PageInfo(
+        start_cursor=edges[0].cursor if edges else None,
+        end_cursor=edges[-1].cursor if edges else None,
+        has_previous_page=has_previous_page,
+        has_next_page=has_next_page
+    ))
+    result.iterable = query
+    return result
@@ -2,11 +2,15 @@ import graphene
 from flask import logging
 from graphene import Node
 from graphene_sqlalchemy import SQLAlchemyObjectType
+from graphene_sqlalchemy.registry import get_global_registry
 from graphql_relay import from_global_id
 from sqlalchemy.exc import IntegrityError, DBAPIError
 
 from server.api.graphql.exceptions import UnknownDataError
+from server.api.graphql.loaders import load_relationship
+from server.api.graphql.pagination import create_connection, KeysetConnectionField
 from server.extensions import db
+from server.models import SnapshotModel
 from server.models.plant_model import PlantModel
 
 
@@ -15,11 +19,25 @@ class Plant(SQLAlchemyObjectType):
         model = PlantModel
         interfaces = (Node,)
 
+    @classmethod
+    def get_connection(cls):
+        return create_connection(cls)
+
     full_name = graphene.String()
+    # snapshot_schema imports this module through analysis_schema, so the type is taken from the registry
+    snapshots = KeysetConnectionField(lambda: get_global_registry().get_type_for_model(SnapshotModel))
 
     def resolve_full_name(self, args, context, info):
+        # The full name contains the name of the sample group
+        load_relationship(self, 'sample_group')
         return self.full_name
 
+    def resolve_sample_group(self, args, context, info):
+        return load_relationship(self, 'sample_group')
+
+    def resolve_snapshots(self, args, context, info):
+        return load_relationship(self, 'snapshots')
+
 
 class PlantInput(graphene.InputObjectType):
     index = graphene.NonNull(graphene.Int)
@@ -2,13 +2,15 @@ import graphene
 from flask import logging
 from flask_jwt_extended import get_jwt_identity
 from graphene import Node
-from graphene_sqlalchemy import SQLAlchemyObjectType, SQLAlchemyConnectionField
+from graphene_sqlalchemy import SQLAlchemyObjectType
 from graphql_relay import from_global_id
 from sqlalchemy import and_
 from sqlalchemy.exc import DBAPIError
 from sqlalchemy.orm import contains_eager
 
 from server.api.graphql.exceptions import UnknownDataError
+from server.api.graphql.loaders import load_relationship
+from server.api.graphql.pagination import create_connection, KeysetConnectionField
 from server.api.graphql.postprocessing_stack_schema import PostprocessingStack
 from server.api.graphql.sample_group_schema import SampleGroup
 from server.extensions import db
@@ -23,7 +25,12 @@ class Postprocess(SQLAlchemyObjectType):
         model = PostprocessModel
         interfaces = (Node,)
 
-    sample_groups = SQLAlchemyConnectionField(SampleGroup)
+    @classmethod
+    def get_connection(cls):
+        return create_connection(cls)
+
+    sample_groups = KeysetConnectionField(SampleGroup)
+    snapshots = KeysetConnectionField(lambda: Snapshot)
     postprocessing_stack = graphene.Field(PostprocessingStack)
 
     def resolve_sample_groups(self, args, context, info):
@@ -39,6 +46,15 @@ class Postprocess(SQLAlchemyObjectType):
             contains_eager("plants.snapshots"),
         ).all()
 
+    def resolve_snapshots(self, args, context, info):
+        return load_relationship(self, 'snapshots')
+
+    def resolve_analysis(self, args, context, info):
+        return load_relationship(self, 'analysis')
+
+    def resolve_control_group(self, args, context, info):
+        return load_relationship(self, 'control_group')
+
     def resolve_postprocessing_stack(self, args, context, info):
         try:
             identity = get_jwt_identity()
@@ -66,3 +82,7 @@ class DeletePostprocess(graphene.Mutation):
             raise UnknownDataError("An unexpected DB error occured")
 
         return DeletePostprocess(id=ql_id)
+
+
+# noinspection PyPep8
+from server.api.graphql.snapshot_schema import Snapshot
@@ -0,0 +1,180 @@
+from graphql.language import ast
+from graphql.type.definition import GraphQLList, GraphQLNonNull, get_named_type, is_composite_type
+from graphql.utils.get_operation_ast import get_operation_ast
+from graphql.utils.value_from_ast import value_from_ast
+
+#: The maximum cost of a query if no budget is configured for the user
+DEFAULT_MAX_COST = 100000
+
+#: The maximum number of nested object fields of a query. The edges and node fields of connections are not counted
+DEFAULT_MAX_DEPTH = 8
+
+#: The number of nodes assumed for a connection or list if the query does not limit it with first or last and no
+#: size is given in :data:`CONNECTION_SIZES`
+DEFAULT_CONNECTION_SIZE = 50
+
+#: The number of nodes usually returned by connections which are not limited, by 'Type.field'
+CONNECTION_SIZES = {
+    'Query.sampleGroups': 10,
+    'Experiment.sampleGroups': 10,
+    'Analysis.sampleGroups': 10,
+    'Postprocess.sampleGroups': 10,
+    # The snapshots of a plant are usually filtered to a single timestamp
+    'Plant.snapshots': 10,
+    # One image per angle and type
+    'Snapshot.images': 10,
+    'Snapshot.analyses': 5,
+    'Snapshot.postprocesses': 5,
+    'Timestamp.analyses': 5,
+    'Analysis.postprocessings': 5,
+}
+
+#: The cost of fields which are more expensive than loading a row, by 'Type.field' or by field name for all types.
+#: Other object fields cost 1, scalar fields are free.
+FIELD_COSTS = {
+    # Counts all rows of the connection with a separate query
+    'totalCount': 1,
+    # Fetched from the analysis or postprocessing server via gRPC
+    'Analysis.pipeline': 10,
+    'Postprocess.postprocessingStack': 10,
+    'Query.pipelines': 20,
+    'Query.postprocessingStacks': 20,
+    # Loaded from Redis with two pipelined requests, but without paging
+    'Query.analysisTasks': 10,
+    'Query.postprocessingTasks': 10,
+}
+
+
+def _is_connection_type(graphql_type):
+    fields = getattr(graphql_type, 'fields', {})
+    return 'edges' in fields and 'pageInfo' in fields
+
+
+def _is_edge_type(graphql_type):
+    fields = getattr(graphql_type, 'fields', {})
+    return 'node' in fields and 'cursor' in fields
+
+
+def _is_list_type(graphql_type):
+    if isinstance(graphql_type, GraphQLNonNull):
+        graphql_type = graphql_type.of_type
+    return isinstance(graphql_type, GraphQLList)
+
+
+class QueryCostAnalyzer(object):
+    """
+    Estimates the cost of a query from its document before it is executed.
+
+    Every object field costs its weight (See :data:`FIELD_COSTS`). The cost of the nodes of a connection is multiplied
+    by the number of nodes requested with first or last, or by the size the connection usually has if the query does
+    not limit it (See :data:`CONNECTION_SIZES`). So the cost grows with the number of rows a query can load, e.g. all
+    images of all snapshots of all timestamps of an experiment cost 50 * 50 * 10 times as much as a single image.
+    """
+
+    def __init__(self, schema, field_costs=None, connection_sizes=None,
+                 default_connection_size=DEFAULT_CONNECTION_SIZE):
+        """
+
+        :param schema: The GraphQL schema the queries are executed against
+        :param field_costs: The weights of the fields (optional, default: :data:`FIELD_COSTS`)
+        :param connection_sizes: The usual sizes of connections (optional, default: :data:`CONNECTION_SIZES`)
+        :param default_connection_size: The number of nodes assumed for other connections which are not limited
+        """
+        self._schema = schema
+        self._field_costs = FIELD_COSTS if field_costs is None else field_costs
+        self._connection_sizes = CONNECTION_SIZES if connection_sizes is None else connection_sizes
+        self._default_connection_size = default_connection_size
+
+    def analyze(self, document_ast, variables=None, operation_name=None):
+        """
+        Calculates the cost and the depth of the operation which is going to be executed
+
+        :param document_ast: The parsed and validated query document
+        :param variables: The variables sent with the query
+        :param operation_name: The name of the operation to execute if the document contains more than one
+
+        :return: A tuple (cost, depth). (0, 0) if the document does not contain the operation
+        """
+        operation = get_operation_ast(document_ast, operation_name)
+        if operation is None:
+            return 0, 0
+        if operation.operation == 'mutation':
+            root_type = self._schema.get_mutation_type()
+        else:
+            root_type = self._schema.get_query_type()
+        fragments = dict((definition.name.value, definition) for definition in document_ast.definitions
+                         if isinstance(definition, ast.FragmentDefinition))
+        return self._analyze_selection_set(operation.selection_set, root_type, variables or {}, fragments)
+
+    def _get_field_cost(self, parent_type, field_name, field_type):
+        key = '{}.{}'.format(parent_type.name, field_name)
+        if key in self._field_costs:
+            return self._field_costs[key]
+        if field_name in self._field_costs:
+            return self._field_costs[field_name]
+        if _is_edge_type(parent_type):
+            # Every node is a loaded row
+            return 1 if field_name == 'node' else 0
+        if _is_connection_type(parent_type):
+            return 0
+        return 1 if is_composite_type(get_named_type(field_type)) else 0
+
+    def _get_size(self, parent_type, field, field_def, variables):
+        size = None
+        for argument in field.arguments:
+            if argument.name.value in ('first', 'last') and argument.name.value in field_def.args:
+                value = value_from_ast(argument.value, field_def.args[argument.name.value].type, variables)
+                if value is not None:
+                    size = value if size is None else min(size, value)
+        if size is None:
+            return self._connection_sizes.get('{}.{}'.format(parent_type.name, field.name.value),
+                                              self._default_connection_size)
+        return max(size, 0)
+
+    def _iter_fields(self, selection_set, parent_type, fragments):
+        for selection in selection_set.selections:
+            if isinstance(selection, ast.Field):
+                yield selection, parent_type
+            else:
+                if isinstance(selection, ast.FragmentSpread):
+                    fragment = fragments[selection.name.value]
+                else:
+                    fragment = selection
+                fragment_type = parent_type
+                if fragment.type_condition is not None:
+                    fragment_type = self._schema.get_type(fragment.type_condition.name.value)
+                for field in self._iter_fields(fragment.selection_set, fragment_type, fragments):
+                    yield field
+
+    def _analyze_selection_set(self, selection_set, parent_type, variables, fragments, node_count=1):
+        """
+        Returns the cost and the depth of a selection set. node_count is the number of nodes of a connection.
+        """
+        cost = 0
+        depth = 0
+        for field, field_parent_type in self._iter_fields(selection_set, parent_type, fragments):
+            field_name = field.name.value
+            if field_name.startswith('__'):
+                # Introspection is answered from the schema
+                continue
+            field_def = field_parent_type.fields[field_name]
+            cost += self._get_field_cost(field_parent_type, field_name, field_def.type)
+            if field.selection_set is None:
+                continue
+            field_type = get_named_type(field_def.type)
+            child_node_count = 1
+            if _is_connection_type(field_type):
+                child_node_count = self._get_size(field_parent_type, field, field_def, variables)
+            child_cost, child_depth = self._analyze_selection_set(field.selection_set, field_type, variables, fragments,
+                                                                  child_node_count)
+            if _is_connection_type(field_parent_type) or _is_edge_type(field_parent_type):
+                # Only the nodes are loaded once per requested node, totalCount and pageInfo once per connection
+                if field_name == 'edges':
+                    child_cost *= node_count
+            else:
+                if _is_list_type(field_def.type) and not _is_connection_type(field_type):
+                    child_cost *= self._default_connection_size
+                child_depth += 1
+            cost += child_cost
+            depth = max(depth, child_depth)
+        return cost, depth
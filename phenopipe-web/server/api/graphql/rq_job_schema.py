@@ -3,6 +3,7 @@ from graphql_relay import to_global_id, from_global_id
 
 from server.api.graphql.status_log_entry_schema import StatusLogEntryConnection, StatusLogEntry
 from server.extensions import log_store
+from server.modules.processing.task_loading import get_loaded_status
 
 
 class Job(graphene.ObjectType):
@@ -19,7 +20,7 @@ class Job(graphene.ObjectType):
     def from_rq_job_instance(cls, rq_job):
         if rq_job is not None:
             return cls(id=to_global_id('Job', rq_job.id), name=rq_job.meta['name'], description=rq_job.description,
-                       status=rq_job.get_status(),
+                       status=get_loaded_status(rq_job),
                        enqueued_at=rq_job.enqueued_at,
                        started_at=rq_job.started_at, finished_at=rq_job.ended_at)
         return None
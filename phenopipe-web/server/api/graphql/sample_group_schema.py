@@ -6,7 +6,9 @@ from graphql_relay import from_global_id
 from sqlalchemy.exc import IntegrityError, DBAPIError
 
 from server.api.graphql.exceptions import UnknownDataError
-from server.api.graphql.plant_schema import PlantInput
+from server.api.graphql.loaders import load_relationship
+from server.api.graphql.pagination import create_connection, KeysetConnectionField
+from server.api.graphql.plant_schema import Plant, PlantInput
 from server.extensions import db
 from server.models.sample_group_model import SampleGroupModel
 
@@ -16,6 +18,18 @@ class SampleGroup(SQLAlchemyObjectType):
         model = SampleGroupModel
         interfaces = (Node,)
 
+    @classmethod
+    def get_connection(cls):
+        return create_connection(cls)
+
+    plants = KeysetConnectionField(Plant)
+
+    def resolve_experiment(self, args, context, info):
+        return load_relationship(self, 'experiment')
+
+    def resolve_plants(self, args, context, info):
+        return load_relationship(self, 'plants')
+
 
 class SampleGroupInput(graphene.InputObjectType):
     name = graphene.NonNull(graphene.String)
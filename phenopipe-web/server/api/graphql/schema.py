@@ -2,7 +2,6 @@ import graphene
 from flask import current_app
 from flask_jwt_extended import get_jwt_identity
 from graphene import relay
-from graphene_sqlalchemy import SQLAlchemyConnectionField
 from graphql import GraphQLError
 from graphql_relay import from_global_id
 from rq.job import Job as RQJob
@@ -12,7 +11,8 @@ from sqlalchemy.orm import contains_eager
 from server.api.graphql.analysis_schema import Analysis
 from server.api.graphql.experiment_schema import Experiment, CreateExperiment, DeleteExperiment, ConstructExperiment, \
     EditProject
-from server.api.graphql.image_schema import Image, AddImage
+from server.api.graphql.image_schema import Image, AddImage, AddImages
+from server.api.graphql.pagination import KeysetConnectionField
 from server.api.graphql.pipeline_schema import Pipeline, PipelineConnection
 from server.api.graphql.plant_schema import Plant, CreatePlant, DeletePlant
 from server.api.graphql.postprocess_schema import Postprocess
@@ -53,18 +53,19 @@ class Query(graphene.ObjectType):
     analysis_job = graphene.Field(Job, id=graphene.NonNull(graphene.ID))
     postprocessing_job = graphene.Field(Job, id=graphene.NonNull(graphene.ID))
 
-    experiments = SQLAlchemyConnectionField(Experiment, with_name=graphene.String(), with_scientist=graphene.String())
-    plants = SQLAlchemyConnectionField(Plant)
-    sample_groups = SQLAlchemyConnectionField(SampleGroup, for_timestamp=graphene.ID(), for_analysis=graphene.ID(),
-                                              for_postprocess=graphene.ID())
-    snapshots = SQLAlchemyConnectionField(Snapshot, for_timestamp=graphene.ID(), with_camera_position=graphene.String(),
-                                          with_measurement_tool=graphene.String(),
-                                          for_open_timestamp=graphene.Boolean(),
-                                          for_plant=graphene.ID())
-    timestamps = SQLAlchemyConnectionField(Timestamp, for_experiment=graphene.ID(), ordered=graphene.Boolean())
-    images = SQLAlchemyConnectionField(Image, for_snapshot=graphene.ID())
-    analyses = SQLAlchemyConnectionField(Analysis, for_timestamp=graphene.ID())
-    postprocessings = SQLAlchemyConnectionField(Postprocess, for_analysis=graphene.ID())
+    experiments = KeysetConnectionField(Experiment, with_name=graphene.String(), with_scientist=graphene.String())
+    plants = KeysetConnectionField(Plant)
+    sample_groups = KeysetConnectionField(SampleGroup, for_timestamp=graphene.ID(), for_analysis=graphene.ID(),
+                                          for_postprocess=graphene.ID())
+    snapshots = KeysetConnectionField(Snapshot, for_timestamp=graphene.ID(), with_camera_position=graphene.String(),
+                                      with_measurement_tool=graphene.String(),
+                                      for_open_timestamp=graphene.Boolean(),
+                                      for_plant=graphene.ID())
+    # Timestamps are always ordered by their creation, ordered is only kept for existing clients
+    timestamps = KeysetConnectionField(Timestamp, for_experiment=graphene.ID(), ordered=graphene.Boolean())
+    images = KeysetConnectionField(Image, for_snapshot=graphene.ID())
+    analyses = KeysetConnectionField(Analysis, for_timestamp=graphene.ID())
+    postprocessings = KeysetConnectionField(Postprocess, for_analysis=graphene.ID())
 
     postprocessing_stacks = graphene.ConnectionField(PostprocessingStackConnection, unused_for_analysis=graphene.ID())
     pipelines = graphene.ConnectionField(PipelineConnection, unused_for_timestamp=graphene.ID())
@@ -114,7 +115,7 @@ class Query(graphene.ObjectType):
 
         for cond in conds:
             query = query.filter(cond)
-        return query.all()
+        return query
 
     def resolve_timestamps(self, args, context, info):
         cond = True
@@ -122,10 +123,8 @@ class Query(graphene.ObjectType):
             experiment_id = args.get('for_experiment')
             _, experiment_db_id = from_global_id(experiment_id)
             cond = (TimestampModel.experiment_id == experiment_db_id)
-        if 'ordered' in args and args.get('ordered') == True:
-            return db.session.query(TimestampModel).filter(cond).order_by(TimestampModel.created_at).all()
 
-        return db.session.query(TimestampModel).filter(cond).all()
+        return db.session.query(TimestampModel).filter(cond)
 
     def resolve_snapshots(self, args, context, info):
         conds = list()
@@ -147,7 +146,7 @@ class Query(graphene.ObjectType):
 
         for cond in conds:
             query = query.filter(cond)
-        return query.all()
+        return query
 
     def resolve_images(self, args, context, info):
         cond = True
@@ -157,7 +156,7 @@ class Query(graphene.ObjectType):
             cond = (ImageModel.snapshot_id == snapshot_db_id)
         # TODO add filter for type
 
-        return db.session.query(ImageModel).filter(cond).all()
+        return db.session.query(ImageModel).filter(cond)
 
     def resolve_analyses(self, args, context, info):
         cond = True
@@ -166,7 +165,7 @@ class Query(graphene.ObjectType):
             _, timestamp_db_id = from_global_id(timestamp_id)
             cond = (AnalysisModel.timestamp_id == timestamp_db_id)
 
-        return db.session.query(AnalysisModel).filter(cond).all()
+        return db.session.query(AnalysisModel).filter(cond)
 
     def resolve_postprocessings(self, args, context, info):
         cond = True
@@ -175,7 +174,7 @@ class Query(graphene.ObjectType):
             _, analysis_db_id = from_global_id(analysis_id)
             cond = (PostprocessModel.analysis_id == analysis_db_id)
 
-        return db.session.query(PostprocessModel).filter(cond).all()
+        return db.session.query(PostprocessModel).filter(cond)
 
     def resolve_sample_groups(self, args, context, info):
         cond = True
@@ -307,6 +306,7 @@ class Mutation(graphene.ObjectType):
     create_snapshot = CreateSnapshot.Field()
     complete_timestamp = CompleteTimestamp.Field()
     add_image = AddImage.Field()
+    add_images = AddImages.Field()
 
     edit_project = EditProject.Field()
     change_snapshot_exclusion = ChangeSnapshotExclusion.Field()
@@ -1,14 +1,16 @@
 import graphene
 from flask import logging
 from graphene import Node
-from graphene_sqlalchemy import SQLAlchemyObjectType, SQLAlchemyConnectionField
+from graphene_sqlalchemy import SQLAlchemyObjectType
 from graphql_relay import from_global_id, to_global_id
 from sqlalchemy.exc import IntegrityError, DBAPIError
 
-from server.api.graphql.exceptions import UnknownDataError, ConflictingDataError
+from server.api.graphql.exceptions import UnknownDataError, ConflictingDataError, NotFoundError
 from server.api.graphql.image_schema import Image
+from server.api.graphql.loaders import load_relationship
+from server.api.graphql.pagination import create_connection, KeysetConnectionField
 from server.extensions import db
-from server.models import SnapshotModel, TimestampModel, PlantModel, ImageModel, AnalysisModel
+from server.models import SnapshotModel, TimestampModel, PlantModel
 
 
 class Snapshot(SQLAlchemyObjectType):
@@ -16,21 +18,31 @@ class Snapshot(SQLAlchemyObjectType):
         model = SnapshotModel
         interfaces = (Node,)
 
-    images = SQLAlchemyConnectionField(Image, with_type=graphene.String())
+    @classmethod
+    def get_connection(cls):
+        return create_connection(cls)
+
+    images = KeysetConnectionField(Image, with_type=graphene.String())
     analyses = graphene.ConnectionField(lambda: Analysis)
+    postprocesses = KeysetConnectionField(lambda: Postprocess)
+
+    def resolve_timestamp(self, args, context, info):
+        return load_relationship(self, 'timestamp')
+
+    def resolve_plant(self, args, context, info):
+        return load_relationship(self, 'plant')
 
     def resolve_images(self, args, context, info):
-        conds = list()
-        query = db.session.query(ImageModel).filter(ImageModel.snapshot_id == self.id)
+        images = load_relationship(self, 'images')
         if 'with_type' in args:
-            conds.append(ImageModel.type == args.get('with_type'))
-
-        for cond in conds:
-            query = query.filter(cond)
-        return query.all()
+            return [image for image in images if image.type == args.get('with_type')]
+        return images
 
     def resolve_analyses(self, args, context, info):
-        return db.session.query(AnalysisModel).filter(AnalysisModel.timestamp_id == self.timestamp_id).all()
+        return load_relationship(load_relationship(self, 'timestamp'), 'analyses')
+
+    def resolve_postprocesses(self, args, context, info):
+        return load_relationship(self, 'postprocesses')
 
 
 class SnapshotInput(graphene.InputObjectType):
@@ -74,11 +86,15 @@ class CreateSnapshot(graphene.Mutation):
     id = graphene.ID()
     timestamp_id = graphene.ID()
     new_timestamp = graphene.Boolean()
+    # The plant of the snapshot so that clients can look it up and create the snapshot with a single request
+    plant = graphene.Field(lambda: Plant)
 
     def mutate(self, args, context, info):
         plant_id = args.get('plant_id')
         _, plant_db_id = from_global_id(plant_id)
         plant = db.session.query(PlantModel).get(plant_db_id)
+        if plant is None:
+            raise NotFoundError('There is no plant with this id')
         experiment_id = plant.sample_group.experiment_id
         timestamp, created = TimestampModel.get_or_create(experiment_id)
         snapshot = SnapshotModel(plant_id=plant_db_id, timestamp_id=timestamp.id,
@@ -99,7 +115,7 @@ class CreateSnapshot(graphene.Mutation):
         db.session.commit()
 
         return CreateSnapshot(id=to_global_id('Snapshot', snapshot.id),
-                              timestamp_id=to_global_id('Timestamp', timestamp.id), new_timestamp=created)
+                              timestamp_id=to_global_id('Timestamp', timestamp.id), new_timestamp=created, plant=plant)
 
 
 class DeleteSnapshot(graphene.Mutation):
@@ -127,3 +143,6 @@ class DeleteSnapshot(graphene.Mutation):
 # noinspection PyPep8
 from server.api.graphql.analysis_schema import Analysis
 # noinspection PyPep8
+from server.api.graphql.plant_schema import Plant
+# noinspection PyPep8
+from server.api.graphql.postprocess_schema import Postprocess
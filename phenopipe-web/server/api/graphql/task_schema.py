@@ -48,7 +48,7 @@ class Task(graphene.ObjectType):
                        description=task.description,
                        task_type=type,
                        current_status=task.state,
-                       current_message=task.fetch_message(),
+                       current_message=task.message,
                        jobs=job_list)
         return instance
 
@@ -6,6 +6,8 @@ from graphql_relay import from_global_id
 from sqlalchemy.exc import DBAPIError
 
 from server.api.graphql.exceptions import UnknownDataError
+from server.api.graphql.loaders import load_relationship
+from server.api.graphql.pagination import create_connection, KeysetConnectionField
 from server.extensions import db
 from server.models import TimestampModel
 
@@ -15,6 +17,22 @@ class Timestamp(SQLAlchemyObjectType):
         model = TimestampModel
         interfaces = (Node,)
 
+    @classmethod
+    def get_connection(cls):
+        return create_connection(cls)
+
+    snapshots = KeysetConnectionField(lambda: Snapshot)
+    analyses = KeysetConnectionField(lambda: Analysis)
+
+    def resolve_experiment(self, args, context, info):
+        return load_relationship(self, 'experiment')
+
+    def resolve_snapshots(self, args, context, info):
+        return load_relationship(self, 'snapshots')
+
+    def resolve_analyses(self, args, context, info):
+        return load_relationship(self, 'analyses')
+
 
 class TimestampInput(graphene.InputObjectType):
     experiment_id = graphene.NonNull(graphene.Int)
@@ -59,3 +77,9 @@ class DeleteTimestamp(graphene.Mutation):
             raise UnknownDataError("An unexpected DB error occured")
 
         return DeleteTimestamp(id=ql_id)
+
+
+# noinspection PyPep8
+from server.api.graphql.analysis_schema import Analysis
+# noinspection PyPep8
+from server.api.graphql.snapshot_schema import Snapshot
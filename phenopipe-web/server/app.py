@@ -6,9 +6,11 @@ from flask import Flask
 from flask_cors import CORS
 from flask_jwt_extended import jwt_required
 
-from extensions import db, jwt, migrate
+from extensions import db, jwt, migrate, persisted_query_store
 from server.api import api
 from server.api.graphql.custom_graphql_view import CustomGraphQLView
+from server.api.graphql.document_cache import DocumentCache
+from server.api.graphql.query_cost import DEFAULT_MAX_COST, DEFAULT_MAX_DEPTH
 from server.auth import authentication
 from server.auth.box_authenticator import BoxAuthenticator
 from server.auth.dummy_authenticator import DummyAuthenticator
@@ -95,10 +97,20 @@ def create_app(configname='default_config', app_name=None, modules=None):
     app.register_blueprint(api)
     app.register_blueprint(auth)
 
-    graphql_sec_view = jwt_required(CustomGraphQLView.as_view('graphql', schema=schema, graphiql=False))
+    # GRAPHQL_USER_BUDGETS maps usernames to a maximum query cost other than GRAPHQL_MAX_COST.
+    # Up to GRAPHQL_DOCUMENT_CACHE_SIZE parsed documents are kept by each process
+    graphql_options = {
+        'max_cost': app.config.get('GRAPHQL_MAX_COST', DEFAULT_MAX_COST),
+        'max_depth': app.config.get('GRAPHQL_MAX_DEPTH', DEFAULT_MAX_DEPTH),
+        'user_budgets': app.config.get('GRAPHQL_USER_BUDGETS', {}),
+        'document_cache': DocumentCache(app.config.get('GRAPHQL_DOCUMENT_CACHE_SIZE', 256)),
+        'persisted_queries': persisted_query_store
+    }
+    graphql_sec_view = jwt_required(CustomGraphQLView.as_view('graphql', schema=schema, graphiql=False,
+                                                              **graphql_options))
     app.add_url_rule('/graphql', view_func=graphql_sec_view)
     if not app.config['PRODUCTION']:
-        graphql_view = CustomGraphQLView.as_view('graphql_insec', schema=schema, graphiql=True)
+        graphql_view = CustomGraphQLView.as_view('graphql_insec', schema=schema, graphiql=True, **graphql_options)
         app.add_url_rule('/graphql_insec', view_func=graphql_view)
 
     server_app = app
@@ -6,6 +6,7 @@ from flask_sqlalchemy import SQLAlchemy
 from rq import Queue
 
 from server.utils.redis_log_store import LogStore
+from server.utils.redis_query_store import PersistedQueryStore
 from server.utils.util import static_vars
 
 db = SQLAlchemy()
@@ -28,6 +29,7 @@ from server.modules.processing.analysis.analysis_task_scheduler import AnalysisT
 from server.modules.processing.postprocessing.postprocess_task_scheduler import PostprocessTaskScheduler
 
 log_store = LogStore(redis_db, 'tasks:logs')
+persisted_query_store = PersistedQueryStore(redis_db, 'graphql:persisted')
 
 analysis_task_scheduler = AnalysisTaskScheduler(redis_db, 'ana_tasks', analysis_job_queue, log_store)
 postprocess_task_scheduler = PostprocessTaskScheduler(redis_db, 'post_tasks', postprocessing_job_queue, log_store)
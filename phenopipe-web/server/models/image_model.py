@@ -3,6 +3,12 @@ from sqlalchemy.dialects.postgresql import ENUM
 from server.extensions import db
 from server.models import BaseModel
 
+#: File extensions of the image formats a phenobox may upload as raw images
+RAW_IMAGE_EXTENSIONS = ('png', 'jpg', 'jpeg', 'webp')
+#: File extensions of image formats which are already compressed and gain nothing from further compression. All
+#: formats a phenobox uploads are compressed ones
+COMPRESSED_IMAGE_EXTENSIONS = RAW_IMAGE_EXTENSIONS
+
 
 class ImageModel(BaseModel):
     __tablename__ = 'image'
@@ -32,5 +38,12 @@ class ImageModel(BaseModel):
         self.type = image_type
         self.angle = angle
 
+    @property
+    def extension(self):
+        """
+        The lower case file extension of the image without the leading dot
+        """
+        return self.filename.rpartition('.')[2].lower()
+
     def __repr__(self):
         return '<Image %d of plant %r>' % (self.id, self.filename)
@@ -3,8 +3,10 @@ import os
 import grpc
 from flask import current_app
 
+from server.extensions import db
 from server.gen import phenopipe_iap_pb2_grpc, phenopipe_iap_pb2
-from server.modules.processing.exceptions import InvalidPathError, AlreadyFinishedError
+from server.models import ImageModel, SnapshotModel
+from server.modules.processing.exceptions import InvalidPathError, AlreadyFinishedError, UnsupportedImageFormatError
 from server.modules.processing.remote_exceptions import UnavailableError, PipelineAlreadyExistsError, \
     InvalidPipelineError, InternalError, NotFoundError
 from server.utils.util import remove_prefix
@@ -25,6 +27,8 @@ iap_meta_cols = [
     'growth conditions',
     'treatment'
 ]
+#: File extensions of the image formats IAP is able to import
+iap_image_extensions = ('png', 'jpg', 'jpeg', 'tif', 'tiff')
 _timeout_import = 43200  # 12h
 _timeout_analysis = 86400  # 24h
 _timeout_export = 300  # 5min
@@ -46,9 +50,11 @@ def submit_iap_jobs(timestamp, experiment_name, coordinator, scientist, input_pa
 
     :raises AlreadyRunningError: If the analysis is currently in progress
     :raises AlreadyFinishedError: If the analysis has already been processed.
+    :raises UnsupportedImageFormatError: If the timestamp contains images in a format IAP is not able to import
 
     :return: The AnalysisTask object and the analysis object itself
     """
+    check_iap_image_formats(timestamp)
     shared_folder_map = current_app.config['SHARED_FOLDER_MAP']
     smb_url, local_path = next(((smb, path) for smb, path in shared_folder_map.items() if input_path.startswith(smb)),
                                (None, None))
@@ -76,6 +82,27 @@ def submit_iap_jobs(timestamp, experiment_name, coordinator, scientist, input_pa
         raise InvalidPathError(input_path, 'The given input path "{}" is not valid'.format(input_path))
 
 
+def check_iap_image_formats(timestamp):
+    """
+    Checks whether all raw images of the given timestamp are stored in a format IAP is able to import
+
+    :param timestamp: The timestamp to be analyzed
+
+    :raises UnsupportedImageFormatError: If at least one image is stored in an unsupported format
+
+    :return: None
+    """
+    filenames = db.session.query(ImageModel.filename).join(SnapshotModel) \
+        .filter(SnapshotModel.timestamp_id == timestamp.id) \
+        .filter(ImageModel.type == 'raw') \
+        .all()
+    unsupported = set(filename.rpartition('.')[2].lower() for filename, in filenames) - set(iap_image_extensions)
+    if len(unsupported) > 0:
+        raise UnsupportedImageFormatError(sorted(unsupported),
+                                          'IAP is not able to import images of type {}'.format(
+                                              ', '.join(sorted(unsupported))))
+
+
 def upload_pipeline(pipeline, username):
     """
     Uploads the given pipeline file to the Analyis/IAP server
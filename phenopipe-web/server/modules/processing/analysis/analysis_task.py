@@ -5,6 +5,7 @@ import dateutil.parser
 from rq import Queue
 from rq.job import Job, JobStatus
 
+from server.modules.processing.task_loading import get_loaded_status
 from server.modules.processing.task_state import TaskState
 from server.utils.util import as_string
 
@@ -75,6 +76,19 @@ class AnalysisTask(object):
         obj = self._connection.hgetall(key)
         if len(obj) == 0:
             raise ValueError('No such task: {0}'.format(key))
+        job_ids = self._restore(obj)
+        self.import_job = self._queue.fetch_job(job_ids['import_job'])
+        self.analysis_job = self._queue.fetch_job(job_ids['analysis_job'])
+        self.export_job = self._queue.fetch_job(job_ids['export_job'])
+
+    def _restore(self, obj):
+        """
+        Sets the attributes stored in the task hash
+
+        :param obj: The content of the task hash
+
+        :return: A dict of the ids of the jobs by job name
+        """
 
         def to_date(date_str):
             if date_str is None:
@@ -87,19 +101,17 @@ class AnalysisTask(object):
         self.description = as_string(obj.get('description'))
         self.message = as_string(obj.get('message'))
         self._queue = Queue(as_string(obj.get('queue_name')), connection=self._connection)
-        import_job_id = as_string(obj.get('import_job', None))
-        analysis_job_id = as_string(obj.get('analysis_job', None))
-        export_job_id = as_string(obj.get('export_job', None))
-        self.import_job = self._queue.fetch_job(import_job_id)
-        self.analysis_job = self._queue.fetch_job(analysis_job_id)
-        self.export_job = self._queue.fetch_job(export_job_id)
+        return OrderedDict((job_name, as_string(obj.get(job_name, None))) for job_name in self._jobs)
 
     @property
     def state(self):
+        """
+        The state of the task derived from the status its jobs had when they were fetched
+        """
         if self.import_job is not None:
-            first_state = self.import_job.get_status()
+            first_state = get_loaded_status(self.import_job)
         else:
-            first_state = self.analysis_job.get_status()
+            first_state = get_loaded_status(self.analysis_job)
 
         if first_state == JobStatus.DEFERRED:
             return TaskState.CREATED
@@ -110,9 +122,11 @@ class AnalysisTask(object):
         if first_state == JobStatus.FAILED:
             return TaskState.FAILED
         # first job finished
-        if self.analysis_job.status == JobStatus.FINISHED and self.export_job.status == JobStatus.FINISHED:
+        analysis_state = get_loaded_status(self.analysis_job)
+        export_state = get_loaded_status(self.export_job)
+        if analysis_state == JobStatus.FINISHED and export_state == JobStatus.FINISHED:
             return TaskState.FINISHED
-        elif self.analysis_job.get_status() == JobStatus.FAILED or self.export_job.status == JobStatus.FAILED:
+        elif analysis_state == JobStatus.FAILED or export_state == JobStatus.FAILED:
             return TaskState.FAILED
 
         return TaskState.RUNNING
@@ -7,6 +7,7 @@ from server.models import AnalysisModel
 from server.modules.processing.analysis import invoke_iap_import, invoke_iap_analysis, invoke_iap_export
 from server.modules.processing.analysis.analysis_task import AnalysisTask
 from server.modules.processing.exceptions import AlreadyFinishedError
+from server.modules.processing.task_loading import load_tasks
 
 
 class AnalysisTaskScheduler(object):
@@ -47,11 +48,14 @@ class AnalysisTaskScheduler(object):
         return self._connection.smembers(self._get_tracking_set_key(username))
 
     def fetch_all_tasks(self, username):
-        tasks = []
-        keys = self.fetch_all_task_keys(username)
-        for key in keys:
-            tasks.append(AnalysisTask.from_key(self._connection, key))
-        return tasks
+        """
+        Loads all tasks of the user with a constant number of requests to Redis (See :func:`.load_tasks`)
+
+        :param username: The username of the user who submitted the tasks
+
+        :return: A list of the tasks
+        """
+        return load_tasks(AnalysisTask, self._connection, self.fetch_all_task_keys(username))
 
     def submit_dummies(self, timestamp_id, pipeline_id, username):
         task_name = 'Dummy Task'
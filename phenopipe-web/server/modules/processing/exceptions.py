@@ -29,6 +29,12 @@ class NoPathMappingFoundError(ProcessingError):
         self.smb_url = smb_url
 
 
+class UnsupportedImageFormatError(ProcessingError):
+    def __init__(self, extensions, message, *args):
+        super(UnsupportedImageFormatError, self).__init__(message, *args)
+        self.extensions = extensions
+
+
 class AnalysisDataNotPresentError(ProcessingError):
     def __init__(self, analysis_db_id, message, *args):
         super(AnalysisDataNotPresentError, self).__init__(message, *args)
@@ -8,6 +8,7 @@ from server.modules.processing.analysis.analysis import get_iap_pipeline
 from server.modules.processing.exceptions import AlreadyFinishedError
 from server.modules.processing.postprocessing.postprocessing_jobs import invoke_r_postprocess
 from server.modules.processing.postprocessing.postprocessing_task import PostprocessingTask
+from server.modules.processing.task_loading import load_tasks
 
 
 class PostprocessTaskScheduler:
@@ -40,11 +41,14 @@ class PostprocessTaskScheduler:
         return self._connection.smembers(self._get_tracking_set_key(username))
 
     def fetch_all_tasks(self, username):
-        tasks = []
-        keys = self.fetch_all_task_keys(username)
-        for key in keys:
-            tasks.append(PostprocessingTask.from_key(self._connection, key))
-        return tasks
+        """
+        Loads all tasks of the user with a constant number of requests to Redis (See :func:`.load_tasks`)
+
+        :param username: The username of the user who submitted the tasks
+
+        :return: A list of the tasks
+        """
+        return load_tasks(PostprocessingTask, self._connection, self.fetch_all_task_keys(username))
 
     def submit_task(self, analysis, snapshots, control_group, stack, note, username, experiment,
                     depends_on=None):
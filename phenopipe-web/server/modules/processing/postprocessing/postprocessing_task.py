@@ -5,6 +5,7 @@ import dateutil.parser
 from rq import Queue
 from rq.job import Job, JobStatus
 
+from server.modules.processing.task_loading import get_loaded_status
 from server.modules.processing.task_state import TaskState
 from server.utils.util import as_string
 
@@ -69,6 +70,17 @@ class PostprocessingTask(object):
         obj = self._connection.hgetall(key)
         if len(obj) == 0:
             raise ValueError('No such task: {0}'.format(key))
+        job_ids = self._restore(obj)
+        self.processing_job = self._queue.fetch_job(job_ids['processing_job'])
+
+    def _restore(self, obj):
+        """
+        Sets the attributes stored in the task hash
+
+        :param obj: The content of the task hash
+
+        :return: A dict of the ids of the jobs by job name
+        """
 
         def to_date(date_str):
             if date_str is None:
@@ -81,8 +93,7 @@ class PostprocessingTask(object):
         self.description = as_string(obj.get('description'))
         self.message = as_string(obj.get('message'))
         self._queue = Queue(as_string(obj.get('queue_name')), connection=self._connection)
-        processing_job_id = as_string(obj.get('processing_job', None))
-        self.processing_job = self._queue.fetch_job(processing_job_id)
+        return OrderedDict((job_name, as_string(obj.get(job_name, None))) for job_name in self._jobs)
 
     def update_message(self, message):
         self.message = message
@@ -94,7 +105,10 @@ class PostprocessingTask(object):
 
     @property
     def state(self):
-        state = self.processing_job.get_status()
+        """
+        The state of the task derived from the status its job had when it was fetched
+        """
+        state = get_loaded_status(self.processing_job)
         if state == JobStatus.DEFERRED:
             return TaskState.CREATED
         if state == JobStatus.QUEUED:
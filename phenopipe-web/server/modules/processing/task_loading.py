@@ -0,0 +1,132 @@
+from rq.exceptions import NoSuchJobError
+from rq.job import Job
+
+
+def fetch_hashes(connection, keys):
+    """
+    Reads the given hashes with a single pipelined request instead of one round trip per hash
+
+    :param connection: The redis connection
+    :param keys: The keys of the hashes
+
+    :return: A list with the content of each hash in the order of the keys. Missing hashes are empty dicts
+    """
+    pipeline = connection.pipeline(transaction=False)
+    for key in keys:
+        pipeline.hgetall(key)
+    return pipeline.execute()
+
+
+class _FetchedJobHash(object):
+    """
+    Stands in for the redis connection of a job while rq reads the job hash which has already been fetched with a
+    pipeline. Only answers the commands used by rq.job.Job.refresh and Job.get_status of rq 0.8.2 (pinned in
+    requirements.txt). If a later rq version reads the hash differently, the missing command fails loudly instead of
+    leaving the job half loaded (See tests/test_task_loading.py).
+    """
+
+    def __init__(self, key, obj):
+        self._key = key
+        self._obj = obj
+
+    def _check_key(self, key):
+        if key != self._key:
+            raise ValueError('Only the hash {} has been fetched, not {}'.format(self._key, key))
+
+    def hgetall(self, key):
+        self._check_key(key)
+        return self._obj
+
+    def hget(self, key, field):
+        self._check_key(key)
+        return self._obj.get(field)
+
+
+def _restore_job(connection, job_id, obj):
+    """
+    Creates the job from its already fetched hash with rq's own Job.refresh and records its status
+
+    :param connection: The redis connection
+    :param job_id: The id of the job
+    :param obj: The content of the job hash as returned by redis
+
+    :raises rq.exceptions.NoSuchJobError: if the hash does not contain a job
+
+    :return: The job
+    """
+    job = Job(job_id, connection=connection)
+    job.connection = _FetchedJobHash(job.key, obj)
+    try:
+        job.refresh()
+        # Read by get_loaded_status
+        job.loaded_status = job.get_status()
+    finally:
+        job.connection = connection
+    return job
+
+
+def fetch_jobs(connection, job_ids):
+    """
+    Fetches the given rq jobs with a single pipelined request. This replaces a call of rq.Queue.fetch_job per job.
+
+    :param connection: The redis connection
+    :param job_ids: The ids of the jobs. None values are ignored
+
+    :return: A dict of the jobs by their id. Jobs which do not exist (anymore) are left out
+    """
+    job_ids = list(set(job_id for job_id in job_ids if job_id is not None))
+    jobs = {}
+    for job_id, obj in zip(job_ids, fetch_hashes(connection, [Job.key_for(job_id) for job_id in job_ids])):
+        try:
+            jobs[job_id] = _restore_job(connection, job_id, obj)
+        except NoSuchJobError:
+            pass
+    return jobs
+
+
+def get_loaded_status(job):
+    """
+    Returns the status the job had when it was fetched by :func:`fetch_jobs`. Unlike rq.job.Job.get_status it does
+    not ask Redis again, so that the state of many tasks can be determined without a round trip per job. The status of
+    jobs which were loaded otherwise, e.g. by rq.Queue.fetch_job, is read with Job.get_status.
+
+    :param job: The rq job
+
+    :return: The status as one of the values of rq.job.JobStatus
+    """
+    if hasattr(job, 'loaded_status'):
+        return job.loaded_status
+    return job.get_status()
+
+
+def load_tasks(cls, connection, keys):
+    """
+    Loads the tasks stored under the given keys together with their jobs. All task hashes and all job hashes are
+    fetched with one pipelined request each, instead of several round trips per task as with ``cls.from_key``.
+
+    :param cls: The task class. Its keys have the form <prefix>:<id>:<id> and its instances restore themselves from
+        their hash with ``_restore``, which returns the ids of their jobs by job name
+    :param connection: The redis connection
+    :param keys: The keys of the tasks
+
+    :raises ValueError: if there is no task for one of the keys
+
+    :return: A list of the tasks in the order of the keys
+    """
+    keys = list(keys)
+    tasks = []
+    job_ids = []
+    for key, obj in zip(keys, fetch_hashes(connection, keys)):
+        if len(obj) == 0:
+            raise ValueError('No such task: {0}'.format(key))
+        parts = key.split(':', 2)
+        task = cls(connection, parts[1], parts[2])
+        job_ids.append(task._restore(obj))
+        tasks.append(task)
+    jobs = fetch_jobs(connection, [job_id for ids in job_ids for job_id in ids.values()])
+    for task, ids in zip(tasks, job_ids):
+        for job_name, job_id in ids.items():
+            job = jobs.get(job_id)
+            # Like rq.Queue.fetch_job only jobs of the queue of the task are accepted
+            task.jobs[job_name] = job if job is not None and job.origin == task._queue.name else None
+    return tasks
@@ -0,0 +1,53 @@
+import hashlib
+
+
+def get_query_hash(query):
+    """
+    Calculates the hash by which a GraphQL document is persisted
+
+    :param query: The text of the document
+
+    :return: The hex encoded SHA-256 hash of the document
+    """
+    if not isinstance(query, bytes):
+        query = query.encode('utf-8')
+    return hashlib.sha256(query).hexdigest()
+
+
+class PersistedQueryStore(object):
+    """
+    Stores GraphQL documents by their hash so that clients can send the hash instead of the document (Automatic
+    persisted queries). The documents are kept in Redis and thereby shared by all server processes.
+    """
+
+    def __init__(self, connection, namespace):
+        self._connection = connection
+        self._namespace = namespace
+
+    def _get_hash_key(self):
+        return '{}:documents'.format(self._namespace)
+
+    def get(self, query_hash):
+        """
+        Returns the document stored for the given hash
+
+        :param query_hash: The hash as calculated by :func:`get_query_hash`
+
+        :return: The text of the document or None if no document is stored for the hash
+        """
+        query = self._connection.hget(self._get_hash_key(), query_hash)
+        if query is None:
+            return None
+        return query.decode('utf-8')
+
+    def put(self, query):
+        """
+        Stores the given document
+
+        :param query: The text of the document
+
+        :return: The hash of the document
+        """
+        query_hash = get_query_hash(query)
+        self._connection.hset(self._get_hash_key(), query_hash, query)
+        return query_hash
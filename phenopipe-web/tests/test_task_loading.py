@@ -0,0 +1,90 @@
+"""
+Checks that the jobs restored from pipelined hashes by :mod:`server.modules.processing.task_loading` match the jobs
+rq writes. The hashes are served by an in-memory pipeline, so no Redis server is needed. Any command which is sent to
+Redis nevertheless fails with a connection error. Run from the phenopipe-web folder with::
+
+    python -m unittest discover tests
+"""
+import unittest
+
+import rq
+from redis import StrictRedis
+from rq.job import Job, JobStatus
+from rq.utils import utcformat, utcnow, utcparse
+
+from server.modules.processing.task_loading import fetch_jobs, get_loaded_status
+
+
+class _Pipeline(object):
+
+    def __init__(self, hashes):
+        self._hashes = hashes
+        self._keys = []
+
+    def hgetall(self, key):
+        self._keys.append(key)
+
+    def execute(self):
+        return [self._hashes.get(key, {}) for key in self._keys]
+
+
+class _PipelinedRedis(StrictRedis):
+    """
+    Answers pipelined HGETALL commands from the given hashes. Points to a port nobody listens on otherwise
+    """
+
+    def __init__(self, hashes):
+        super(_PipelinedRedis, self).__init__(port=1)
+        self.hashes = hashes
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return _Pipeline(self.hashes)
+
+
+def _as_redis_hash(obj):
+    # Redis returns all keys and values as bytes
+    return dict((_as_bytes(key), _as_bytes(value)) for key, value in obj.items())
+
+
+def _as_bytes(value):
+    return value if isinstance(value, bytes) else u'{}'.format(value).encode('utf-8')
+
+
+class TaskLoadingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = _PipelinedRedis({})
+        self.job = Job.create('os.getcwd', id='job-1', origin='analysis', description='Import',
+                              status=JobStatus.FINISHED, meta={'name': 'import_job'}, timeout=300,
+                              connection=self.connection)
+        self.job.enqueued_at = utcnow()
+        self.connection.hashes[self.job.key] = _as_redis_hash(self.job.to_dict())
+
+    def test_rq_version(self):
+        # _FetchedJobHash answers the commands of Job.refresh and Job.get_status of this version only
+        self.assertEqual(rq.VERSION, '0.8.2', 'Check task_loading._FetchedJobHash against the new rq version')
+
+    def test_restores_job(self):
+        jobs = fetch_jobs(self.connection, ['job-1', None])
+        self.assertEqual(list(jobs.keys()), ['job-1'])
+        job = jobs['job-1']
+        self.assertEqual(job.id, 'job-1')
+        self.assertEqual(job.func_name, 'os.getcwd')
+        self.assertEqual(job.origin, 'analysis')
+        self.assertEqual(job.description, 'Import')
+        self.assertEqual(job.meta, {'name': 'import_job'})
+        self.assertEqual(job.timeout, 300)
+        self.assertEqual(job.enqueued_at, utcparse(utcformat(self.job.enqueued_at)))
+        self.assertIs(job.connection, self.connection)
+
+    def test_loaded_status(self):
+        job = fetch_jobs(self.connection, ['job-1'])['job-1']
+        self.assertEqual(get_loaded_status(job), JobStatus.FINISHED)
+
+    def test_missing_job(self):
+        self.connection.hashes[Job.key_for('job-2')] = {b'origin': b'analysis'}
+        self.assertEqual(fetch_jobs(self.connection, ['job-2', 'job-3']), {})
+
+
+if __name__ == '__main__':
+    unittest.main()